@@ -1,43 +1,97 @@
 import os
-from langchain.prompts import ChatPromptTemplate
 from langchain.schema import AIMessage, HumanMessage, SystemMessage
+from langchain_core.messages import BaseMessageChunk
 from langchain_community.chat_models import ChatOpenAI 
 from langchain_ollama import ChatOllama 
 from colorama import Fore
 from dotenv import load_dotenv
 from negotiationFlag import NegotiationFlag
+from proposalDetector import IncrementalProposalDetector
+from proposal import formatProposalBlock
+from responseCache import ResponseCacheMiss
+from localBackend import isScriptedModel, createScriptedModel
+from telemetry import CallRecord
+from conversationMemory import ConversationMemory
+from reasoningFilter import ReasoningStreamFilter, isReasoningModel
 import asyncio
 from functools import partial
 from concurrent.futures import ThreadPoolExecutor
-import re
+import json
+import time
+
+def runSync(coroutine): # Run a coroutine to completion from synchronous code
+    try:
+        loop = asyncio.get_event_loop()
+    except RuntimeError: # Worker threads have no default event loop
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    return loop.run_until_complete(coroutine)
+
+def getBackendName(modelName, usesOpenAI): # Backend an agent with this model talks to
+    if isScriptedModel(modelName):
+        return "scripted"
+    return "openai" if usesOpenAI else "ollama"
 
 class Agent:
+    THINKING_BUDGET_ACTIONS = ("truncate", "skip") # Answer after the reasoning so far, or as if there had been none
     
-    def __init__(self, agentName, modelName, usesOpenAI, agentType):
+    def __init__(self, agentName, modelName, usesOpenAI, agentType, streamResponses=False, structuredOutput=False, responseCache=None, backendPool=None, prefixStable=False, speculativePrefill=False, contextWindow=None, bestOfK=1, bestOfKOnFirstAttempt=False, latencyTracker=None, thinkingBudget=None, thinkingBudgetAction="truncate"):
         self.agentName = agentName
         self.modelName = modelName
         self.usesOpenAI = usesOpenAI
         self.openaiApiKey = None
         self.agentType = agentType
-        self.numTokensGenerated = 0 
-        self.memory = []
+        self.numTokensGenerated = 0 # Completion tokens over all calls, as reported by the backend (or estimated)
+        self.callRecords = [] # telemetry.CallRecord per model call
+        self.memory = ConversationMemory()
         self.model = None
+        self.backendPool = backendPool if getBackendName(modelName, usesOpenAI) == "ollama" else None # Optional BackendPool for Ollama calls
+        self.ollamaParams = {"temperature": 0.1, "num_predict": 2000}
         self.currentProposal = None
         self.systemInstructions = ""
         self.initialProposalHelperInstructions = ""
         self.setUpModel()
         self.loadSystemInstructions()
         self.responseTimeout = 320 # seconds
+        self.streamResponses = streamResponses # Stream tokens and stop as soon as the proposal JSON is complete
+        self.numEarlyStops = 0 # Number of streamed responses cut off after the proposal block
+        self.structuredOutput = structuredOutput # Ask the backend for schema-constrained JSON instead of free text
+        self.responseSchema = None # Set by setResponseSchema once the negotiation's tasks are known
+        self.structuredModel = None
+        self.lastStructuredResponse = None # Parsed JSON of the latest structured response, None if unavailable
+        self.samplingSeed = None # Backend sampling seed, changed when a negotiation resumes after a failure
+        self.responseCache = responseCache # Optional ResponseCache shared by the agents of a run
+        self.prefixStable = prefixStable # Keep earlier turns unchanged so the backend can reuse its cached prompt prefix
+        self.speculativePrefill = speculativePrefill # Prefill this agent's history while its partner is generating
+        self.lastEndpointUrl = None # Pool endpoint of the last call; prefix-stable agents stick to it to hit its cache
+        self.numPrefills = 0
+        self.prefillSeconds = 0.0
+        self.contextWindow = contextWindow # Optional ContextWindow bounding what each call sends
+        self.stateSummary = None # Negotiation state sent in place of the exchanges the context window leaves out
+        self.contextTokensSaved = 0 # Estimated prompt tokens the context window kept out, over all calls
+        self.bestOfK = bestOfK # Concurrent samples per retry; the first valid one is used (see NegotiationManager.sample_proposals_async)
+        self.bestOfKOnFirstAttempt = bestOfKOnFirstAttempt # Also sample k at once on a turn's first attempt, not only on retries
+        self.latencyTracker = latencyTracker # Optional LatencyTracker shared by a run: adaptive timeouts and hedged requests
+        if thinkingBudgetAction not in self.THINKING_BUDGET_ACTIONS:
+            raise ValueError(f"Unknown thinking budget action: {thinkingBudgetAction}")
+        self.isReasoningModel = isReasoningModel(modelName) # Replies open with a <think> block, filtered out of the history
+        self.thinkingBudget = thinkingBudget # Estimated reasoning tokens per call before the reasoning is cut off (streamed calls)
+        self.thinkingBudgetAction = thinkingBudgetAction
+        self.numBudgetStops = 0 # Calls whose reasoning was cut off by the thinking budget
 
     def setUpModel(self):
-        if self.usesOpenAI: # Assign model based on the model type
+        if isScriptedModel(self.modelName): # Local rule-based stand-in, e.g. "scripted:latency=0.2,malformed=0.05"
+            self.model = createScriptedModel(self.modelName)
+        elif self.usesOpenAI: # Assign model based on the model type
             load_dotenv("keys.env")
             self.openaiApiKey = os.getenv("OPENAI_API_KEY")
             if self.openaiApiKey is None:
                 raise ValueError("OpenAI API key is not found")
             self.model = ChatOpenAI(model_name=self.modelName, openai_api_key=self.openaiApiKey, temperature=1) 
+        elif self.backendPool is not None: # Shared client of the pool's first endpoint; each call picks its own endpoint
+            self.model = self.backendPool.getClient(self.backendPool.endpoints[0], self.modelName, **self.ollamaParams)
         else:
-            self.model = ChatOllama(model=self.modelName, base_url="http://localhost:11434", temperature=0.1, num_predict=2000)
+            self.model = ChatOllama(model=self.modelName, base_url="http://localhost:11434", **self.ollamaParams)
 
         self.instructionsFilename = "SystemInstructions/defaultCollaborativeInstructions.txt"
         self.initialPropHelperFname = "SystemInstructions/initialProposalHelperInstructions.txt"
@@ -54,8 +108,8 @@ class Agent:
 
         
     def addToChatHistory(self, role, content):
-        if role == 'system':
-            self.memory.append(SystemMessage(content=content))
+        if role == 'system': # Every system message after the instructions is turn feedback, cleared by clearAllSystemMessages
+            self.memory.append(SystemMessage(content=content), transient=len(self.memory) > 0)
         elif role == 'user':
             self.memory.append(HumanMessage(content=content))
         elif role == 'assistant':
@@ -63,47 +117,328 @@ class Agent:
         else:
             raise ValueError(f"Unknown role: {role}") 
 
+    def replaceLastResponse(self, content): # Swap the latest assistant message, e.g. for a locally repaired proposal
+        if self.memory and isinstance(self.memory[-1], AIMessage):
+            self.memory.replace(-1, AIMessage(content=content))
+
     async def generateResponseAsync(self, role=None, inputText=None): # Generate response based on input
+        if inputText and role:
+            self.addToChatHistory(role, inputText)
+        self.lastStructuredResponse = None
+        messages, promptTokens = self.getPromptMessages()
+        response = await self.sampleResponseAsync(messages, promptTokens)
+        if response == NegotiationFlag.TIMEOUTERROR:
+            return response
+        response_content, self.lastStructuredResponse = response
+        self.addToChatHistory('assistant', response_content)
+        return response_content.strip()
+
+    async def sampleResponseAsync(self, messages, promptTokens, sampleSeed=None, callRecord=None):
+        """
+        One model call on messages, leaving the history untouched. Returns (responseContent, structuredPayload),
+        or TIMEOUTERROR if the call failed. sampleSeed overrides the sampling seed for this call only.
+        """
+        callStart = time.perf_counter()
         try:
-            if inputText and role:
-                self.addToChatHistory(role, inputText)
-                
-            history = ChatPromptTemplate.from_messages(self.memory)
-            chain = history | self.model
-            response = await chain.ainvoke({})
-            response_content = response.content if isinstance(response, AIMessage) else response
+            if callRecord is None:
+                callRecord = CallRecord(self.agentName)
+            self.callRecords.append(callRecord)
+            callRecord.contextTokensSaved = self.memory.numTokens - promptTokens
+            self.contextTokensSaved += callRecord.contextTokensSaved
+            cacheKey = self.getCacheKey(messages, sampleSeed) if self.responseCache is not None and self.responseCache.isEnabled else None
+            response_content = self.responseCache.get(cacheKey) if cacheKey is not None else None
+            callRecord.cached = response_content is not None
+            responseMessage = None # Message (or last streamed chunk) carrying the backend's usage metadata
+            if response_content is None:
+                response_content, responseMessage = await self.callModelAsync(messages, callRecord, callStart, sampleSeed)
+                if cacheKey is not None:
+                    self.responseCache.put(cacheKey, response_content)
+            callRecord.latency = time.perf_counter() - callStart
+            if self.latencyTracker is not None and not callRecord.cached:
+                self.latencyTracker.record(self.modelName, callRecord.latency)
+            callRecord.setUsage(responseMessage, promptTokens, response_content)
+            if callRecord.estimated: # Reasoning filtered out while streaming isn't in response_content
+                callRecord.completionTokens += callRecord.reasoningTokens
+            if not callRecord.cached:
+                self.numTokensGenerated += callRecord.completionTokens
             
-            if self.modelName.lower().startswith("deepseek"):
-                #Print the part of the response between the think tags
-                capture_group = re.search(r"<think>(.*?)</think>", response_content, re.DOTALL)
-                if capture_group:
-                    thought_content = capture_group.group(1)
-                else:
-                    thought_content = response_content
-                # print(f"Thoughts: {thought_content}")
-                
-                pattern = r"<think>.*?</think>"
-                response_content = re.sub(pattern, "", response_content, flags=re.DOTALL)
-            self.addToChatHistory('assistant', response_content)
-            return response_content.strip()
+            if self.isReasoningModel: # Responses that weren't streamed through the filter still carry their <think> blocks
+                reasoningFilter = ReasoningStreamFilter()
+                response_content = reasoningFilter.split(response_content)
+                if reasoningFilter.reasoningChars:
+                    callRecord.reasoningTokens = reasoningFilter.reasoningTokens
+                    if callRecord.generationSeconds or callRecord.latency: # Share of the generation time, by tokens
+                        callRecord.reasoningSeconds = (callRecord.generationSeconds or callRecord.latency) * min(1.0, callRecord.reasoningTokens / max(callRecord.completionTokens, 1))
+            structuredPayload = None
+            if self.structuredModel is not None:
+                response_content, structuredPayload = self.renderStructuredResponse(response_content)
+            return response_content, structuredPayload
+        except ResponseCacheMiss: # Strict replay must not fall back to the retry loop
+            raise
         except Exception as e:
             print(f"Error generating response: {e}")
+            if callRecord is not None:
+                callRecord.failed = True
+                callRecord.latency = time.perf_counter() - callStart
             return NegotiationFlag.TIMEOUTERROR
                 
         
-    def generateResponse(self, role=None, inputText=None): # Generate response based on input
+    async def requestAsync(self, messages, callRecord, callStart, sampleSeed=None, avoidUrl=None): # One backend request, returns (text, message)
+        endpoint = self.acquireEndpoint(avoidUrl)
+        callSucceeded = False
+        try:
+            if endpoint is not None:
+                callRecord.endpoint = endpoint.url
+            model = self.getCallModel(endpoint, sampleSeed)
+            if self.usesStreaming: # Constrained output already ends at the JSON
+                response_content, responseMessage = await self.streamResponseAsync(model, messages, callRecord, callStart)
+            else:
+                responseMessage = await model.ainvoke(messages)
+                response_content = responseMessage.content if isinstance(responseMessage, AIMessage) else responseMessage
+            callSucceeded = True
+            return response_content, responseMessage
+        except asyncio.CancelledError: # A timeout, a winning hedge or a winning best-of-k sample; not the endpoint's fault
+            callSucceeded = None
+            raise
+        finally:
+            if endpoint is not None:
+                self.backendPool.release(endpoint, callSucceeded, time.perf_counter() - callStart)
+
+    async def callModelAsync(self, messages, callRecord, callStart, sampleSeed=None):
+        """
+        The backend call of sampleResponseAsync, returns (text, message). With a hedging LatencyTracker, a request
+        still running after the model's hedge delay gets a duplicate (on another pool endpoint if there is one);
+        the first to succeed is used and the other cancelled.
+        """
+        hedgeDelay = self.latencyTracker.getHedgeDelay(self.modelName) if self.latencyTracker is not None else None
+        if hedgeDelay is None:
+            return await self.requestAsync(messages, callRecord, callStart, sampleSeed)
+        primary = asyncio.create_task(self.requestAsync(messages, callRecord, callStart, sampleSeed))
+        requests = {primary}
+        try:
+            done, _ = await asyncio.wait(requests, timeout=hedgeDelay)
+            if done:
+                return primary.result()
+            hedgeRecord = CallRecord(self.agentName) # Endpoint and time to first token of the duplicate
+            hedge = asyncio.create_task(self.requestAsync(messages, hedgeRecord, callStart, sampleSeed, avoidUrl=callRecord.endpoint))
+            requests.add(hedge)
+            callRecord.hedged = True
+            while requests:
+                done, requests = await asyncio.wait(requests, return_when=asyncio.FIRST_COMPLETED)
+                succeeded = [request for request in done if request.exception() is None] # Both may finish together, one failed
+                if not succeeded:
+                    if not requests: # Both failed
+                        self.latencyTracker.recordHedge(self.modelName, won=False)
+                        raise next(iter(done)).exception()
+                    continue
+                request = primary if primary in succeeded else hedge
+                callRecord.hedgeWon = request is hedge
+                if callRecord.hedgeWon:
+                    latency = time.perf_counter() - callStart
+                    callRecord.hedgeSecondsSaved = self.latencyTracker.estimateSecondsSaved(self.modelName, latency, self.getResponseTimeout())
+                    callRecord.endpoint = hedgeRecord.endpoint
+                    callRecord.timeToFirstToken = hedgeRecord.timeToFirstToken
+                    callRecord.reasoningTokens, callRecord.reasoningSeconds = hedgeRecord.reasoningTokens, hedgeRecord.reasoningSeconds
+                    callRecord.thinkingBudgetHit = hedgeRecord.thinkingBudgetHit
+                self.latencyTracker.recordHedge(self.modelName, callRecord.hedgeWon, callRecord.hedgeSecondsSaved)
+                return request.result()
+        finally:
+            for request in requests:
+                request.cancel()
+
+    def getResponseTimeout(self): # Adaptive per-model timeout from the latency tracker, or the fixed responseTimeout
+        if self.latencyTracker is None:
+            return self.responseTimeout
+        return self.latencyTracker.getTimeout(self.modelName, self.responseTimeout)
+
+    def acquireEndpoint(self, avoidUrl=None): # Pool endpoint for the next call, or None without a pool
+        if self.backendPool is None:
+            return None
+        sticky = self.prefixStable or self.speculativePrefill
+        endpoint = self.backendPool.acquire(self.modelName, preferredUrl=self.lastEndpointUrl if sticky and avoidUrl is None else None, avoidUrl=avoidUrl)
+        self.lastEndpointUrl = endpoint.url
+        return endpoint
+
+    async def prefillAsync(self):
+        """
+        Send the current history to Ollama for a single token, so the prompt is processed and cached while the partner
+        is still generating. The next turn only appends to this history, so its time to first token drops.
+        Prefills are best effort: they are not call records and their errors are ignored.
+        """
+        if getBackendName(self.modelName, self.usesOpenAI) != "ollama" or not self.memory:
+            return
+        if self.responseCache is not None and self.responseCache.mode == "replay": # The next turn will likely be served from the cache
+            return
+        messages = list(self.getPromptMessages()[0])
+        endpoint = self.acquireEndpoint()
+        start = time.perf_counter()
+        succeeded = False
+        try:
+            options = {"temperature": self.ollamaParams["temperature"], "num_predict": 1}
+            if self.samplingSeed is not None:
+                options["seed"] = self.samplingSeed
+            model = self.backendPool.getClient(endpoint, self.modelName, **self.ollamaParams) if endpoint is not None else self.model
+            await model.ainvoke(messages, options=options) # options replaces the client's own, so num_predict=1 applies
+            succeeded = True
+            self.numPrefills += 1
+        except asyncio.CancelledError: # Cancelled at the end of the round
+            succeeded = None
+            raise
+        except Exception:
+            pass
+        finally:
+            if endpoint is not None:
+                self.backendPool.release(endpoint, succeeded, None)
+            self.prefillSeconds += time.perf_counter() - start
+
+    def getCallModel(self, endpoint, sampleSeed=None): # Model for one call: the agent's own, or the pool's client for the chosen endpoint
+        seed = sampleSeed if sampleSeed is not None else self.samplingSeed
+        if endpoint is None:
+            if sampleSeed is not None:
+                model = self.getSeededModel(sampleSeed)
+                return self.bindResponseSchema(model) if self.structuredModel is not None else model
+            return self.structuredModel if self.structuredModel is not None else self.model
+        params = dict(self.ollamaParams, seed=seed) if seed is not None else self.ollamaParams
+        client = self.backendPool.getClient(endpoint, self.modelName, **params)
+        return self.bindResponseSchema(client) if self.structuredModel is not None else client
+
+    def getSeededModel(self, seed): # Shallow copy of the agent's model sampling with seed; shares its HTTP client
+        if self.usesOpenAI and not isScriptedModel(self.modelName):
+            return self.model.model_copy(update={"model_kwargs": dict(self.model.model_kwargs, seed=seed)})
+        return self.model.model_copy(update={"seed": seed})
+
+    def getSamplingParams(self): # Everything besides the messages that changes what the backend returns
+        params = {name: getattr(self.model, name, None) for name in ("temperature", "num_predict", "top_p", "top_k", "seed")}
+        params["modelKwargs"] = getattr(self.model, "model_kwargs", None)
+        if self.backendPool is not None:
+            params["seed"] = self.samplingSeed
+        if self.samplingSeed is not None: # Resumes and restarts reseed; backends without a seed field still need a new key, or replay repeats the DNF
+            params["samplingSeed"] = self.samplingSeed
+        params["responseSchema"] = self.responseSchema if self.structuredModel is not None else None
+        params["streamResponses"] = self.streamResponses # Streamed responses are stored trimmed after the proposal
+        return params
+
+    def getCacheKey(self, messages, sampleSeed=None):
+        backend = getBackendName(self.modelName, self.usesOpenAI)
+        messages = [(message.type, message.content) for message in messages]
+        params = self.getSamplingParams()
+        if sampleSeed is not None: # Best-of-k samples each get their own entry
+            params["sampleSeed"] = sampleSeed
+        return self.responseCache.makeKey(backend, self.modelName, params, messages)
+
+    def getPromptMessages(self): # (messages, estimatedTokens) for the next call: the full history, or its context window
+        if self.contextWindow is None:
+            return self.memory.getMessages(), self.memory.numTokens
+        return self.contextWindow.selectMessages(self.memory, self.stateSummary)
+
+    @property
+    def usesStreaming(self): # Stream responses, to stop after the proposal or to hold reasoning models to their thinking budget
+        wantsStream = self.streamResponses or (self.isReasoningModel and self.thinkingBudget is not None)
+        return wantsStream and self.structuredModel is None
+
+    @property
+    def outputMode(self):
+        return "structured" if self.structuredOutput else "freeform"
+
+    def setSamplingSeed(self, seed): # Use a different sampling seed so a resumed turn doesn't repeat the failed one
+        self.samplingSeed = seed
+        if self.backendPool is not None: # Pooled clients are shared, so the seed is applied per call (getCallModel)
+            return
+        if self.usesOpenAI and not isScriptedModel(self.modelName):
+            self.model.model_kwargs["seed"] = seed
+        else:
+            self.model.seed = seed # structuredModel binds this same model, so it picks the seed up too
+
+    def setResponseSchema(self, schema): # Constrain responses to the proposal schema (structuredOutput agents only)
+        self.responseSchema = schema
+        self.structuredModel = self.bindResponseSchema(self.model)
+
+    def bindResponseSchema(self, model):
+        if self.usesOpenAI:
+            return model.bind(response_format={"type": "json_schema", "json_schema": {"name": "proposal", "schema": self.responseSchema, "strict": True}})
+        return model.bind(format=self.responseSchema)
+
+    def renderStructuredResponse(self, responseContent): # Turn the schema JSON into the usual message + 'json' block, returns (text, payload)
+        try:
+            payload = json.loads(responseContent)
+        except json.JSONDecodeError:
+            return responseContent, None # Leave it to the free-text parser and the retry loop
+        return f"{payload.get('message', '')}\n\n{formatProposalBlock(payload.get('my_tasks', []), payload.get('partner_tasks', []), payload.get('has_deal', 'False'))}", payload
+
+    async def streamResponseAsync(self, model, messages, callRecord, callStart, continuation=False): # Stream the response, stopping once the proposal block is complete
+        """
+        Returns (text, lastChunk). Sets callRecord.timeToFirstToken; lastChunk carries the usage metadata
+        only if the stream ran to the end. Reasoning models' <think> blocks are filtered out as they stream;
+        if the reasoning runs past thinkingBudget, the stream is stopped and the answer asked for right away
+        (answerAfterReasoningAsync). continuation streams have no budget.
+        """
+        reasoningFilter = ReasoningStreamFilter(None if continuation else self.thinkingBudget) if self.isReasoningModel else None
+        detector = IncrementalProposalDetector() if self.streamResponses else None
+        answer = ""
+        stream = model.astream(messages)
+        lastChunk = None
         try:
-            loop = asyncio.get_event_loop()
-            response = loop.run_until_complete(
-                asyncio.wait_for(
-                    self.generateResponseAsync(role, inputText),
-                    timeout = self.responseTimeout
-                    )
+            async for chunk in stream:
+                content = chunk.content if isinstance(chunk, BaseMessageChunk) else chunk
+                if content and callRecord.timeToFirstToken is None:
+                    callRecord.timeToFirstToken = time.perf_counter() - callStart
+                lastChunk = chunk
+                if reasoningFilter is not None:
+                    content = reasoningFilter.feed(content)
+                    if reasoningFilter.overBudget:
+                        lastChunk = None
+                        break
+                answer += content
+                if detector is not None and detector.feed(content):
+                    self.numEarlyStops += 1
+                    lastChunk = None # Usage arrives with the final chunk, which an early stop never sees
+                    break # Closing the stream below cancels the rest of the generation
+        finally:
+            await stream.aclose()
+        if reasoningFilter is not None:
+            if reasoningFilter.overBudget: # Cut off on purpose, so the open block is reasoning
+                callRecord.reasoningTokens += reasoningFilter.reasoningTokens
+                callRecord.reasoningSeconds += reasoningFilter.reasoningSeconds
+                return await self.answerAfterReasoningAsync(model, messages, reasoningFilter.reasoning, callRecord, callStart)
+            remainder = reasoningFilter.finish()
+            answer += remainder
+            if detector is not None and not detector.isComplete:
+                detector.feed(remainder)
+            callRecord.reasoningTokens += reasoningFilter.reasoningTokens
+            callRecord.reasoningSeconds += reasoningFilter.reasoningSeconds
+        return (detector.getTrimmedText() if detector is not None and detector.isComplete else answer), lastChunk
+
+    async def answerAfterReasoningAsync(self, model, messages, reasoning, callRecord, callStart):
+        """
+        End a reasoning phase that ran past the thinking budget: close the <think> block in an assistant prefill
+        and stream the answer from there. "truncate" keeps the reasoning so far, "skip" answers without it.
+        """
+        self.numBudgetStops += 1
+        callRecord.thinkingBudgetHit = True
+        keptReasoning = reasoning if self.thinkingBudgetAction == "truncate" else ""
+        prefill = AIMessage(content=f"<think>\n{keptReasoning.strip()}\n</think>\n\n")
+        return await self.streamResponseAsync(model, list(messages) + [prefill], callRecord, callStart, continuation=True)
+
+    async def generateTimedResponseAsync(self, role=None, inputText=None): # Generate response, giving up after the response timeout
+        timeout = self.getResponseTimeout()
+        try:
+            return await asyncio.wait_for(
+                self.generateResponseAsync(role, inputText),
+                timeout = timeout
                 )
-            return response
         except asyncio.TimeoutError:
             print(f"{Fore.RED}Timeout error while generating response for {self.agentName}{Fore.RESET}")
+            if self.callRecords and self.callRecords[-1].latency is None: # The call that was cut off
+                self.callRecords[-1].timedOut = True
+                self.callRecords[-1].latency = timeout
+                if self.backendPool is not None and self.callRecords[-1].endpoint is not None:
+                    self.backendPool.recordTimeout(self.callRecords[-1].endpoint)
+            if self.latencyTracker is not None:
+                self.latencyTracker.recordTimeout(self.modelName, timeout)
             return NegotiationFlag.TIMEOUTERROR
+
+    def generateResponse(self, role=None, inputText=None): # Generate response based on input
+        return runSync(self.generateTimedResponseAsync(role, inputText))
         
     def printMemory(self):
         print(f"----------------{Fore.LIGHTYELLOW_EX}{self.agentName}'s Memory:{Fore.RESET}----------------")
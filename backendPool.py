@@ -0,0 +1,154 @@
+from langchain_ollama import ChatOllama
+from roundAnalysis import LRUCache
+from colorama import Fore
+import asyncio
+import itertools
+import time
+
+class Endpoint:
+    """
+    One Ollama server in a BackendPool, with its load and health.
+    An endpoint is marked unhealthy after unhealthyAfter consecutive failed calls and gets a probe call
+    once retryUnhealthyAfter seconds have passed; a successful call makes it healthy again.
+    """
+    def __init__(self, url):
+        self.url = url
+        self.inFlight = 0 # Calls currently running against this endpoint
+        self.numRequests = 0
+        self.numFailures = 0
+        self.numCancelled = 0 # Calls given up by the caller (losing best-of-k samples and hedges, stale prefills)
+        self.numSuccesses = 0
+        self.consecutiveFailures = 0
+        self.healthy = True
+        self.unhealthySince = None
+        self.totalLatency = 0.0 # Seconds, over successful calls
+
+    @property
+    def meanLatency(self):
+        return self.totalLatency / self.numSuccesses if self.numSuccesses > 0 else None
+
+class BackendPool:
+    """
+    Spreads Ollama calls over several endpoints and reuses one chat client (and so one HTTP connection pool)
+    per endpoint, model and sampling parameters across rounds, instead of a new client per Agent.
+
+    Strategies:
+        round_robin  - endpoints take turns
+        least_loaded - the endpoint with the fewest calls in flight, ties broken round robin
+    Unhealthy endpoints are skipped until their retry delay has passed. If every endpoint is unhealthy,
+    the one with the fewest consecutive failures is used, so a run never stalls on the pool alone.
+    setModelAffinity restricts a model to the endpoints it was placed on (see sweepPlanner), and keepAlive
+    is passed to every client so loaded models stay resident between calls.
+    """
+    STRATEGIES = ("round_robin", "least_loaded")
+
+    def __init__(self, endpoints, strategy="least_loaded", unhealthyAfter=3, retryUnhealthyAfter=30.0, maxClients=64, keepAlive=None):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown backend pool strategy: {strategy}")
+        if not endpoints:
+            raise ValueError("A backend pool needs at least one endpoint")
+        self.endpoints = [Endpoint(url) for url in endpoints]
+        self.strategy = strategy
+        self.unhealthyAfter = unhealthyAfter
+        self.retryUnhealthyAfter = retryUnhealthyAfter
+        self.clients = LRUCache(maxClients)
+        self.clientLoop = None # Event loop the cached clients' async connections belong to
+        self.turns = itertools.count()
+        self.keepAlive = keepAlive # Ollama keep_alive for pooled clients, e.g. "30m" or -1 (forever); None keeps the server default
+        self.modelEndpoints = {} # Model name -> endpoint URLs it may run on; models not listed may run anywhere
+
+    def setModelAffinity(self, modelEndpoints):
+        self.modelEndpoints = {model: list(urls) for model, urls in modelEndpoints.items()}
+
+    def getModelUrls(self, modelName): # Endpoint URLs modelName may run on
+        return self.modelEndpoints.get(modelName) or [endpoint.url for endpoint in self.endpoints]
+
+    def getCandidates(self, modelName=None):
+        now = time.monotonic()
+        endpoints = self.endpoints
+        if modelName in self.modelEndpoints:
+            endpoints = [endpoint for endpoint in self.endpoints if endpoint.url in self.modelEndpoints[modelName]] or self.endpoints
+        candidates = [endpoint for endpoint in endpoints
+                      if endpoint.healthy or now - endpoint.unhealthySince >= self.retryUnhealthyAfter]
+        if not candidates:
+            candidates = [min(endpoints, key=lambda endpoint: endpoint.consecutiveFailures)]
+        return candidates
+
+    def acquire(self, modelName=None, preferredUrl=None, avoidUrl=None):
+        """
+        Pick an endpoint for one call; every acquire must be matched by a release.
+        preferredUrl is used whenever it is a candidate, e.g. to return to the endpoint holding an agent's cached prompt.
+        avoidUrl is skipped unless it is the only candidate, e.g. so a hedged request goes to a different endpoint.
+        """
+        candidates = self.getCandidates(modelName)
+        candidates = [candidate for candidate in candidates if candidate.url != avoidUrl] or candidates
+        turn = next(self.turns)
+        preferred = [candidate for candidate in candidates if candidate.url == preferredUrl]
+        if preferred:
+            endpoint = preferred[0]
+        elif self.strategy == "round_robin":
+            endpoint = candidates[turn % len(candidates)]
+        else:
+            rotated = candidates[turn % len(candidates):] + candidates[:turn % len(candidates)]
+            endpoint = min(rotated, key=lambda candidate: candidate.inFlight)
+        endpoint.inFlight += 1
+        endpoint.numRequests += 1
+        return endpoint
+
+    def release(self, endpoint, succeeded, latency=None): # succeeded is None for a call the caller cancelled, which says nothing about the endpoint
+        endpoint.inFlight -= 1
+        if succeeded is None:
+            endpoint.numCancelled += 1
+            return
+        if succeeded:
+            endpoint.numSuccesses += 1
+            endpoint.consecutiveFailures = 0
+            endpoint.healthy = True
+            endpoint.unhealthySince = None
+            if latency is not None:
+                endpoint.totalLatency += latency
+            return
+        self.recordFailure(endpoint)
+
+    def recordFailure(self, endpoint): # A failed call, or one cancelled because it ran past its timeout
+        endpoint.numFailures += 1
+        endpoint.consecutiveFailures += 1
+        if endpoint.consecutiveFailures >= self.unhealthyAfter:
+            if endpoint.healthy:
+                print(f"{Fore.RED}Backend {endpoint.url} marked unhealthy after {endpoint.consecutiveFailures} failed calls{Fore.RESET}")
+            endpoint.healthy = False
+            endpoint.unhealthySince = time.monotonic() # A failed probe restarts the retry delay
+
+    def recordTimeout(self, url): # Count a timed-out call (released as cancelled) as a failure of its endpoint
+        for endpoint in self.endpoints:
+            if endpoint.url == url:
+                endpoint.numCancelled -= 1
+                self.recordFailure(endpoint)
+
+    def getClient(self, endpoint, modelName, **params):
+        """
+        Chat client for modelName on endpoint with the given ChatOllama parameters, created once and reused.
+        Async HTTP connections can't outlive their event loop, so the cache is cleared when the loop changes
+        (e.g. between experiments that each run their rounds with asyncio.run).
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None and loop is not self.clientLoop:
+            self.clients.clear()
+            self.clientLoop = loop
+        if self.keepAlive is not None:
+            params = dict(params, keep_alive=self.keepAlive)
+        key = (endpoint.url, modelName, tuple(sorted(params.items())))
+        client = self.clients.get(key)
+        if client is None:
+            client = ChatOllama(model=modelName, base_url=endpoint.url, **params)
+            self.clients.put(key, client)
+        return client
+
+    def printSummary(self):
+        for endpoint in self.endpoints:
+            status = f"{Fore.GREEN}healthy" if endpoint.healthy else f"{Fore.RED}unhealthy"
+            meanLatency = f"{endpoint.meanLatency:.2f}s" if endpoint.meanLatency is not None else "-"
+            print(f"{endpoint.url}: {endpoint.numRequests} calls, {endpoint.numFailures} failed, {endpoint.numCancelled} cancelled, mean latency {meanLatency}, {status}{Fore.RESET}")
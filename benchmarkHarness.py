@@ -0,0 +1,110 @@
+from roundScheduler import RoundScheduler
+from negotiationCheckpoint import ResumePolicy
+from colorama import Fore
+import contextlib
+import datetime
+import json
+import os
+import time
+
+def buildNegotiationKwargs(numTasks, maxIterations, modelName, agentOptions=None):
+    return {
+        "numTasks": numTasks,
+        "maxIterations": maxIterations,
+        "agent1Model": modelName,
+        "agent1usesOpenAI": False,
+        "agent1Type": "default",
+        "agent2Model": modelName,
+        "agent2usesOpenAI": False,
+        "agent2Type": "default",
+        "agent1Name": "Finn",
+        "agent2Name": "Jake",
+        "hasInitialProposal": False,
+        "agentOptions": agentOptions,
+    }
+
+def runHarnessBenchmark(numTasks, maxIterations, maxConcurrentRounds, numRounds, modelName="scripted", agentOptions=None, quiet=True, resumePolicy=None):
+    """
+    Runs numRounds negotiations against the scripted local backend and returns throughput and per-phase timings.
+    Phase times are summed over all rounds; overheadPerTurnMs is time in the turn loop not spent waiting on the model.
+    """
+    scheduler = RoundScheduler(maxConcurrentRounds=maxConcurrentRounds, backendLimits={}, resumePolicy=resumePolicy)
+    negotiationKwargs = buildNegotiationKwargs(numTasks, maxIterations, modelName, agentOptions)
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, (contextlib.redirect_stdout(devnull) if quiet else contextlib.nullcontext()):
+        negotiations = scheduler.runRounds(range(1, numRounds + 1), negotiationKwargs)
+    wallTime = time.perf_counter() - start
+
+    phaseTimes = {}
+    for n in negotiations:
+        for phase, seconds in n.phaseTimes.items():
+            phaseTimes[phase] = phaseTimes.get(phase, 0.0) + seconds
+    numTurns = sum(n.numIterations for n in negotiations)
+    numRetries = sum(sum(n.retryCounts.values()) for n in negotiations)
+    perTurnMs = lambda seconds: 1000 * seconds / max(numTurns, 1)
+    return {
+        "modelName": modelName,
+        "numTasks": numTasks,
+        "maxIterations": maxIterations,
+        "maxConcurrentRounds": maxConcurrentRounds,
+        "numRounds": numRounds,
+        "wallTime": wallTime,
+        "roundsPerSecond": numRounds / wallTime,
+        "turnsPerSecond": numTurns / wallTime,
+        "numTurns": numTurns,
+        "numModelCalls": numTurns + numRetries,
+        "numRetries": numRetries,
+        "numRepairs": sum(sum(n.repairCounts.values()) for n in negotiations),
+        "numResumes": sum(n.numResumes for n in negotiations),
+        "numRestarts": sum(n.numRestarts for n in negotiations),
+        "numDNF": sum(n.DNF for n in negotiations),
+        "setupPerRoundMs": 1000 * phaseTimes["setup"] / numRounds,
+        "generatePerTurnMs": perTurnMs(phaseTimes["generate"]),
+        "parsePerTurnMs": perTurnMs(phaseTimes["parse"]),
+        "repairPerTurnMs": perTurnMs(phaseTimes["repair"]),
+        "validatePerTurnMs": perTurnMs(phaseTimes["validate"]),
+        "overheadPerTurnMs": perTurnMs(phaseTimes["turnLoop"] - phaseTimes["generate"]),
+    }
+
+def printResults(results):
+    print(f"{'model':<44}{'tasks':>6}{'iters':>6}{'conc':>6}{'rounds/s':>10}{'turns/s':>10}{'setup ms':>10}{'gen ms':>9}{'parse ms':>10}{'valid ms':>10}{'ovh ms':>9}{'retries':>9}{'restarts':>10}{'dnf':>5}")
+    for r in results:
+        print(f"{r['modelName']:<44}{r['numTasks']:>6}{r['maxIterations']:>6}{r['maxConcurrentRounds']:>6}{r['roundsPerSecond']:>10.1f}{r['turnsPerSecond']:>10.1f}"
+              f"{r['setupPerRoundMs']:>10.3f}{r['generatePerTurnMs']:>9.3f}{r['parsePerTurnMs']:>10.3f}{r['validatePerTurnMs']:>10.3f}{r['overheadPerTurnMs']:>9.3f}{r['numRetries']:>9}{r['numRestarts']:>10}{r['numDNF']:>5}")
+
+def main():
+    # Benchmark grid
+    numRounds = 50
+    taskCounts = [4, 8, 12]
+    iterationLimits = [16, 32]
+    concurrencyLevels = [1, 4, 16]
+    modelNames = [
+        "scripted", # Pure orchestration overhead
+        "scripted:latency=0.05,jitter=0.02,malformed=0.05,timeout=0.02,mismatch=0.05", # Realistic latency and failures
+    ]
+    # Rarely agrees within a short budget, so rounds hit maxIterations: exercises reseeded restarts and rounds given up as DNF
+    dnfModelName, dnfNumTasks, dnfMaxIterations = "scripted:accept=0.05", 4, 8
+    dnfResumePolicy = ResumePolicy(maxRestarts=5)
+    outputDirectory = "Logs/Benchmarks"
+
+    results = []
+    for modelName in modelNames:
+        for numTasks in taskCounts:
+            for maxIterations in iterationLimits:
+                for maxConcurrentRounds in concurrencyLevels:
+                    print(f"{Fore.GREEN}Running {numRounds} rounds: {modelName}, {numTasks} tasks, maxIterations {maxIterations}, concurrency {maxConcurrentRounds}{Fore.RESET}")
+                    results.append(runHarnessBenchmark(numTasks, maxIterations, maxConcurrentRounds, numRounds, modelName))
+    for maxConcurrentRounds in concurrencyLevels:
+        print(f"{Fore.GREEN}Running {numRounds} rounds: {dnfModelName}, {dnfNumTasks} tasks, maxIterations {dnfMaxIterations}, concurrency {maxConcurrentRounds}{Fore.RESET}")
+        results.append(runHarnessBenchmark(dnfNumTasks, dnfMaxIterations, maxConcurrentRounds, numRounds, dnfModelName, resumePolicy=dnfResumePolicy))
+    printResults(results)
+
+    os.makedirs(outputDirectory, exist_ok=True)
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H:%M:%S")
+    outputPath = os.path.join(outputDirectory, f"harness_{timestamp}.json")
+    with open(outputPath, "w") as file:
+        json.dump({"timestamp": timestamp, "results": results}, file, indent=4)
+    print(f"{Fore.GREEN}Results saved to {outputPath}{Fore.RESET}")
+
+if __name__ == "__main__":
+    main()
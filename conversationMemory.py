@@ -0,0 +1,134 @@
+from langchain.schema import AIMessage, HumanMessage, SystemMessage
+from telemetry import estimateTokens
+
+class ConversationMemory:
+    """
+    An agent's message history, sent to the model as is (no prompt template).
+    Messages are appended and retracted at the end in O(1). System messages added as feedback during a turn
+    (format errors, mismatch warnings) are transient: their positions are indexed, so clearing them doesn't
+    rebuild the history. numTokens is an estimated token count kept up to date message by message.
+    Supports len(), iteration, reversed() and indexing like the plain list it replaces.
+    """
+    def __init__(self, messages=None):
+        self.messages = []
+        self.tokenCounts = [] # Estimated tokens per message
+        self.numTokens = 0
+        self.transientIndices = [] # Positions of transient system messages, ascending
+        for message in messages or []:
+            self.append(message)
+
+    def append(self, message, transient=False):
+        if transient:
+            self.transientIndices.append(len(self.messages))
+        self.messages.append(message)
+        tokens = estimateTokens(str(message.content))
+        self.tokenCounts.append(tokens)
+        self.numTokens += tokens
+
+    def remove(self, index): # Remove and return the message at index; cheap near the end
+        index = index % len(self.messages)
+        message = self.messages.pop(index)
+        self.numTokens -= self.tokenCounts.pop(index)
+        if self.transientIndices and self.transientIndices[-1] >= index:
+            self.transientIndices = [i for i in self.transientIndices if i < index] + [i - 1 for i in self.transientIndices if i > index]
+        return message
+
+    def retract(self): # Remove and return the last message
+        return self.remove(-1)
+
+    def retractLastResponse(self):
+        """
+        Remove the current turn's latest assistant message (a rejected response), keeping the feedback after it.
+        Returns the removed message, or None if the turn has no response yet (e.g. after a timeout).
+        """
+        for index in range(len(self.messages) - 1, self.getTurnStart() - 1, -1):
+            if isinstance(self.messages[index], AIMessage):
+                return self.remove(index)
+        return None
+
+    def replace(self, index, message):
+        index = index % len(self.messages)
+        tokens = estimateTokens(str(message.content))
+        self.numTokens += tokens - self.tokenCounts[index]
+        self.tokenCounts[index] = tokens
+        self.messages[index] = message
+
+    def getTurnStart(self): # Index just after the partner's latest message
+        for index in range(len(self.messages) - 1, -1, -1):
+            if isinstance(self.messages[index], HumanMessage):
+                return index + 1
+        return 1 if self.messages and isinstance(self.messages[0], SystemMessage) else 0
+
+    def clearTransient(self, fromIndex=0): # Drop transient system messages at or after fromIndex
+        for index in reversed([i for i in self.transientIndices if i >= fromIndex]):
+            self.remove(index)
+
+    def getMessages(self): # The live list; callers must not modify it
+        return self.messages
+
+    def copy(self):
+        memory = ConversationMemory()
+        memory.messages = list(self.messages)
+        memory.tokenCounts = list(self.tokenCounts)
+        memory.numTokens = self.numTokens
+        memory.transientIndices = list(self.transientIndices)
+        return memory
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __reversed__(self):
+        return reversed(self.messages)
+
+    def __getitem__(self, index):
+        return self.messages[index]
+
+class ContextWindow:
+    """
+    Bounds the prompt an agent sends: the system instructions, the last maxExchanges exchanges (partner message and
+    reply) and the current turn, with a machine-generated negotiation state summary just before the current turn
+    standing in for everything left out. Older exchanges are dropped slideBy at a time, so the prompt prefix stays
+    the same between slides. If maxPromptTokens is set, further exchanges are dropped, oldest first, until the
+    estimated prompt fits; the instructions, summary and current turn are always sent.
+    """
+    def __init__(self, maxExchanges=4, slideBy=1, maxPromptTokens=None):
+        self.maxExchanges = maxExchanges
+        self.slideBy = max(1, slideBy)
+        self.maxPromptTokens = maxPromptTokens
+
+    def selectMessages(self, memory, stateSummary=None):
+        """
+        Returns (messages, estimatedTokens) to send instead of the full history.
+        """
+        messages, tokenCounts = memory.messages, memory.tokenCounts
+        if not messages:
+            return [], 0
+        turnStart = memory.getTurnStart() - 1 # The partner's latest message opens the current turn
+        if turnStart < 1 or not isinstance(messages[turnStart], HumanMessage):
+            turnStart = len(messages)
+        exchangeStarts = [i for i in range(1, turnStart) if isinstance(messages[i], HumanMessage)]
+        def windowStart(numDropped): # First message kept after the instructions
+            if numDropped == 0:
+                return 1
+            return exchangeStarts[numDropped] if numDropped < len(exchangeStarts) else turnStart
+
+        numDropped = 0
+        if len(exchangeStarts) > self.maxExchanges:
+            excess = len(exchangeStarts) - self.maxExchanges
+            numDropped = min(len(exchangeStarts), -(-excess // self.slideBy) * self.slideBy)
+        summaryTokens = estimateTokens(stateSummary) if stateSummary else 0
+        fixedTokens = tokenCounts[0] + summaryTokens + sum(tokenCounts[turnStart:])
+        if self.maxPromptTokens is not None:
+            while numDropped < len(exchangeStarts) and fixedTokens + sum(tokenCounts[windowStart(numDropped):turnStart]) > self.maxPromptTokens:
+                numDropped += 1
+        if numDropped == 0: # Nothing left out, so the full history goes as is
+            return messages, memory.numTokens
+        start = windowStart(numDropped)
+        windowTokens = fixedTokens + sum(tokenCounts[start:turnStart])
+        if windowTokens >= memory.numTokens: # The summary costs more than the exchanges it replaces
+            return messages, memory.numTokens
+        summary = [SystemMessage(content=stateSummary)] if stateSummary else []
+        return [messages[0]] + messages[start:turnStart] + summary + messages[turnStart:], windowTokens
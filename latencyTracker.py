@@ -0,0 +1,108 @@
+from collections import deque
+from colorama import Fore
+
+class ModelLatency:
+    """
+    Rolling latencies of one model's calls (timed-out calls count as taking their timeout), and how hedging did for it.
+    """
+    def __init__(self, windowSize):
+        self.latencies = deque(maxlen=windowSize) # Seconds, most recent last
+        self.numCalls = 0
+        self.numTimeouts = 0
+        self.numHedges = 0
+        self.hedgeWins = 0
+        self.secondsSaved = 0.0 # Estimated, see LatencyTracker.estimateSecondsSaved
+
+class LatencyTracker:
+    """
+    Per-model call latencies over a rolling window, shared by the agents of a run (Agent latencyTracker option).
+
+    Adaptive timeouts (adaptiveTimeouts=True): once a model has minSamples calls, its response timeout becomes
+    timeoutMultiplier times its timeoutPercentile latency, clamped to [minTimeout, maxTimeout]. Otherwise, and until
+    then, the agent's own fixed responseTimeout applies.
+    Hedging (hedgePercentile set): a call still running after the model's hedgePercentile latency gets a duplicate
+    request, on another pool endpoint when there is one, and whichever finishes first is used. At most
+    maxHedgeFraction of a model's calls are hedged, so a slow backend isn't buried under duplicates.
+    """
+    def __init__(self, windowSize=200, minSamples=20, adaptiveTimeouts=False, timeoutPercentile=0.99, timeoutMultiplier=3.0, minTimeout=30.0, maxTimeout=320.0,
+                 hedgePercentile=None, maxHedgeFraction=0.1):
+        self.windowSize = windowSize
+        self.adaptiveTimeouts = adaptiveTimeouts # False keeps the agents' fixed responseTimeout
+        self.minSamples = minSamples
+        self.timeoutPercentile = timeoutPercentile
+        self.timeoutMultiplier = timeoutMultiplier
+        self.minTimeout = minTimeout
+        self.maxTimeout = maxTimeout
+        self.hedgePercentile = hedgePercentile # e.g. 0.95; None disables hedging
+        self.maxHedgeFraction = maxHedgeFraction
+        self.models = {} # Model name -> ModelLatency
+
+    def getModel(self, modelName):
+        if modelName not in self.models:
+            self.models[modelName] = ModelLatency(self.windowSize)
+        return self.models[modelName]
+
+    def record(self, modelName, latency): # A successful, uncached call
+        model = self.getModel(modelName)
+        model.latencies.append(latency)
+        model.numCalls += 1
+
+    def recordTimeout(self, modelName, timeout): # A call cut off after timeout seconds
+        """
+        The call's real latency is unknown but at least timeout, so it is recorded as timeout. Without this a model
+        that keeps timing out never gets a latency sample and its timeout can't grow; with it, timeouts push the
+        percentile up and the next timeout is timeoutMultiplier times longer (up to maxTimeout).
+        """
+        self.record(modelName, timeout)
+        self.getModel(modelName).numTimeouts += 1
+
+    def getPercentile(self, modelName, percentile): # Nearest-rank percentile over the window, None until minSamples calls
+        latencies = self.getModel(modelName).latencies
+        if len(latencies) < self.minSamples:
+            return None
+        ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, int(percentile * len(ordered)))]
+
+    def getTimeout(self, modelName, defaultTimeout):
+        if not self.adaptiveTimeouts:
+            return defaultTimeout
+        latency = self.getPercentile(modelName, self.timeoutPercentile)
+        if latency is None:
+            return defaultTimeout
+        return min(self.maxTimeout, max(self.minTimeout, self.timeoutMultiplier * latency))
+
+    def getHedgeDelay(self, modelName): # Seconds after which a call gets a hedge, None if it shouldn't
+        if self.hedgePercentile is None:
+            return None
+        model = self.getModel(modelName)
+        if model.numHedges >= self.maxHedgeFraction * max(model.numCalls, 1):
+            return None
+        return self.getPercentile(modelName, self.hedgePercentile)
+
+    def estimateSecondsSaved(self, modelName, latency, timeout):
+        """
+        Tail latency a winning hedge saved on a call that took latency seconds. The cancelled primary request never
+        finished, so how long it would have taken is estimated as the mean of the recorded latencies longer than
+        latency, or the timeout if there were none (it looked stuck).
+        """
+        slower = [recorded for recorded in self.getModel(modelName).latencies if recorded > latency]
+        primaryLatency = sum(slower) / len(slower) if slower else timeout
+        return max(0.0, primaryLatency - latency)
+
+    def recordHedge(self, modelName, won, secondsSaved=0.0):
+        model = self.getModel(modelName)
+        model.numHedges += 1
+        if won:
+            model.hedgeWins += 1
+            model.secondsSaved += secondsSaved
+
+    def printSummary(self):
+        for modelName, model in self.models.items():
+            percentiles = [self.getPercentile(modelName, percentile) for percentile in (0.5, 0.95, 0.99)]
+            percentileText = "/".join(f"{latency:.2f}" for latency in percentiles) + "s" if percentiles[0] is not None else "not enough calls"
+            line = f"{modelName}: {model.numCalls} calls ({model.numTimeouts} timed out), p50/p95/p99 {percentileText}"
+            if self.adaptiveTimeouts:
+                line += f", timeout {self.getTimeout(modelName, self.maxTimeout):.0f}s"
+            if model.numHedges:
+                line += f", {model.numHedges} hedged ({model.hedgeWins / model.numHedges:.0%} won by the hedge, about {model.secondsSaved:.1f}s of tail latency saved)"
+            print(f"{Fore.GREEN}{line}{Fore.RESET}")
@@ -0,0 +1,170 @@
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from psrMappings import psrMapping
+from typing import Optional
+import asyncio
+import json
+import ast
+import random
+import re
+import time
+
+scriptedModelPrefix = "scripted"
+confidenceLevels = {label: value for value, label in psrMapping.items()} # "Average" -> 0.5
+
+def isScriptedModel(modelName):
+    return modelName.lower().startswith(scriptedModelPrefix)
+
+def createScriptedModel(modelName):
+    """
+    Build a ScriptedChatModel from a model name such as "scripted" or
+    "scripted:latency=0.2,malformed=0.05,timeout=0.01,mismatch=0.05,accept=0.25,think=300".
+    """
+    options = {}
+    _, _, optionText = modelName.partition(":")
+    for option in filter(None, optionText.split(",")):
+        key, _, value = option.partition("=")
+        options[key.strip()] = float(value)
+    fieldNames = {"latency": "latency", "jitter": "latencyJitter", "malformed": "malformedRate", "timeout": "timeoutRate", "mismatch": "mismatchRate", "accept": "acceptStep", "think": "thinkTokens"}
+    unknownOptions = set(options) - set(fieldNames)
+    if unknownOptions:
+        raise ValueError(f"Unknown scripted model options: {', '.join(sorted(unknownOptions))}")
+    return ScriptedChatModel(model=modelName, **{fieldNames[key]: value for key, value in options.items()})
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Local stand-in for an LLM backend that negotiates by rule, so the harness can run without Ollama or OpenAI.
+    It reads its name and confidence levels from the system instructions, opens by claiming the tasks it is
+    best at, and accepts the partner's proposal with a probability that grows by acceptStep every turn.
+    Every reply ends with a proposal block in the 'json {...}' format the parser expects, or a JSON object
+    when bound with a structured-output schema.
+
+    latency (+/- latencyJitter) seconds are spent per call. Error injection rates are per call:
+    malformedRate (broken or missing proposal block), timeoutRate (raises TimeoutError) and
+    mismatchRate (agrees to a deal that differs from the partner's proposal).
+    With thinkTokens, replies open with a <think> block of about that many tokens, like a reasoning model; a
+    conversation ending in an assistant prefill (a closed <think> block) is continued with the answer only.
+    Replies are deterministic for a given seed, conversation and number of calls made so far, so a run repeats
+    exactly while a retried or windowed conversation still gets a fresh draw. The seed is the agent's sampling
+    seed (per request when served by ScriptedOllamaServer), so resumed and restarted rounds play out differently.
+    """
+    model: str = scriptedModelPrefix
+    latency: float = 0.0
+    latencyJitter: float = 0.0
+    malformedRate: float = 0.0
+    timeoutRate: float = 0.0
+    mismatchRate: float = 0.0
+    acceptStep: float = 0.25
+    thinkTokens: float = 0
+    seed: Optional[int] = None
+    numCalls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "scripted"
+
+    def getRng(self, messages):
+        lastContent = messages[-1].content if messages else ""
+        return random.Random(f"{self.seed}|{self.numCalls}|{len(messages)}|{lastContent}")
+
+    def getDelay(self, rng):
+        return max(0.0, self.latency + rng.uniform(-self.latencyJitter, self.latencyJitter))
+
+    def parseInstructions(self, messages): # (myName, partnerName, {task: myConfidence}, helperBlock) from the system instructions
+        systemText = messages[0].content if messages and isinstance(messages[0], SystemMessage) else ""
+        names = re.search(r"You are (\S+) collaborating with partner (\S+?)\.", systemText) or re.search(r"Your name is (\S+?)\..*?partner named (\S+?)\.", systemText, re.DOTALL)
+        myName, partnerName = names.groups() if names else ("Agent", "Partner")
+        confidences = {}
+        for taskName, label in re.findall(r"^(.+?): Your confidence level for this task is (.+?)\.$", systemText, re.MULTILINE):
+            confidences[taskName.strip()] = confidenceLevels.get(label.strip(), 0.5)
+        helperBlock = self.findProposal(systemText) if "my_tasks" in systemText and not confidences else None
+        return myName, partnerName, confidences, helperBlock
+
+    def findProposal(self, text): # Last proposal dict in text, or None
+        for match in reversed(list(re.finditer(r"json\s*(\{.*?\})", text, re.DOTALL))):
+            candidate = match.group(1)
+            try:
+                parsed = json.loads(candidate)
+            except json.JSONDecodeError:
+                try:
+                    parsed = ast.literal_eval(candidate)
+                except (ValueError, SyntaxError):
+                    continue
+            if isinstance(parsed, dict) and "my_tasks" in parsed:
+                return parsed
+        return None
+
+    def decide(self, messages, rng): # (myTasks, partnerTasks, hasDeal) for the next reply
+        myName, partnerName, confidences, helperBlock = self.parseInstructions(messages)
+        if helperBlock is None and not any(isinstance(message, AIMessage) for message in messages): # Helper added after the instructions (prefix-stable agents)
+            for message in messages[1:]:
+                if isinstance(message, SystemMessage):
+                    helperBlock = self.findProposal(message.content) or helperBlock
+        if helperBlock is not None: # Initial proposal helper: repeat the given allocation
+            return list(helperBlock["my_tasks"]), list(helperBlock["partner_tasks"]), False
+        partnerMessage = next((message for message in reversed(messages) if isinstance(message, HumanMessage)), None)
+        partnerProposal = self.findProposal(partnerMessage.content) if partnerMessage is not None else None
+        numTurns = sum(1 for message in messages if isinstance(message, AIMessage))
+        if partnerProposal is not None:
+            offeredTasks, keptTasks = list(partnerProposal.get("partner_tasks", [])), list(partnerProposal.get("my_tasks", []))
+            partnerHasDeal = str(partnerProposal.get("has_deal", "False")).lower() == "true"
+            if partnerHasDeal or rng.random() < numTurns * self.acceptStep:
+                if keptTasks and rng.random() < self.mismatchRate: # Agree, but to a different split
+                    offeredTasks, keptTasks = offeredTasks + keptTasks[:1], keptTasks[1:]
+                return offeredTasks, keptTasks, True
+        rankedTasks = sorted(confidences, key=lambda taskName: -confidences[taskName])
+        numMine = (len(rankedTasks) + 1) // 2
+        return rankedTasks[:numMine], rankedTasks[numMine:], False
+
+    def buildReply(self, messages, rng, structured):
+        if self.thinkTokens and not structured:
+            if messages and isinstance(messages[-1], AIMessage): # Continue a prefill that already closed the reasoning
+                return self.buildAnswer(messages[:-1], rng, structured)
+            reasoning = " ".join(["Weighing which items suit each of us."] * max(1, int(self.thinkTokens * 4 / 38)))
+            return f"<think>\n{reasoning}\n</think>\n\n{self.buildAnswer(messages, rng, structured)}"
+        return self.buildAnswer(messages, rng, structured)
+
+    def buildAnswer(self, messages, rng, structured):
+        myTasks, partnerTasks, hasDeal = self.decide(messages, rng)
+        message = "That works for me, let's lock it in." if hasDeal else "Here is a split that plays to our strengths."
+        proposal = {"my_tasks": myTasks, "partner_tasks": partnerTasks, "has_deal": str(hasDeal)}
+        if rng.random() < self.malformedRate:
+            errorKind = rng.randrange(3)
+            if errorKind == 0:
+                return message # No proposal block at all
+            if errorKind == 1:
+                return f"{message}\n\njson\n{json.dumps(proposal)[:-12]}" # Truncated JSON
+            proposal["my_tasks"] = myTasks + ["Unknown Task"]
+        if structured:
+            return json.dumps({"message": message, **proposal})
+        return f"{message}\n\njson\n{json.dumps(proposal, indent=4)}"
+
+    def checkTimeout(self):
+        self.numCalls += 1
+        if self.timeoutRate and random.Random(f"{self.seed}|timeout|{self.numCalls}").random() < self.timeoutRate:
+            raise TimeoutError("Scripted backend timeout")
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        rng = self.getRng(messages)
+        time.sleep(self.getDelay(rng))
+        self.checkTimeout()
+        content = self.buildReply(messages, rng, structured="format" in kwargs or "response_format" in kwargs)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        rng = self.getRng(messages)
+        await asyncio.sleep(self.getDelay(rng))
+        self.checkTimeout()
+        content = self.buildReply(messages, rng, structured="format" in kwargs or "response_format" in kwargs)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs): # Latency is spread over the chunks
+        rng = self.getRng(messages)
+        delay = self.getDelay(rng)
+        self.checkTimeout()
+        content = self.buildReply(messages, rng, structured="format" in kwargs or "response_format" in kwargs)
+        chunks = [content[i:i + 8] for i in range(0, len(content), 8)]
+        for chunk in chunks:
+            await asyncio.sleep(delay / len(chunks))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
@@ -1,6 +1,18 @@
 import csv
 import os
+import io
+import atexit
+import datetime
+import queue
+import threading
+import time
+try:
+    import fcntl # Cross-process file locks, POSIX only
+except ImportError:
+    fcntl = None
 
+# Columns of a round row, in the order of main.buildDataTuple
+logColumns = ["RoundNumber", "NegotiationTime", "Agent1Utility", "Agent2Utility", "NumIterations", "Agent1Items", "Agent2Items", "Items", "InitialProposal", "Agent1UsesOpenAI", "Agent2UsesOpenAI", "Agent1Model", "Agent2Model", "Agent1Type", "Agent2Type", "Agent1OutputMode", "Agent2OutputMode", "Agent1Retries", "Agent2Retries", "Agent1RepairedTurns", "Agent2RepairedTurns", "NumResumes", "NumRestarts", "Agent1PromptTokens", "Agent1CompletionTokens", "Agent2PromptTokens", "Agent2CompletionTokens", "ModelCalls", "MeanLatency", "MeanTimeToFirstToken", "TokensPerSecond", "NegotiationSeconds", "ContextTokensSaved", "StallInterventions", "TurnsRemaining", "HedgedCalls", "HedgeWins", "HedgeSecondsSaved", "ReasoningTokens", "ReasoningSeconds", "ThinkingBudgetHits", "DNF", "DNFReason"]
 
 
 def setupLogger(logFilename="negotiation.csv"):
@@ -17,13 +29,15 @@ def setupLogger(logFilename="negotiation.csv"):
         with open(logsFilePath, mode='w', newline='') as file:
             writer = csv.writer(file)
             # Define the header
-            header = ["RoundNumber", "NegotiationTime", "Agent1Utility", "Agent2Utility", "NumIterations", "Agent1Items", "Agent2Items", "Items", "InitialProposal", "Agent1UsesOpenAI", "Agent2UsesOpenAI", "Agent1Model", "Agent2Model", "Agent1Type", "Agent2Type"]
+            header = logColumns
             writer.writerow(header)
             
 def logTuple(logFilename, dataTuple):
     """
     Logs a tuple of data to the CSV file.
     """
+    if logFilename in openLoggers: # Route through the experiment's buffered logger
+        return openLoggers[logFilename].logTuple(dataTuple)
     logsFolder = "Logs"
     logsFilePath = os.path.join(logsFolder, logFilename)
     with open(logsFilePath, mode='a', newline='') as file:
@@ -34,8 +48,118 @@ def log(logFilename, label, value):
     """
     Logs a label-value pair to the CSV file.
     """
+    if logFilename in openLoggers:
+        return openLoggers[logFilename].log(label, value)
     logsFolder = "Logs"
     logsFilePath = os.path.join(logsFolder, logFilename)
     with open(logsFilePath, mode='a', newline='') as file:
         writer = csv.writer(file)
         writer.writerow([label, value])
+
+openLoggers = {} # logFilename -> open ExperimentLogger, used by logTuple and log
+
+class ExperimentLogger:
+    """
+    Buffered CSV logger for one experiment. Producers (any thread or coroutine) only put rows on a queue;
+    a single writer thread owns the file handle and writes rows in batches, every flushInterval seconds or
+    every flushEveryRows rows, on flush(), on close() and at interpreter exit. Each batch is written with one
+    write call under an exclusive file lock, so concurrent runs can't interleave partial rows.
+    While the logger is open, the module-level logTuple and log functions for its file go through it.
+    """
+    flushSignal = object()
+    stopSignal = object()
+
+    def __init__(self, logFilename, flushInterval=2.0, flushEveryRows=100):
+        setupLogger(logFilename)
+        self.logFilename = logFilename
+        self.logFilepath = os.path.join("Logs", logFilename)
+        self.flushInterval = flushInterval
+        self.flushEveryRows = flushEveryRows
+        self.queue = queue.Queue()
+        self.pendingRows = []
+        self.numRows = 0
+        self.numFlushes = 0
+        self.startTime = time.monotonic()
+        self.closed = False
+        self.file = open(self.logFilepath, mode='a', newline='')
+        self.writerThread = threading.Thread(target=self.runWriter, name=f"ExperimentLogger-{logFilename}", daemon=True)
+        self.writerThread.start()
+        openLoggers[logFilename] = self
+        atexit.register(self.close)
+
+    def logTuple(self, dataTuple):
+        self.queue.put(list(dataTuple))
+
+    def log(self, label, value):
+        self.queue.put([label, value])
+
+    def flush(self): # Block until every row logged so far is on disk
+        if not self.closed:
+            self.queue.put(self.flushSignal)
+            self.queue.join()
+
+    def runWriter(self):
+        lastFlush = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flushInterval)
+            except queue.Empty:
+                item = None
+            try:
+                if item is self.stopSignal:
+                    self.writePending()
+                    return
+                if item is not None and item is not self.flushSignal:
+                    self.pendingRows.append(item)
+                if item is self.flushSignal or len(self.pendingRows) >= self.flushEveryRows or time.monotonic() - lastFlush >= self.flushInterval:
+                    self.writePending()
+                    lastFlush = time.monotonic()
+            except Exception as e: # Keep the writer alive so producers never block on a dead queue
+                print(f"Error writing to {self.logFilepath}: {e}")
+            finally:
+                if item is not None:
+                    self.queue.task_done()
+
+    def writePending(self):
+        if not self.pendingRows:
+            return
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(self.pendingRows)
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        try:
+            self.file.write(buffer.getvalue())
+            self.file.flush()
+        finally:
+            if fcntl is not None:
+                fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.numRows += len(self.pendingRows)
+        self.numFlushes += 1
+        self.pendingRows = []
+
+    def close(self, summary=None):
+        """
+        Write the summary block (a "Summary" row followed by label-value rows), flush everything and close the file.
+        summary is a dict of extra label-value pairs; rows logged and logger wall time are always included.
+        """
+        if self.closed:
+            return
+        summaryRows = dict(summary or {})
+        summaryRows["RowsLogged"] = self.numRows + len(self.pendingRows) + self.queue.qsize() # Rows still queued will be written before the summary
+        summaryRows["LoggerWallTime"] = datetime.timedelta(seconds=round(time.monotonic() - self.startTime))
+        self.log("Summary", datetime.datetime.now().strftime("%Y-%m-%d_%H:%M:%S"))
+        for label, value in summaryRows.items():
+            self.log(label, value)
+        self.queue.put(self.stopSignal)
+        self.writerThread.join()
+        self.closed = True
+        self.file.close()
+        openLoggers.pop(self.logFilename, None)
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
@@ -1,5 +1,12 @@
-from negotiation import Negotiation
-from logger import setupLogger, log, logTuple
+from roundScheduler import RoundScheduler
+from negotiationCheckpoint import ResumePolicy
+from responseCache import ResponseCache
+from typedLog import TypedLogWriter
+from telemetry import TurnTelemetryWriter, getRoundTelemetry
+from logger import ExperimentLogger
+from backendPool import BackendPool
+from sweepPlanner import SweepPlanner
+from latencyTracker import LatencyTracker
 import datetime
 import matplotlib.pyplot as plt
 import glob
@@ -7,8 +14,6 @@ import os
 
 def main():      
 
-    #TODO: Log tokens used in negotiation round by each agent
-
     #Test Parameters
     numRounds = 50
     # numTasks = 8
@@ -25,61 +30,194 @@ def main():
     agent2usesOpenAI = False
     agent2Type = "default"
 
+    # On-disk response cache: "passthrough" (off), "record" (always call the model and store) or "replay" (serve stored responses)
+    responseCache = ResponseCache(path="Logs/responseCache.sqlite", mode="passthrough", maxSizeBytes=256 * 1024 * 1024, strictReplay=False)
+
+    # Ollama servers to spread calls over ("round_robin" or "least_loaded"), with the GB of memory each has for model weights.
+    # Clients are reused across rounds. Raise backendLimits["ollama"] below to match the combined capacity of the endpoints.
+    ollamaHosts = {"http://localhost:11434": 48}
+    # Sweep planning: run experiments in the order that reloads the fewest models, warm models up before their batch and pin them
+    sweepPlanner = SweepPlanner(ollamaHosts, modelSizesGB={"gemma2": 5.4}, defaultModelSizeGB=8.0, keepAlive="30m")
+    backendPool = BackendPool(list(ollamaHosts), strategy="least_loaded", unhealthyAfter=3, retryUnhealthyAfter=30.0, keepAlive=sweepPlanner.keepAlive)
+    # Per-model rolling latencies, reported after each experiment. Both uses are opt-in and change the call pattern:
+    # adaptive response timeouts (adaptiveTimeouts=True: 3x p99, within 30-320s, once 20 calls are in; otherwise the fixed
+    # responseTimeout) and hedging, which duplicates calls still running after the model's p95 (hedgePercentile=0.95; mainly useful with several hosts)
+    latencyTracker = LatencyTracker(windowSize=200, minSamples=20, adaptiveTimeouts=False, timeoutPercentile=0.99, timeoutMultiplier=3.0, minTimeout=30.0, maxTimeout=320.0, hedgePercentile=None)
+
+    # Agent options shared by both agents
+    agentOptions = {
+        "streamResponses": False, # Stream tokens and stop generating once the proposal JSON is complete
+        "structuredOutput": False, # Schema-constrained JSON output (parsed directly, so format retries become rare)
+        "responseCache": responseCache,
+        "backendPool": backendPool,
+        "prefixStable": False, # Append-only history, so Ollama can reuse the cached prompt prefix of earlier turns
+        "speculativePrefill": False, # Prefill the waiting agent's history on Ollama while its partner generates (if a backendLimits slot is free and the partner's model isn't on the same host)
+        "contextWindow": None, # e.g. ContextWindow(maxExchanges=4, slideBy=2, maxPromptTokens=6000): send the last exchanges plus a state summary
+        "bestOfK": 1, # Retries fire this many samples at once and keep the first valid one, bounding turn latency for flaky models
+        "bestOfKOnFirstAttempt": False, # Also sample best-of-k on each turn's first attempt
+        "latencyTracker": latencyTracker,
+        "thinkingBudget": None, # Reasoning models (deepseek*): estimated thinking tokens per call before the reasoning is cut off, e.g. 1200
+        "thinkingBudgetAction": "truncate", # Once over budget: "truncate" answers from the reasoning so far, "skip" answers without it
+    }
 
     experimentModels = [("gemma2","gemma2", 4)]
+
+    # Also write a per-turn telemetry stream (tokens, latency, retries, failure flags, parse time) as JSONL
+    writeTurnTelemetry = False
+
+    # Also write a typed JSONL log (numeric task columns, fast to load) next to each CSV log
+    writeTypedLog = False
+
+    # Concurrency: how many rounds run at once, and how many of them may use each backend
+    maxConcurrentRounds = 4
+    backendLimits = {"ollama": 4, "openai": 8}
+
+    # DNF handling: resume from the last valid turn after timeouts or exhausted format retries, restart otherwise
+    # (with fresh sampling seeds) until the round finishes. Setting maxRestarts gives up on a round after that many
+    # restarts and logs it as a DNF row; scoring skips those rows, so the scored rounds are no longer all numRounds
+    resumePolicy = ResumePolicy(maxResumes=3, resumableReasons=("timeout", "retries_exhausted"), maxRestarts=None)
+
+    # Stall handling (opt-in, it adds mediator messages and can end rounds early): None runs every round to maxIterations. e.g.
+    # StallPolicy(actions=("nudge", "final_offer", "dnf"), repeatLimit=3, cycleRepeats=2, maxPeriod=4, stallWindow=8, minUtilityChange=0.05, cooldown=2)
+    # nudges stuck rounds, then asks for a final offer, then ends them early (a "stalled" DNF restarts the round)
+    stallPolicy = None
+
+    # Local proposal repair (opt-in): fix formatting slips and misspelled task names in an unusable proposal instead of
+    # retrying the LLM. Repaired turns are counted per agent in the log; with it off, results match runs without it
+    repairProposals = False
     
-    for agent1Model, agent2Model, numTasks in experimentModels:
-        # Setup csv logger
+    sweepPlan = sweepPlanner.plan(experimentModels, numRounds, (agent1usesOpenAI, agent2usesOpenAI))
+    sweepPlan.printSummary()
+    for agent1Model, agent2Model, numTasks in sweepPlanner.iterateExperiments(sweepPlan, backendPool):
+        # Setup csv logger: one buffered handle per experiment, written by a background thread
         logFilename = constructLogFilename(agent1Model, agent2Model)
-        setupLogger(logFilename=logFilename)
+        experimentLogger = ExperimentLogger(logFilename)
         
-        log(logFilename, "NumTasks", numTasks) # Label, value
-        log(logFilename, "Agent1Model", agent1Model) 
-        log(logFilename, "Agent2Model", agent2Model) 
+        experimentLogger.log("NumTasks", numTasks) # Label, value
+        experimentLogger.log("Agent1Model", agent1Model) 
+        experimentLogger.log("Agent2Model", agent2Model) 
+        typedLogWriter = None
+        if writeTypedLog:
+            typedLogWriter = TypedLogWriter(logFilename.replace(".csv", ".jsonl"), {"NumTasks": numTasks, "Agent1Model": agent1Model, "Agent2Model": agent2Model})
+
+        turnTelemetry = TurnTelemetryWriter(logFilename.replace(".csv", "_turns.jsonl")) if writeTurnTelemetry else None
+
+        def logRound(n):
+            dataTuple = buildDataTuple(n)
+            experimentLogger.logTuple(dataTuple)
+            if typedLogWriter is not None:
+                typedLogWriter.logTuple(dataTuple)
+
+        negotiationKwargs = {
+            "numTasks": numTasks,
+            "maxIterations": maxIterations,
+            "agent1Model": agent1Model,
+            "agent1usesOpenAI": agent1usesOpenAI,
+            "agent1Type": agent1Type,
+            "agent2Model": agent2Model,
+            "agent2usesOpenAI": agent2usesOpenAI,
+            "agent2Type": agent2Type,
+            "agent1Name": agent1Name,
+            "agent2Name": agent2Name,
+            "hasInitialProposal": hasInitialProposal,
+            "agentOptions": agentOptions,
+            "turnTelemetry": turnTelemetry,
+            "stallPolicy": stallPolicy,
+            "repairProposals": repairProposals,
+        }
 
         negotiationStartTime = datetime.datetime.now().replace(microsecond=0)
-        # Run the negotiation rounds
-        for roundIndex in range(1, numRounds + 1):
-            hasDNF = True
-            while hasDNF:
-                n = Negotiation(roundIndex, 
-                                numTasks, 
-                                maxIterations, 
-                                agent1Model, 
-                                agent1usesOpenAI, 
-                                agent1Type, 
-                                agent2Model, 
-                                agent2usesOpenAI, 
-                                agent2Type, 
-                                agent1Name, 
-                                agent2Name, 
-                                hasInitialProposal)
-                n.startNegotiation()
-                hasDNF = n.DNF
-        
-            dataTuple = (
-                n.roundIndex,
-                n.negotiationTime,
-                n.winningProposal.agent1Utility,
-                n.winningProposal.agent2Utility,
-                n.numIterations,
-                n.winningProposal.agent1Tasks,
-                n.winningProposal.agent2Tasks,
-                n.tasks,
-                (n.initialProposal.agent1Tasks, n.initialProposal.agent2Tasks) if n.hasInitialProposal else None,  # None if hasInitialProposal is False
-                n.agent1.usesOpenAI,
-                n.agent2.usesOpenAI,
-                n.agent1.modelName,
-                n.agent2.modelName,
-                n.agent1.agentType,
-                n.agent2.agentType,
-            )
-            logTuple(logFilename, dataTuple)
+        # Run the negotiation rounds concurrently; rows are still logged in round order
+        scheduler = RoundScheduler(maxConcurrentRounds=maxConcurrentRounds, backendLimits=backendLimits, resumePolicy=resumePolicy)
+        negotiations = scheduler.runRounds(range(1, numRounds + 1), negotiationKwargs,
+                                           onRoundComplete=logRound)
+        printRetrySummary(negotiations)
+        responseCache.printSummary()
+        backendPool.printSummary()
+        latencyTracker.printSummary()
         totalNegotiationTime = datetime.datetime.now().replace(microsecond=0) - negotiationStartTime
         averageTimePerRound = datetime.timedelta(seconds=(totalNegotiationTime.total_seconds() / numRounds))
-        log(logFilename, "TotalNegotiationTime", totalNegotiationTime)
-        log(logFilename, "AverageTimePerRound", averageTimePerRound)
+        experimentLogger.log("TotalNegotiationTime", totalNegotiationTime)
+        experimentLogger.log("AverageTimePerRound", averageTimePerRound)
+        if typedLogWriter is not None:
+            typedLogWriter.log("TotalNegotiationTime", totalNegotiationTime)
+            typedLogWriter.log("AverageTimePerRound", averageTimePerRound)
+        experimentLogger.close(summary=buildSummary(negotiations))
+        if turnTelemetry is not None:
+            turnTelemetry.close()
+    sweepPlan.printSummary() # Again, now with the measured warm-up time
     
+def printRetrySummary(negotiations): # Average LLM retries and locally repaired turns per agent-round, by output mode
+    retriesByMode = {}
+    for n in negotiations:
+        for agent in (n.agent1, n.agent2):
+            totalRetries, totalRepairs, agentRounds = retriesByMode.get(agent.outputMode, (0, 0, 0))
+            retriesByMode[agent.outputMode] = (totalRetries + n.retryCounts[agent.agentName], totalRepairs + n.repairCounts[agent.agentName], agentRounds + 1)
+    for mode, (totalRetries, totalRepairs, agentRounds) in retriesByMode.items():
+        print(f"{mode} output: {totalRetries} retries ({totalRetries / agentRounds:.2f} per agent-round), {totalRepairs} repaired turns")
+
+def buildSummary(negotiations): # Totals for the log's summary block
+    return {
+        "RoundsCompleted": sum(not n.DNF for n in negotiations),
+        "RoundsDNF": sum(n.DNF for n in negotiations),
+        "TotalIterations": sum(n.numIterations for n in negotiations),
+        "TotalRetries": sum(sum(n.retryCounts.values()) for n in negotiations),
+        "TotalRepairedTurns": sum(sum(n.repairCounts.values()) for n in negotiations),
+        "TotalResumes": sum(n.numResumes for n in negotiations),
+        "TotalRestarts": sum(n.numRestarts for n in negotiations),
+        "TotalPromptTokens": sum(call.promptTokens for n in negotiations for turn in n.turnRecords for call in turn.calls),
+        "TotalCompletionTokens": sum(call.completionTokens for n in negotiations for turn in n.turnRecords for call in turn.calls),
+        "TotalPrefills": sum(agent.numPrefills for n in negotiations for agent in (n.agent1, n.agent2)),
+        "TotalContextTokensSaved": sum(call.contextTokensSaved for n in negotiations for turn in n.turnRecords for call in turn.calls),
+        "TotalStallInterventions": sum(n.numInterventions for n in negotiations),
+        "TotalTurnsRemaining": sum(n.turnsRemaining for n in negotiations),
+        "TotalHedgedCalls": sum(call.hedged for n in negotiations for turn in n.turnRecords for call in turn.calls),
+        "TotalHedgeWins": sum(call.hedgeWon for n in negotiations for turn in n.turnRecords for call in turn.calls),
+        "TotalHedgeSecondsSaved": round(sum(call.hedgeSecondsSaved for n in negotiations for turn in n.turnRecords for call in turn.calls), 2),
+        "TotalReasoningTokens": sum(call.reasoningTokens for n in negotiations for turn in n.turnRecords for call in turn.calls),
+        "TotalReasoningSeconds": round(sum(call.reasoningSeconds for n in negotiations for turn in n.turnRecords for call in turn.calls), 2),
+        "TotalThinkingBudgetHits": sum(call.thinkingBudgetHit for n in negotiations for turn in n.turnRecords for call in turn.calls),
+    }
+
+def buildDataTuple(n):
+    agreement = n.winningProposal if not n.DNF else None # A round given up after its restarts has no agreement
+    return (
+        n.roundIndex,
+        n.negotiationTime,
+        agreement.agent1Utility if agreement is not None else None,
+        agreement.agent2Utility if agreement is not None else None,
+        n.numIterations,
+        agreement.agent1Tasks if agreement is not None else [],
+        agreement.agent2Tasks if agreement is not None else [],
+        n.tasks,
+        (n.initialProposal.agent1Tasks, n.initialProposal.agent2Tasks) if n.hasInitialProposal else None,  # None if hasInitialProposal is False
+        n.agent1.usesOpenAI,
+        n.agent2.usesOpenAI,
+        n.agent1.modelName,
+        n.agent2.modelName,
+        n.agent1.agentType,
+        n.agent2.agentType,
+        n.agent1.outputMode,
+        n.agent2.outputMode,
+        n.retryCounts[n.agent1.agentName],
+        n.retryCounts[n.agent2.agentName],
+        n.repairCounts[n.agent1.agentName],
+        n.repairCounts[n.agent2.agentName],
+        n.numResumes,
+        n.numRestarts,
+    ) + tuple(round(value, 4) if isinstance(value, float) else value for value in getRoundTelemetry(n).values()) + (
+        n.numInterventions,
+        n.turnsRemaining,
+        sum(call.hedged for turn in n.turnRecords for call in turn.calls),
+        sum(call.hedgeWon for turn in n.turnRecords for call in turn.calls),
+        round(sum(call.hedgeSecondsSaved for turn in n.turnRecords for call in turn.calls), 4),
+        sum(call.reasoningTokens for turn in n.turnRecords for call in turn.calls),
+        round(sum(call.reasoningSeconds for turn in n.turnRecords for call in turn.calls), 4),
+        sum(call.thinkingBudgetHit for turn in n.turnRecords for call in turn.calls),
+        n.DNF,
+        n.dnfReason,
+    )
+
 def constructLogFilename(agent1Model, agent2Model):
     sanitizedAgent1Model = ''.join(filter(str.isalnum, agent1Model))
     sanitizedAgent2Model = ''.join(filter(str.isalnum, agent2Model))
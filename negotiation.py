@@ -1,25 +1,31 @@
-from agent import Agent
-from task import Task
+from agent import Agent, runSync, getBackendName
+from task import Task, TaskRegistry
 from colorama import Fore
 from proposal import Proposal
 from negotiationFlag import NegotiationFlag
 from langchain.schema import AIMessage, HumanMessage, SystemMessage
 from langchain.prompts import ChatPromptTemplate
 from negotiationManager import NegotiationManager
+from negotiationCheckpoint import NegotiationCheckpoint
+from trajectoryTracker import TrajectoryTracker
+import asyncio
 import random
 import datetime
-import copy
+import time
 import ast
 import json
 
 class Negotiation:
-    def __init__(self, roundIndex, numTasks, maxIterations, agent1Model, agent1usesOpenAI, agent1Type, agent2Model, agent2usesOpenAI, agent2Type, agent1Name, agent2Name, hasInitialProposal):
+    def __init__(self, roundIndex, numTasks, maxIterations, agent1Model, agent1usesOpenAI, agent1Type, agent2Model, agent2usesOpenAI, agent2Type, agent1Name, agent2Name, hasInitialProposal, agentOptions=None, turnTelemetry=None, stallPolicy=None, repairProposals=False):
         self.roundIndex = roundIndex
         self.DNF = False # Did Not Finish
+        self.dnfReason = None # Why the negotiation did not finish: timeout, retries_exhausted, max_iterations, stalled or invalid_agent
         self.seed = str(roundIndex) + " I love LLMs!" # Seed for random number generation
+        self.rng = random.Random(self.seed) # Per-negotiation generator so concurrent rounds stay deterministic
         self.numTasks = numTasks
-        self.agent1 = Agent(agentName=agent1Name, modelName=agent1Model, usesOpenAI=agent1usesOpenAI, agentType=agent1Type)
-        self.agent2 = Agent(agentName=agent2Name, modelName=agent2Model, usesOpenAI=agent2usesOpenAI, agentType=agent2Type)
+        agentOptions = agentOptions if agentOptions is not None else {} # Extra Agent keyword options shared by both agents
+        self.agent1 = Agent(agentName=agent1Name, modelName=agent1Model, usesOpenAI=agent1usesOpenAI, agentType=agent1Type, **agentOptions)
+        self.agent2 = Agent(agentName=agent2Name, modelName=agent2Model, usesOpenAI=agent2usesOpenAI, agentType=agent2Type, **agentOptions)
         self.numIterations = 0 # Number of conversation iterations in the negotiation
         self.maxIterations = maxIterations
         self.hasInitialProposal = hasInitialProposal
@@ -27,8 +33,26 @@ class Negotiation:
         # self.tasks = self.generateTasks(self.numTasks) # or use generateRandomTasks() for random tasks
         self.tasks = self.generateRandomTasks(self.numTasks)
         self.tasks = self.generateSeededTasks(self.numTasks)
+        self.taskRegistry = TaskRegistry(self.tasks) # Interned tasks with integer ids for bitmask proposals
+        self.tasks = self.taskRegistry.tasks # Same list object, so validateProposal can take the mask path
         self.negotiationTime = 0 # Time taken for the negotiation
         self.winningProposal = None # The winning proposal at the end of the negotiation
+        self.retryCounts = {agent1Name: 0, agent2Name: 0} # LLM retries per agent, filled in by the NegotiationManager
+        self.repairCounts = {agent1Name: 0, agent2Name: 0} # Turns recovered by local proposal repair instead of a retry
+        self.repairProposals = repairProposals # Try ProposalRepairer on unusable proposals before asking the LLM again
+        self.manager = None # Set when the negotiation starts
+        self.negotiationStartTime = None
+        self.lastCheckpoint = None # State after the last valid turn, see NegotiationCheckpoint
+        self.numResumes = 0 # Times this negotiation resumed from a checkpoint after a DNF
+        self.numRestarts = 0 # Discarded attempts before this one, set by the RoundScheduler
+        self.turnRecords = [] # telemetry.TurnRecord per turn, including failed ones
+        self.turnTelemetry = turnTelemetry # Optional TurnTelemetryWriter shared by all rounds
+        self.prefillTasks = {} # Agent name -> running speculative prefill
+        self.backendSemaphores = {} # Backend name -> RoundScheduler slots; a prefill takes a free one or is skipped
+        self.trajectoryTracker = TrajectoryTracker(stallPolicy) if stallPolicy is not None else None # Early actions for stuck negotiations
+        self.numInterventions = 0 # Stall actions taken (nudges, final offer prompts, early DNFs)
+        self.turnsRemaining = 0 # Unused turn budget when a flagged negotiation ended early (early DNF or agreement after an intervention); an upper bound on the turns the intervention saved, since the round might have ended early anyway
+        self.phaseTimes = {"setup": 0.0, "generate": 0.0, "parse": 0.0, "repair": 0.0, "validate": 0.0, "turnLoop": 0.0} # Seconds per phase
         self.formattingReminder = self.setFormattingReminder() # Initiate the formatting reminder
         self.proposalFormatExample = None # Initiate the proposal formatting example
         self.missingProposalWarning = (
@@ -43,6 +67,17 @@ class Negotiation:
             "Remember to include the JSON object with the proposed tasks in your response."
             "Please ensure that the JSON object includes the keys 'my_tasks', 'partner_tasks', and 'has_deal'."
         )
+        self.stallNudge = ( # Sent by handleStall when the proposals stop changing
+            "\n\n**MEDIATOR: THE NEGOTIATION IS GOING IN CIRCLES**\n"
+            "The last proposals keep repeating without getting closer to a deal. "
+            "Make a real concession by moving at least one item, or accept your partner's latest proposal by repeating it with 'has_deal' set to 'True'."
+        )
+        self.finalOfferPrompt = (
+            "\n\n**MEDIATOR: FINAL OFFER**\n"
+            "This negotiation is about to end without a deal. "
+            "Either accept your partner's latest proposal by repeating it with 'has_deal' set to 'True', "
+            "or make your final offer: the allocation you are willing to settle on, with 'has_deal' set to 'True'."
+        )
         
     def updateAgentInstructions(self): # Add the negotiation tasks to the agent's instructions
         self.agent1.systemInstructions += "\n**NOW, HERE ARE THE ACTUAL ITEMS YOU MUST ALLOCATE:**\n\n"
@@ -60,12 +95,21 @@ class Negotiation:
             self.agent1.initialProposalHelperInstructions = self.agent1.initialProposalHelperInstructions.replace("[my_name]", self.agent1.agentName).replace("[partner_name]", self.agent2.agentName).replace("[myTasks]", ", ".join([f'"{task.mappedName}"' for task in self.initialProposal.agent1Tasks])).replace("[partnerTasks]", ", ".join([f'"{task.mappedName}"' for task in self.initialProposal.agent2Tasks]))
             self.agent2.initialProposalHelperInstructions = self.agent2.initialProposalHelperInstructions.replace("[my_name]", self.agent2.agentName).replace("[partner_name]", self.agent1.agentName).replace("[myTasks]", ", ".join([f'"{task.mappedName}"' for task in self.initialProposal.agent2Tasks])).replace("[partnerTasks]", ", ".join([f'"{task.mappedName}"' for task in self.initialProposal.agent1Tasks]))
             
+    def setUpStructuredOutput(self): # Give structured-output agents the proposal schema for this negotiation's tasks
+        for agent in (self.agent1, self.agent2):
+            if agent.structuredOutput:
+                agent.setResponseSchema(self.buildProposalSchema())
+                agent.systemInstructions += (
+                    "\nYour replies are captured as a JSON object: write what you say to your partner in 'message' "
+                    "and your proposal in 'my_tasks', 'partner_tasks' and 'has_deal'. The 'json' block is added for you.\n"
+                )
+            
     def setUpInitialProposal(self): # Randomly assign tasks to each agent
-        shuffledTasks = copy.deepcopy(self.tasks)
-        random.shuffle(shuffledTasks)
+        shuffledTasks = list(self.tasks)
+        self.rng.shuffle(shuffledTasks)
         agent1Tasks = shuffledTasks[:self.numTasks//2]
         agent2Tasks = shuffledTasks[self.numTasks//2:self.numTasks]
-        self.initialProposal = Proposal(agent1Tasks, agent2Tasks)
+        self.initialProposal = Proposal(agent1Tasks, agent2Tasks, registry=self.taskRegistry)
         
     def generateTasks(self, numTasks):
         baseTasks = [
@@ -95,31 +139,57 @@ class Negotiation:
         return tasks
     
     def generateSeededTasks(self, numTasks):
-        random.seed(self.seed)
+        self.rng.seed(self.seed)
         tasks = []
         for i in range(numTasks):
             taskName = chr(65 + i) # A, B, C, ...
-            pref1 = round(random.uniform(0.0, 1.0), 1)
-            pref2 = round(random.uniform(0.0, 1.0), 1)
+            pref1 = round(self.rng.uniform(0.0, 1.0), 1)
+            pref2 = round(self.rng.uniform(0.0, 1.0), 1)
             task = Task(name=f"Task {taskName}", pref1=pref1, pref2=pref2)
             tasks.append(task)
         return tasks
     
     def startNegotiation(self):
-        manager = NegotiationManager(self)
-        negotiation_start_time, current_agent, other_agent = manager.initialize_negotiation()
+        runSync(self.startNegotiationAsync())
+
+    async def startNegotiationAsync(self):
+        self.manager = NegotiationManager(self)
+        self.negotiationStartTime, current_agent, other_agent = self.manager.initialize_negotiation()
         
         current_input = f"Hello, I am {other_agent.agentName}. Let's begin the task negotiation. Please start the negotiation process."
-        
+        self.lastCheckpoint = NegotiationCheckpoint(self, current_agent, current_input)
+        await self.runTurnsAsync(current_agent, other_agent, current_input)
+
+    def resumeNegotiation(self):
+        runSync(self.resumeNegotiationAsync())
+
+    async def resumeNegotiationAsync(self): # Continue a DNF negotiation from its last checkpoint with fresh sampling seeds
+        self.numResumes += 1
+        self.DNF = False
+        self.dnfReason = None
+        current_agent, other_agent, current_input = self.lastCheckpoint.restore(self)
+        for agent in (self.agent1, self.agent2):
+            agent.setSamplingSeed(self.rng.randrange(2**31))
+        print(f"{Fore.YELLOW}Resuming round {self.roundIndex} from iteration {self.numIterations} (resume {self.numResumes}){Fore.RESET}")
+        await self.runTurnsAsync(current_agent, other_agent, current_input)
+
+    async def runTurnsAsync(self, current_agent, other_agent, current_input):
+        manager = self.manager
+        loop_start = time.perf_counter()
         while not manager.agreement_reached and self.numIterations < self.maxIterations:
             if self.numIterations <= 1 and self.hasInitialProposal:
                 self.updateAgentInitialInstructions(current_agent, other_agent)
+            if other_agent.speculativePrefill:
+                self.startPrefill(other_agent, current_agent)
+            if current_agent.contextWindow is not None:
+                current_agent.stateSummary = self.buildStateSummary(current_agent, other_agent)
                 
-            current_response, proposal = manager.process_proposal(current_agent, other_agent, current_input)
+            current_response, proposal = await manager.process_proposal_async(current_agent, other_agent, current_input)
             
             if current_response is None:
                 print(f"{Fore.RED}Negotiation Did Not Finish: {current_agent.agentName} could not produce a valid proposal.{Fore.RESET}")
                 self.DNF = True
+                self.dnfReason = manager.failure_reason
                 break
                        
             if current_agent == self.agent1:
@@ -129,6 +199,7 @@ class Negotiation:
             else:
                 print(f"{Fore.RED}Error: Current agent is neither agent1 nor agent2.{Fore.RESET}")
                 self.DNF = True
+                self.dnfReason = "invalid_agent"
                 break
                 
             bothPropsExist = manager.current_proposal is not None and manager.previous_proposal is not None
@@ -145,36 +216,107 @@ class Negotiation:
             print(f"\n{Fore.CYAN}{current_agent.agentName}:{Fore.RESET}\n{current_response}")
             
             self.numIterations += 1
-            self.clearAllSystemMessages(current_agent)
+            if self.trajectoryTracker is not None and self.handleStall(proposal, other_agent):
+                break
+            if not current_agent.prefixStable: # Prefix-stable agents keep the turn's feedback messages in their history
+                self.clearAllSystemMessages(current_agent)
             current_agent, other_agent = other_agent, current_agent
             current_input = current_response
+            self.lastCheckpoint = NegotiationCheckpoint(self, current_agent, current_input)
             
-        if self.maxIterations == self.numIterations:
+        if self.maxIterations == self.numIterations and not self.DNF:
             print(f"{Fore.RED}Negotiation Did Not Finish: Max Iterations Reached{Fore.RESET}")
             self.DNF = True
+            self.dnfReason = "max_iterations"
         
+        if self.trajectoryTracker is not None and self.trajectoryTracker.interventions and (manager.agreement_reached or self.dnfReason == "stalled"):
+            self.turnsRemaining += self.maxIterations - self.numIterations
+        for task in self.prefillTasks.values():
+            task.cancel()
+        self.phaseTimes["turnLoop"] += time.perf_counter() - loop_start
         negotiation_end_time = datetime.datetime.now().replace(microsecond=0)
-        self.negotiationTime = negotiation_end_time - negotiation_start_time
+        self.negotiationTime = negotiation_end_time - self.negotiationStartTime # Includes time spent before any resume
         self.winningProposal = self.findMostRecentProposal(other_agent)
 
+    def handleStall(self, proposal, nextAgent):
+        """
+        Feed the turn's proposal to the trajectory tracker and act if the negotiation is stuck.
+        Returns True if the negotiation should end now (early DNF).
+        """
+        stall = self.trajectoryTracker.record(proposal, self.numIterations, dealPending=self.manager.deal_counter > 0)
+        if stall is None:
+            return False
+        detection, action = stall
+        self.numInterventions += 1
+        print(f"{Fore.YELLOW}Round {self.roundIndex} stalled ({detection}) after {self.numIterations} turns: {action}{Fore.RESET}")
+        if action == "dnf":
+            print(f"{Fore.RED}Negotiation Did Not Finish: Stalled{Fore.RESET}")
+            self.DNF = True
+            self.dnfReason = "stalled"
+            return True
+        if action == "nudge":
+            nextAgent.addToChatHistory('system', self.stallNudge)
+        else:
+            nextAgent.addToChatHistory('system', self.finalOfferPrompt)
+        return False
+
+    def startPrefill(self, agent, partner): # Prefill agent's history in the background while its partner takes this turn
+        previousTask = self.prefillTasks.get(agent.agentName)
+        if previousTask is not None and not previousTask.done():
+            return # Still processing the same history
+        if self.sharesHostWithPartner(agent, partner):
+            return
+        semaphore = self.backendSemaphores.get(getBackendName(agent.modelName, agent.usesOpenAI))
+        if semaphore is not None and semaphore.locked():
+            return # The backend is at its limit; the prefill would be one request too many
+        self.prefillTasks[agent.agentName] = asyncio.create_task(self.prefillAsync(agent, semaphore))
+
+    async def prefillAsync(self, agent, semaphore):
+        if semaphore is None:
+            return await agent.prefillAsync()
+        async with semaphore:
+            await agent.prefillAsync()
+
+    def sharesHostWithPartner(self, agent, partner): # A different model on the partner's Ollama host would be swapped in mid-generation
+        if agent.modelName == partner.modelName or getBackendName(partner.modelName, partner.usesOpenAI) != "ollama":
+            return False
+        if agent.backendPool is None: # Both on the one local server
+            return True
+        return bool(set(agent.backendPool.getModelUrls(agent.modelName)) & set(agent.backendPool.getModelUrls(partner.modelName)))
+
+    def buildStateSummary(self, agent, partner): # Compact negotiation state for agents whose context window drops old exchanges
+        def describe(proposal, owner):
+            if proposal is None:
+                return "none yet"
+            ownerTasks, otherTasks = (proposal.agent1Tasks, proposal.agent2Tasks) if owner is self.agent1 else (proposal.agent2Tasks, proposal.agent1Tasks)
+            myTasks, partnerTasks = (ownerTasks, otherTasks) if owner is agent else (otherTasks, ownerTasks)
+            names = lambda tasks: ", ".join(task.mappedName for task in tasks) or "nothing"
+            return f"you take {names(myTasks)}; {partner.agentName} takes {names(partnerTasks)} (has_deal: {proposal.hasDeal})"
+        dealStatus = "agreed by both" if self.manager.agreement_reached else f"{partner.agentName} has accepted a deal" if partner.currentProposal is not None and partner.currentProposal.hasDeal else "no deal yet"
+        return (
+            f"**NEGOTIATION STATE** (earlier messages are left out; this is where things stand after {self.numIterations} turns)\n"
+            f"Items: {', '.join(task.mappedName for task in self.tasks)}\n"
+            f"Your latest proposal: {describe(agent.currentProposal, agent)}\n"
+            f"{partner.agentName}'s latest proposal: {describe(partner.currentProposal, partner)}\n"
+            f"Deal status: {dealStatus}"
+        )
+
+    def recordTurn(self, turnRecord):
+        self.turnRecords.append(turnRecord)
+        if self.turnTelemetry is not None:
+            self.turnTelemetry.write(turnRecord)
+
     def doesProposalMatchInitialProposal(self, proposal):
         """
         Checks if the proposal matches the initial allocation. Returns True if it does, False otherwise.
         """
-        proposalGroup1 = set(proposal.agent1Tasks)
-        proposalGroup2 = set(proposal.agent2Tasks)
-        initialGroup1 = set(self.initialProposal.agent1Tasks)
-        initialGroup2 = set(self.initialProposal.agent2Tasks)
-        return (proposalGroup1 == initialGroup1 and proposalGroup2 == initialGroup2)
+        return proposal.matchesAllocation(self.initialProposal)
             
     def extractProposalFromReponse(self, response, currentAgent):
         
         if "json" not in response or "has_deal" not in response:
             return NegotiationFlag.PROPOSAL_NOT_FOUND
         
-        agent1Tasks = []
-        agent2Tasks = []
-
         # Extract the dictionary part from the response
         lines = response.splitlines()
         proposal_str = ""
@@ -196,11 +338,21 @@ class Negotiation:
             proposal_str = proposal_str.replace('\n', '').replace(' ', '')                 
             try:
                 proposal_dict = json.loads(proposal_str)
-            except json.JSONDecodeError:
+            except json.JSONDecodeError as e:
                 print(f"JSON decode error: {e}")
                 # Fallback to ast.literal_eval
                 proposal_dict = ast.literal_eval(proposal_str)
 
+        except Exception as e:
+            print(f"{Fore.RED}Parsing error: {e} {response}{Fore.RESET}")
+            return NegotiationFlag.INVALID_PROPOSAL_FORMAT
+
+        return self.extractProposalFromDict(proposal_dict, currentAgent)
+    
+    def extractProposalFromDict(self, proposal_dict, currentAgent): # Build a Proposal from parsed my_tasks/partner_tasks/has_deal
+        agent1Tasks = []
+        agent2Tasks = []
+        try:
             # Extract tasks for agent1 if present
             if currentAgent.agentName == self.agent1.agentName:
                 agent1Key = "my_tasks"
@@ -235,10 +387,27 @@ class Negotiation:
                 has_deal = bool(has_deal_value)
                 
         except Exception as e:
-            print(f"{Fore.RED}Parsing error: {e} {response}{Fore.RESET}")
+            print(f"{Fore.RED}Parsing error: {e} {proposal_dict}{Fore.RESET}")
             return NegotiationFlag.INVALID_PROPOSAL_FORMAT
 
-        return Proposal(agent1Tasks, agent2Tasks, has_deal)
+        return Proposal(agent1Tasks, agent2Tasks, has_deal, registry=self.taskRegistry)
+    
+    def buildProposalSchema(self): # JSON schema for structured-output agents, restricted to this negotiation's tasks
+        taskList = {
+            "type": "array",
+            "items": {"type": "string", "enum": [task.mappedName for task in self.tasks]},
+        }
+        return {
+            "type": "object",
+            "properties": {
+                "message": {"type": "string", "description": "What you say to your partner, without any JSON"},
+                "my_tasks": taskList,
+                "partner_tasks": taskList,
+                "has_deal": {"type": "string", "enum": ["True", "False"]},
+            },
+            "required": ["message", "my_tasks", "partner_tasks", "has_deal"],
+            "additionalProperties": False,
+        }
     
     def extractTasksFromLine(self, line):
         tasks = []        
@@ -250,9 +419,9 @@ class Negotiation:
         return tasks
         
     def convertTaskNameToTask(self, taskName):
-        for task in self.tasks:
-            if task.mappedName.upper() == taskName.upper():
-                return task
+        task = self.taskRegistry.getTaskByMappedName(taskName) # Raw names like "Task A" stay unknown, as before the registry
+        if task is not None:
+            return task
         return Task(name=taskName, pref1=0.0, pref2=0.0) # Return a dummy task if the task name is not found
     
     def findMostRecentProposal(self, currentAgent):
@@ -311,14 +480,18 @@ COPY THIS ALLOCATION EXACTLY, ESPECIALLY TASK ASSIGNMENTS, AND DO NOT CHANGE ANY
         return reminderStr
     
     def updateAgentInitialInstructions(self, currentAgent, otherAgent):
+        if currentAgent.prefixStable: # Add the helper after the system instructions instead of swapping them out
+            if self.numIterations == 0:
+                currentAgent.addToChatHistory('system', f"FOR YOUR OPENING MESSAGE ONLY:\n\n{currentAgent.initialProposalHelperInstructions}")
+            return
         if self.numIterations == 0:
                 # set currentAgent's 0th index in currentAgent.memory to currentAgent.initialProposalHelperInstructions
                 print(f"{Fore.YELLOW}Switching {currentAgent.agentName}'s memory to initial proposal helper instructions{Fore.RESET}")
-                currentAgent.memory[0] = SystemMessage(content=currentAgent.initialProposalHelperInstructions)
+                currentAgent.memory.replace(0, SystemMessage(content=currentAgent.initialProposalHelperInstructions))
         elif self.numIterations == 1:
-            # set currentAgent's 0th index in currentAgent.memory to currentAgent.systemInstructions
+            # set otherAgent's (the opening agent's) 0th index in otherAgent.memory back to otherAgent.systemInstructions
             print(f"{Fore.YELLOW}Switching {otherAgent.agentName}'s memory back to system instructions{Fore.RESET}")
-            currentAgent.memory[0] = SystemMessage(content=currentAgent.systemInstructions)   
+            otherAgent.memory.replace(0, SystemMessage(content=otherAgent.systemInstructions))
             
     def setHelperMessage(self, currentAgent):
         if currentAgent.agentName == self.agent1.agentName:
@@ -339,5 +512,8 @@ json
 }}"""
         return helperMessage   
     def clearAllSystemMessages(self, agent):
+        if agent.prefixStable: # Only drop system messages of the current turn, after the partner's latest message
+            agent.memory.clearTransient(agent.memory.getTurnStart())
+            return
         # Keep only first system message and non-system messages
-        agent.memory = [agent.memory[0]] + [msg for msg in agent.memory[1:] if not isinstance(msg, SystemMessage)]
\ No newline at end of file
+        agent.memory.clearTransient()
\ No newline at end of file
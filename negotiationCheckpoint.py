@@ -0,0 +1,52 @@
+class NegotiationCheckpoint:
+    """
+    Snapshot of a negotiation between turns: both agents' memories and current proposals, the manager's
+    proposal and deal state, whose turn it is and what they are answering. Taken after every valid turn,
+    so a negotiation that fails on a later turn can pick up from here instead of starting over.
+    """
+    def __init__(self, negotiation, currentAgent, currentInput):
+        manager = negotiation.manager
+        self.numIterations = negotiation.numIterations
+        self.agentMemories = {agent.agentName: agent.memory.copy() for agent in (negotiation.agent1, negotiation.agent2)} # Messages are never edited in place
+        self.agentProposals = {agent.agentName: agent.currentProposal for agent in (negotiation.agent1, negotiation.agent2)}
+        self.dealCounter = manager.deal_counter
+        self.agreementReached = manager.agreement_reached
+        self.previousProposal = manager.previous_proposal
+        self.currentProposal = manager.current_proposal
+        self.currentAgentName = currentAgent.agentName
+        self.currentInput = currentInput
+
+    def restore(self, negotiation): # Returns (currentAgent, otherAgent, currentInput) to continue the turn loop with
+        manager = negotiation.manager
+        negotiation.numIterations = self.numIterations
+        for agent in (negotiation.agent1, negotiation.agent2):
+            agent.memory = self.agentMemories[agent.agentName].copy()
+            agent.currentProposal = self.agentProposals[agent.agentName]
+        manager.deal_counter = self.dealCounter
+        manager.agreement_reached = self.agreementReached
+        manager.previous_proposal = self.previousProposal
+        manager.current_proposal = self.currentProposal
+        if self.currentAgentName == negotiation.agent1.agentName:
+            return negotiation.agent1, negotiation.agent2, self.currentInput
+        return negotiation.agent2, negotiation.agent1, self.currentInput
+
+class ResumePolicy:
+    """
+    Decides whether a DNF negotiation should resume from its last checkpoint or be restarted from scratch.
+    Transient failures (timeouts, exhausted format retries) resume with a fresh sampling seed, up to
+    maxResumes times per negotiation. Anything else, such as reaching maxIterations, restarts the round
+    with fresh sampling seeds. By default rounds restart until they finish; with maxRestarts set, a round still
+    DNF after that many restarts is given up and logged as a DNF row, which scoring leaves out.
+    """
+    def __init__(self, maxResumes=3, resumableReasons=("timeout", "retries_exhausted"), maxRestarts=None):
+        self.maxResumes = maxResumes
+        self.resumableReasons = set(resumableReasons)
+        self.maxRestarts = maxRestarts
+
+    def shouldResume(self, negotiation):
+        if negotiation.lastCheckpoint is None or negotiation.numResumes >= self.maxResumes:
+            return False
+        return negotiation.dnfReason in self.resumableReasons
+
+    def shouldRestart(self, numRestarts):
+        return self.maxRestarts is None or numRestarts < self.maxRestarts
@@ -1,9 +1,12 @@
 from colorama import Fore
 from negotiationFlag import NegotiationFlag
-from langchain.schema import AIMessage, HumanMessage, SystemMessage
+import asyncio
 import datetime
-import random
+import time
 from proposal import Proposal
+from agent import runSync
+from proposalRepair import ProposalRepairer
+from telemetry import CallRecord, TurnRecord
 
 class NegotiationManager:
     def __init__(self, negotiation):
@@ -12,8 +15,11 @@ class NegotiationManager:
         self.agreement_reached = False
         self.previous_proposal = None
         self.current_proposal = None
+        self.failure_reason = None # Why the last process_proposal call gave up: timeout or retries_exhausted
+        self.repairer = ProposalRepairer(negotiation) if negotiation.repairProposals else None
 
     def initialize_negotiation(self):
+        phase_start = time.perf_counter()
         negotiation_start_time = datetime.datetime.now().replace(microsecond=0)
         print(f"\n{Fore.GREEN}Round {self.negotiation.roundIndex} started{Fore.RESET}")
         
@@ -22,11 +28,12 @@ class NegotiationManager:
         
         self.setup_initial_conditions()
         self.print_task_information()
+        self.add_phase_time("setup", phase_start)
         
         return negotiation_start_time, current_agent, other_agent
 
     def select_starting_agent(self):
-        return random.choice([self.negotiation.agent1, self.negotiation.agent2])
+        return self.negotiation.rng.choice([self.negotiation.agent1, self.negotiation.agent2])
 
     def get_agent_order(self, starting_agent):
         return ((self.negotiation.agent1, self.negotiation.agent2) 
@@ -37,6 +44,7 @@ class NegotiationManager:
         self.negotiation.setUpInitialProposal()
         self.negotiation.proposalFormatExample = self.negotiation.setProposalFormattingExample(self.negotiation.agent1)
         self.negotiation.updateAgentInstructions()
+        self.negotiation.setUpStructuredOutput()
         self.negotiation.agent1.addToChatHistory('system', self.negotiation.agent1.systemInstructions)
         self.negotiation.agent2.addToChatHistory('system', self.negotiation.agent2.systemInstructions)
 
@@ -46,40 +54,159 @@ class NegotiationManager:
             print(f"{task.mappedName}: \n     {self.negotiation.agent1.agentName}: {task.confidence1}, \n     {self.negotiation.agent2.agentName}: {task.confidence2}")
 
     def process_proposal(self, current_agent, other_agent, current_input):
+        return runSync(self.process_proposal_async(current_agent, other_agent, current_input))
+
+    async def process_proposal_async(self, current_agent, other_agent, current_input):
         max_retries = 5
         retries = 0
+        turn_record = TurnRecord(self.negotiation.roundIndex, self.negotiation.numIterations, current_agent.agentName)
+        calls_before = len(current_agent.callRecords)
         
         while retries < max_retries:
-            response = self.attempt_proposal(current_agent, current_input, retries)
+            if retries > 0:
+                self.negotiation.retryCounts[current_agent.agentName] += 1
+                turn_record.retries += 1
+            if current_agent.bestOfK > 1 and (retries > 0 or current_agent.bestOfKOnFirstAttempt):
+                response, proposal, proposal_result = await self.sample_proposals_async(current_agent, other_agent, current_input, retries, turn_record)
+            else:
+                phase_start = time.perf_counter()
+                response = await self.attempt_proposal_async(current_agent, current_input, retries)
+                self.add_phase_time("generate", phase_start)
+                if response != NegotiationFlag.TIMEOUTERROR:
+                    response, proposal, proposal_result = self.evaluate_response(response, current_agent, other_agent, turn_record)
             if response == NegotiationFlag.TIMEOUTERROR:
                 retries = self.handle_timeout(retries, max_retries)
+                self.failure_reason = "timeout"
+                turn_record.failureFlags.append(NegotiationFlag.TIMEOUTERROR.name)
                 continue
-
-            proposal = self.negotiation.extractProposalFromReponse(response, current_agent) # Flags here can be INVALID_PROPOSAL_FORMAT, INVALID_AGENT_NAME, PROPOSAL_NOT_FOUND
-            proposal_result = self.validate_proposal(proposal, current_agent, other_agent)
             
             if proposal_result == NegotiationFlag.ERROR_FREE:
                 self.previous_proposal = self.current_proposal
                 self.current_proposal = proposal
+                self.failure_reason = None
+                turn_record.succeeded = True
+                self.finish_turn(turn_record, current_agent, calls_before)
                 return response, proposal
             
             retries += 1
+            self.failure_reason = "retries_exhausted"
+            turn_record.failureFlags.append(proposal_result.name if isinstance(proposal_result, NegotiationFlag) else str(proposal_result))
             print(f"{Fore.RED}Invalid Proposal: {proposal_result}\n{current_agent.agentName}: {response}{Fore.RESET}")
             print(f"{Fore.RED}Retrying... ({retries}/{max_retries} retries){Fore.RESET}")
         
+        self.finish_turn(turn_record, current_agent, calls_before)
         return None, None # Return None if retries exceed max_retries
 
+    def evaluate_response(self, response, current_agent, other_agent, turn_record): # Parse, repair and validate the agent's latest response
+        phase_start = time.perf_counter()
+        proposal = self.parse_response(response, current_agent) # Flags here can be INVALID_PROPOSAL_FORMAT, INVALID_AGENT_NAME, PROPOSAL_NOT_FOUND
+        phase_start = self.add_phase_time("parse", phase_start, turn_record)
+        if self.repairer is not None and self.needs_repair(proposal):
+            repaired = self.repairer.repair(response, current_agent)
+            if repaired is not None: # Recovered locally, no LLM retry needed
+                proposal, response = repaired
+                current_agent.replaceLastResponse(response)
+                self.negotiation.repairCounts[current_agent.agentName] += 1
+        phase_start = self.add_phase_time("repair", phase_start, turn_record)
+        proposal_result = self.validate_proposal(proposal, current_agent, other_agent)
+        self.add_phase_time("validate", phase_start, turn_record)
+        return response, proposal, proposal_result
+
+    async def sample_proposals_async(self, current_agent, other_agent, current_input, retries, turn_record):
+        """
+        Best-of-k attempt: fire current_agent.bestOfK samples for the same history at once and evaluate them as they
+        arrive. The first valid one is kept and the others are cancelled. Each sample is evaluated on the history as it
+        was before the batch, so a failed sample leaves exactly what a failed serial attempt would (its response and
+        feedback). Returns (response, proposal, proposal_result) of the kept or last failed sample, or a TIMEOUTERROR
+        response if every sample failed or none finished within the agent's response timeout.
+        """
+        if retries == 0:
+            current_agent.addToChatHistory('user', current_input)
+        else: # Remove the rejected response, keeping the partner's input and the feedback added after it
+            current_agent.memory.retractLastResponse()
+        messages, prompt_tokens = current_agent.getPromptMessages()
+        messages = list(messages)
+        base_memory = current_agent.memory.copy()
+        base_seed = current_agent.samplingSeed or 0
+        samples = {} # Task -> its CallRecord
+        for index in range(current_agent.bestOfK):
+            call_record = CallRecord(current_agent.agentName)
+            sample_seed = base_seed + index if index > 0 else None # The first sample is the agent's usual call
+            samples[asyncio.create_task(current_agent.sampleResponseAsync(messages, prompt_tokens, sample_seed, call_record))] = call_record
+        result = NegotiationFlag.TIMEOUTERROR, None, None
+        num_evaluated = 0
+        pending = set(samples)
+        timeout = current_agent.getResponseTimeout()
+        deadline = time.perf_counter() + timeout
+        try:
+            while pending:
+                phase_start = time.perf_counter()
+                done, pending = await asyncio.wait(pending, timeout=max(0.0, deadline - phase_start), return_when=asyncio.FIRST_COMPLETED)
+                self.add_phase_time("generate", phase_start)
+                if not done:
+                    print(f"{Fore.RED}Timeout error while sampling responses for {current_agent.agentName}{Fore.RESET}")
+                    for task in pending:
+                        samples[task].timedOut = True
+                        samples[task].latency = timeout
+                    if current_agent.latencyTracker is not None: # The batch counts as one timed-out call
+                        current_agent.latencyTracker.recordTimeout(current_agent.modelName, timeout)
+                    break
+                for task in done:
+                    sample = task.result()
+                    if sample == NegotiationFlag.TIMEOUTERROR:
+                        continue
+                    if num_evaluated > 0: # Undo the previous sample's response and feedback
+                        current_agent.memory = base_memory.copy()
+                    num_evaluated += 1
+                    response_content, current_agent.lastStructuredResponse = sample
+                    current_agent.addToChatHistory('assistant', response_content)
+                    result = self.evaluate_response(response_content.strip(), current_agent, other_agent, turn_record)
+                    if result[2] == NegotiationFlag.ERROR_FREE:
+                        return result
+                    if pending:
+                        print(f"{Fore.RED}Invalid sample ({num_evaluated}/{current_agent.bestOfK}): {result[2]}{Fore.RESET}")
+        finally:
+            for task in pending:
+                task.cancel()
+                samples[task].cancelled = not samples[task].timedOut
+            if pending:
+                await asyncio.wait(pending) # Let the cancelled samples release their pool endpoints
+            for task in pending:
+                if samples[task].timedOut and samples[task].endpoint is not None and current_agent.backendPool is not None:
+                    current_agent.backendPool.recordTimeout(samples[task].endpoint)
+        return result
+
+    def finish_turn(self, turn_record, current_agent, calls_before): # Attach the turn's model calls and hand the record to the negotiation
+        turn_record.calls = current_agent.callRecords[calls_before:]
+        self.negotiation.recordTurn(turn_record)
+
+    def add_phase_time(self, phase, phase_start, turn_record=None): # Add the time since phase_start to a phase, returns the current time
+        now = time.perf_counter()
+        self.negotiation.phaseTimes[phase] += now - phase_start
+        if turn_record is not None:
+            setattr(turn_record, f"{phase}Seconds", getattr(turn_record, f"{phase}Seconds") + now - phase_start)
+        return now
+
+    def parse_response(self, response, current_agent):
+        if current_agent.lastStructuredResponse is not None: # Structured output is already parsed JSON
+            return self.negotiation.extractProposalFromDict(current_agent.lastStructuredResponse, current_agent)
+        return self.negotiation.extractProposalFromReponse(response, current_agent)
+
+    def needs_repair(self, proposal): # True if the parsed response is unusable as is
+        if isinstance(proposal, NegotiationFlag):
+            return True
+        return proposal.validateProposal(self.negotiation.tasks) != NegotiationFlag.ERROR_FREE
+
     def attempt_proposal(self, current_agent, current_input, retries):
+        return runSync(self.attempt_proposal_async(current_agent, current_input, retries))
+
+    async def attempt_proposal_async(self, current_agent, current_input, retries):
         if retries == 0:
-            return current_agent.generateResponse(role='user', inputText=current_input)
+            return await current_agent.generateTimedResponseAsync(role='user', inputText=current_input)
         else:
-            # Remove last 2 messages (the error response and the original input) if they exist
-            if len(current_agent.memory) >= 3:
-                if isinstance(current_agent.memory[-1], SystemMessage):
-                    current_agent.memory.pop(-2).content
-                else:
-                    current_agent.memory.pop(-1).content 
-            return current_agent.generateResponse() 
+            # Remove the rejected response, keeping the partner's input and the feedback added after it
+            current_agent.memory.retractLastResponse()
+            return await current_agent.generateTimedResponseAsync()
 
             
     def handle_timeout(self, retries, max_retries):
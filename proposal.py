@@ -1,7 +1,12 @@
 from negotiationFlag import NegotiationFlag
+import json
+
+def formatProposalBlock(myTasks, partnerTasks, hasDeal): # Canonical 'json' proposal block, as the system instructions ask for
+    proposalDict = {"my_tasks": list(myTasks), "partner_tasks": list(partnerTasks), "has_deal": str(hasDeal)}
+    return "json\n" + json.dumps(proposalDict, indent=4)
 
 class Proposal:
-    def __init__(self, agent1Tasks, agent2Tasks, hasDeal=False):
+    def __init__(self, agent1Tasks, agent2Tasks, hasDeal=False, registry=None):
         self.agent1Tasks = agent1Tasks
         self.agent2Tasks = agent2Tasks
         self.numTasks = len(agent1Tasks) + len(agent2Tasks)
@@ -9,23 +14,49 @@ class Proposal:
         self.agent2Utility = sum([task.pref2 for task in agent2Tasks])
         self.totalUtility = self.agent1Utility + self.agent2Utility
         self.hasDeal = hasDeal
-            
+        # Bitmasks over registry ids; None when there is no registry or a side holds unknown or repeated tasks
+        self.registry = registry
+        self.agent1Mask = registry.getMask(agent1Tasks) if registry is not None else None
+        self.agent2Mask = registry.getMask(agent2Tasks) if registry is not None else None
+
+    def hasMasks(self, other=None): # True if this proposal (and other, if given) can be compared by bitmask
+        if self.agent1Mask is None or self.agent2Mask is None:
+            return False
+        if other is not None:
+            return other.registry is self.registry and other.agent1Mask is not None and other.agent2Mask is not None
+        return True
+
     def validateProposal(self, tasks): # Check if the proposal is valid (returns True if valid)
         if self.numTasks > len(tasks):
             return NegotiationFlag.TOO_MANY_TASKS
         if self.numTasks < len(tasks):
             return NegotiationFlag.NOT_ENOUGH_TASKS
+        if self.hasMasks() and tasks is self.registry.tasks:
+            if self.agent1Mask | self.agent2Mask != self.registry.fullMask:
+                return NegotiationFlag.INVALID_TASKS_PRESENT
+            return NegotiationFlag.ERROR_FREE
+        proposedTasks = set(self.agent1Tasks) | set(self.agent2Tasks)
         for task in tasks:
-            if task not in self.agent1Tasks and task not in self.agent2Tasks: # Check if all tasks are in the proposal
+            if task not in proposedTasks: # Check if all tasks are in the proposal
                 return NegotiationFlag.INVALID_TASKS_PRESENT
         return NegotiationFlag.ERROR_FREE
-    
+
     def printStringProposal(self):
         return f"Agent 1 Tasks: {self.agent1Tasks}\nAgent 2 Tasks: {self.agent2Tasks}\nHas Deal: {self.hasDeal}\n"
-    
+
+    def matchesAllocation(self, other, allowSwap=False): # Same split of tasks, ignoring hasDeal
+        if self.hasMasks(other):
+            if self.agent1Mask == other.agent1Mask and self.agent2Mask == other.agent2Mask:
+                return True
+            return allowSwap and self.agent1Mask == other.agent2Mask and self.agent2Mask == other.agent1Mask
+        selfGroup1, selfGroup2 = set(self.agent1Tasks), set(self.agent2Tasks)
+        otherGroup1, otherGroup2 = set(other.agent1Tasks), set(other.agent2Tasks)
+        if selfGroup1 == otherGroup1 and selfGroup2 == otherGroup2:
+            return True
+        return allowSwap and selfGroup1 == otherGroup2 and selfGroup2 == otherGroup1
+
     def equals(self, other):
-        return set(self.agent1Tasks) == set(other.agent1Tasks) and set(self.agent2Tasks) == set(other.agent2Tasks)\
-            and self.hasDeal == other.hasDeal
-    
+        return self.matchesAllocation(other) and self.hasDeal == other.hasDeal
+
     def __repr__(self):
         return f"Agent 1 Tasks: {self.agent1Tasks}\nAgent 2 Tasks: {self.agent2Tasks}\nHas Deal: {self.hasDeal}\n"
\ No newline at end of file
@@ -0,0 +1,90 @@
+import ast
+import json
+
+class IncrementalProposalDetector:
+    """
+    Watches a streamed response for the 'json { ... }' proposal block.
+    feed() returns True once the block's braces close, it mentions has_deal and it parses,
+    so generation can stop there; getTrimmedText() drops anything the model wrote after it.
+    Reasoning models' <think> blocks never reach it (see ReasoningStreamFilter).
+    """
+    def __init__(self):
+        self.text = ""
+        self.scanStart = 0 # Where to look for the next 'json' marker
+        self.blockStart = None # Index of the opening brace of the current candidate block
+        self.scanPosition = 0 # Next character to scan inside the candidate block
+        self.depth = 0
+        self.quoteChar = None # Quote character of the string being scanned, if any
+        self.escaped = False
+        self.blockEnd = None # Index of the closing brace once the proposal is complete
+
+    @property
+    def isComplete(self):
+        return self.blockEnd is not None
+
+    def feed(self, chunk):
+        if self.isComplete:
+            return True
+        self.text += chunk
+        while not self.isComplete:
+            if self.blockStart is None and not self.findBlockStart():
+                return False
+            if not self.scanBlock():
+                return False
+        return True
+
+    def findBlockStart(self): # Find the opening brace after the next 'json' marker
+        markerIndex = self.text.find("json", self.scanStart)
+        if markerIndex == -1:
+            return False
+        braceIndex = self.text.find("{", markerIndex)
+        if braceIndex == -1:
+            return False
+        self.blockStart = braceIndex
+        self.scanPosition = braceIndex
+        self.depth = 0
+        self.quoteChar = None
+        self.escaped = False
+        return True
+
+    def scanBlock(self): # Scan the candidate block; returns False if more text is needed
+        while self.scanPosition < len(self.text):
+            char = self.text[self.scanPosition]
+            self.scanPosition += 1
+            if self.quoteChar is not None:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == self.quoteChar:
+                    self.quoteChar = None
+            elif char in ('"', "'"):
+                self.quoteChar = char
+            elif char == "{":
+                self.depth += 1
+            elif char == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    candidate = self.text[self.blockStart:self.scanPosition]
+                    if "has_deal" in candidate and self.parses(candidate):
+                        self.blockEnd = self.scanPosition - 1
+                    else: # Not a usable proposal, look for the next 'json' marker
+                        self.scanStart = self.scanPosition
+                        self.blockStart = None
+                    return True
+        return False
+
+    def parses(self, candidate): # Same cleanup and parsers as Negotiation.extractProposalFromReponse
+        candidate = candidate.replace('\n', '').replace(' ', '')
+        try:
+            return isinstance(json.loads(candidate), dict)
+        except json.JSONDecodeError:
+            try:
+                return isinstance(ast.literal_eval(candidate), dict)
+            except (ValueError, SyntaxError):
+                return False
+
+    def getTrimmedText(self): # Response up to the end of the proposal block (the whole text if none was found)
+        if not self.isComplete:
+            return self.text
+        return self.text[:self.blockEnd + 1]
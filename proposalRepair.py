@@ -0,0 +1,157 @@
+from negotiationFlag import NegotiationFlag
+from proposal import Proposal, formatProposalBlock
+from colorama import Fore
+import difflib
+import json
+import ast
+import re
+
+class ProposalRepairer:
+    """
+    Recovers a valid Proposal from a response the strict parser rejected, without calling the model again.
+    Handles small formatting slips (single or curly quotes, trailing commas, bare True/False, a missing
+    closing brace), misspelled, plural or "Task A"-style task names, alternative or agent-name keys,
+    and a missing task list that can be inferred as the complement of the other one.
+    """
+    def __init__(self, negotiation, fuzzyCutoff=0.8):
+        self.negotiation = negotiation
+        self.fuzzyCutoff = fuzzyCutoff # Minimum difflib similarity for a misspelled task name
+
+    def repair(self, response, currentAgent):
+        """
+        Return (proposal, canonicalResponse) if the response can be repaired into a valid proposal, None otherwise.
+        canonicalResponse is the response with its proposal block rewritten in the exact format the parser expects.
+        """
+        if not isinstance(response, str):
+            return None
+        block = self.findProposalBlock(response)
+        if block is None:
+            return None
+        blockStart, blockEnd, blockText = block
+        proposalDict = self.parseLenient(blockText)
+        if proposalDict is None:
+            return None
+
+        myTasks, partnerTasks, hasDeal = self.resolveKeys(proposalDict, currentAgent)
+        myTasks = self.resolveTaskNames(myTasks)
+        partnerTasks = self.resolveTaskNames(partnerTasks)
+        if myTasks is None or partnerTasks is None: # A name that doesn't resolve is left to an LLM retry, not guessed around
+            return None
+        if not myTasks and not partnerTasks:
+            return None
+        if not myTasks: # Infer a missing or empty side as the complement of the other one
+            myTasks = [task for task in self.negotiation.tasks if task not in partnerTasks]
+        if not partnerTasks:
+            partnerTasks = [task for task in self.negotiation.tasks if task not in myTasks]
+
+        if currentAgent.agentName == self.negotiation.agent1.agentName:
+            proposal = Proposal(myTasks, partnerTasks, hasDeal, registry=self.negotiation.taskRegistry)
+        else:
+            proposal = Proposal(partnerTasks, myTasks, hasDeal, registry=self.negotiation.taskRegistry)
+        if proposal.validateProposal(self.negotiation.tasks) != NegotiationFlag.ERROR_FREE:
+            return None
+
+        canonicalBlock = formatProposalBlock([task.mappedName for task in myTasks], [task.mappedName for task in partnerTasks], hasDeal)
+        canonicalResponse = response[:blockStart].rstrip() + "\n\n" + canonicalBlock + response[blockEnd:]
+        print(f"{Fore.YELLOW}Repaired {currentAgent.agentName}'s proposal locally{Fore.RESET}")
+        return proposal, canonicalResponse
+
+    def findProposalBlock(self, response): # (start, end, text) of the proposal block, including a 'json' header line
+        markerIndex = response.lower().find("json")
+        braceIndex = response.find("{", markerIndex if markerIndex != -1 else 0)
+        if braceIndex == -1:
+            markerIndex = -1
+            braceIndex = response.find("{")
+            if braceIndex == -1:
+                return None
+        depth = 0
+        blockEnd = len(response) # Stays at the end if the closing brace is missing
+        for i in range(braceIndex, len(response)):
+            if response[i] == "{":
+                depth += 1
+            elif response[i] == "}":
+                depth -= 1
+                if depth == 0:
+                    blockEnd = i + 1
+                    break
+        blockStart = braceIndex
+        if markerIndex != -1: # Replace a header line such as 'json' or '```json' together with the block
+            lineStart = response.rfind("\n", 0, markerIndex) + 1
+            lineEnd = response.find("\n", markerIndex)
+            if response[lineStart:lineEnd if lineEnd != -1 else len(response)].strip().strip("`").lower() == "json":
+                blockStart = lineStart
+        return blockStart, blockEnd, response[braceIndex:blockEnd] + "}" * max(depth, 0)
+
+    def parseLenient(self, blockText): # Parse a JSON-like object, fixing common formatting slips
+        text = blockText.replace("“", '"').replace("”", '"').replace("‘", "'").replace("’", "'")
+        text = re.sub(r",\s*([\]}])", r"\1", text) # Trailing commas
+        candidates = [
+            text,
+            text.replace("'", '"'),
+            re.sub(r"\b(True|False)\b", r'"\1"', text.replace("'", '"')),
+        ]
+        for candidate in candidates:
+            try:
+                parsed = json.loads(candidate)
+            except json.JSONDecodeError:
+                try:
+                    parsed = ast.literal_eval(candidate)
+                except (ValueError, SyntaxError):
+                    continue
+            if isinstance(parsed, dict):
+                return parsed
+        return None
+
+    def normalizeKey(self, key):
+        return re.sub(r"[\s\-]+", "_", str(key).strip().lower())
+
+    def resolveKeys(self, proposalDict, currentAgent): # (myTaskNames, partnerTaskNames, hasDeal); a missing side is None
+        otherAgent = self.negotiation.agent2 if currentAgent.agentName == self.negotiation.agent1.agentName else self.negotiation.agent1
+        myKeys = {"my_tasks", "mytasks", "my_task", "my_items", "your_tasks", self.normalizeKey(currentAgent.agentName), self.normalizeKey(currentAgent.agentName) + "_tasks"}
+        partnerKeys = {"partner_tasks", "partnertasks", "partner_task", "partner_items", "their_tasks", "partners_tasks", self.normalizeKey(otherAgent.agentName), self.normalizeKey(otherAgent.agentName) + "_tasks"}
+        dealKeys = {"has_deal", "hasdeal", "deal", "has_a_deal"}
+        myTasks, partnerTasks, hasDeal = None, None, False
+        for key, value in proposalDict.items():
+            normalizedKey = self.normalizeKey(key)
+            if normalizedKey in myKeys:
+                myTasks = value
+            elif normalizedKey in partnerKeys:
+                partnerTasks = value
+            elif normalizedKey in dealKeys:
+                hasDeal = value.strip().lower() == "true" if isinstance(value, str) else bool(value)
+        return myTasks, partnerTasks, hasDeal
+
+    def resolveTaskNames(self, taskNames): # Tasks for a list of names: [] if the list is missing or empty, None if any name is unresolvable
+        if taskNames is None:
+            return []
+        if isinstance(taskNames, str):
+            taskNames = [name for name in taskNames.split(",") if name.strip()]
+        if not isinstance(taskNames, (list, tuple)):
+            return None
+        tasks = []
+        for taskName in taskNames:
+            task = self.resolveTaskName(str(taskName))
+            if task is None or task in tasks:
+                return None
+            tasks.append(task)
+        return tasks
+
+    def resolveTaskName(self, taskName): # Exact, then cleaned, singular and fuzzy lookups in the task registry
+        registry = self.negotiation.taskRegistry
+        task = registry.getTaskByName(taskName)
+        if task is not None:
+            return task
+        cleaned = re.sub(r"[^a-z0-9 ]", " ", taskName.lower())
+        cleaned = re.sub(r"\s+", " ", cleaned).strip()
+        candidates = [cleaned, re.sub(r"es$", "", cleaned), re.sub(r"s$", "", cleaned)]
+        candidates += cleaned.split(" ") # e.g. "Task A (Chess)" or "the Chess task"
+        for candidate in candidates:
+            task = registry.getTaskByName(candidate) if candidate else None
+            if task is not None:
+                return task
+        knownNames = {}
+        for task in registry.tasks:
+            knownNames[task.mappedName.lower()] = task
+            knownNames[task.name.lower()] = task
+        matches = difflib.get_close_matches(cleaned, list(knownNames), n=1, cutoff=self.fuzzyCutoff)
+        return knownNames[matches[0]] if matches else None
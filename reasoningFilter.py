@@ -0,0 +1,102 @@
+from localBackend import isScriptedModel
+from telemetry import estimateTokens
+import time
+
+openTag = "<think>"
+closeTag = "</think>"
+
+def isReasoningModel(modelName): # Models that open their replies with a <think> block
+    modelName = modelName.lower()
+    return modelName.startswith("deepseek") or (isScriptedModel(modelName) and "think=" in modelName)
+
+def getPartialTagLength(text, tag): # Length of the longest end of text that could be the start of tag
+    for length in range(min(len(text), len(tag) - 1), 0, -1):
+        if tag.startswith(text[-length:]):
+            return length
+    return 0
+
+class ReasoningStreamFilter:
+    """
+    Splits a reasoning model's response into its <think>...</think> reasoning and the answer while it streams.
+    feed() returns the answer text a chunk adds; text that may be the start of a tag split across chunks is held
+    back until the next chunk (or finish()) settles it. Every closed <think> block is reasoning, wherever it is;
+    a block that is still open when the response ends is kept in the answer as it was (it may not be reasoning).
+
+    With a thinkingBudget (estimated tokens), overBudget turns True once the reasoning goes past it, so the caller
+    can end the reasoning phase early. reasoningSeconds runs from the first opening tag to the last closing one (or the cut-off).
+    """
+    def __init__(self, thinkingBudget=None):
+        self.thinkingBudget = thinkingBudget
+        self.state = "answer" # answer or reasoning (inside an open <think> block)
+        self.pending = "" # Held-back text
+        self.reasoningParts = [] # Closed blocks
+        self.blockParts = [] # The open block
+        self.reasoningChars = 0
+        self.reasoningStart = None
+        self.reasoningEnd = None
+
+    @property
+    def reasoning(self):
+        return "".join(self.reasoningParts + self.blockParts)
+
+    @property
+    def reasoningTokens(self):
+        return estimateTokens(self.reasoning)
+
+    @property
+    def reasoningSeconds(self):
+        if self.reasoningStart is None:
+            return 0.0
+        return (self.reasoningEnd if self.reasoningEnd is not None and self.state == "answer" else time.perf_counter()) - self.reasoningStart
+
+    @property
+    def overBudget(self):
+        return self.thinkingBudget is not None and self.state == "reasoning" and self.reasoningChars > 4 * self.thinkingBudget
+
+    def addReasoning(self, text):
+        self.blockParts.append(text)
+        self.reasoningChars += len(text)
+
+    def feed(self, chunk):
+        text = self.pending + chunk
+        self.pending = ""
+        answer = ""
+        while text:
+            tag = openTag if self.state == "answer" else closeTag
+            index = text.find(tag)
+            if index == -1:
+                held = getPartialTagLength(text, tag)
+                if self.state == "answer":
+                    answer += text[:len(text) - held]
+                else:
+                    self.addReasoning(text[:len(text) - held])
+                self.pending = text[len(text) - held:]
+                break
+            if self.state == "answer":
+                answer += text[:index]
+                self.state = "reasoning"
+                if self.reasoningStart is None:
+                    self.reasoningStart = time.perf_counter()
+            else:
+                self.addReasoning(text[:index])
+                self.reasoningParts += self.blockParts
+                self.blockParts = []
+                self.reasoningEnd = time.perf_counter()
+                self.state = "answer"
+            text = text[index + len(tag):]
+        return answer
+
+    def finish(self): # Flush held-back text at the end of the stream; returns any answer text it completes
+        text, self.pending = self.pending, ""
+        if self.state == "reasoning": # Unterminated block: give it back as answer text, like an unmatched tag
+            block = "".join(self.blockParts)
+            text = openTag + block + text
+            self.reasoningChars -= len(block)
+            self.blockParts = []
+            self.state = "answer"
+            if not self.reasoningParts:
+                self.reasoningStart = None
+        return text
+
+    def split(self, text): # Filter a complete response in one go, returns the answer
+        return self.feed(text) + self.finish()
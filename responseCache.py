@@ -0,0 +1,116 @@
+from colorama import Fore
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+class ResponseCacheMiss(Exception):
+    pass
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache of model responses, stored in SQLite.
+    Entries are keyed by a hash of the backend, model, sampling parameters and full message history,
+    so seeded reruns of a sweep send identical prompts and get their responses back without calling the model.
+
+    Modes:
+        passthrough - the cache is not used at all
+        record      - every call goes to the model and its response is stored, replacing any earlier one
+        replay      - cached responses are served; misses go to the model and are stored,
+                      or raise ResponseCacheMiss when strictReplay is set (fully offline runs)
+    The least recently used entries are evicted once the stored responses exceed maxSizeBytes.
+    """
+    MODES = ("passthrough", "record", "replay")
+
+    def __init__(self, path="Logs/responseCache.sqlite", mode="replay", maxSizeBytes=256 * 1024 * 1024, strictReplay=False):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown response cache mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.maxSizeBytes = maxSizeBytes
+        self.strictReplay = strictReplay
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.connection = None
+        if mode != "passthrough":
+            self.open()
+
+    def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, content TEXT NOT NULL, size INTEGER NOT NULL, created REAL NOT NULL, lastUsed REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responsesLastUsed ON responses (lastUsed)")
+        self.connection.commit()
+        self.totalSize = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    @property
+    def isEnabled(self):
+        return self.mode != "passthrough"
+
+    def makeKey(self, backend, modelName, params, messages): # messages are (role, content) pairs
+        payload = json.dumps({"backend": backend, "model": modelName, "params": params, "messages": messages}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key): # Cached response for key, or None; always None in record mode
+        if self.mode != "replay":
+            return None
+        row = self.connection.execute("SELECT content FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            if self.strictReplay:
+                raise ResponseCacheMiss(f"No cached response for key {key[:12]}")
+            return None
+        self.hits += 1
+        self.connection.execute("UPDATE responses SET lastUsed = ? WHERE key = ?", (time.time(), key))
+        self.connection.commit()
+        return row[0]
+
+    def put(self, key, content):
+        if not self.isEnabled or not isinstance(content, str):
+            return
+        size = len(content.encode("utf-8"))
+        now = time.time()
+        previous = self.connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO responses (key, content, size, created, lastUsed) VALUES (?, ?, ?, ?, ?)",
+            (key, content, size, now, now),
+        )
+        self.totalSize += size - (previous[0] if previous is not None else 0)
+        if self.totalSize > self.maxSizeBytes:
+            self.evict()
+        self.connection.commit()
+
+    def evict(self): # Drop least recently used entries until the cache fits in maxSizeBytes
+        rows = self.connection.execute("SELECT key, size FROM responses ORDER BY lastUsed ASC").fetchall()
+        staleKeys = []
+        for key, size in rows:
+            if self.totalSize <= self.maxSizeBytes:
+                break
+            staleKeys.append((key,))
+            self.totalSize -= size
+        self.connection.executemany("DELETE FROM responses WHERE key = ?", staleKeys)
+        self.evictions += len(staleKeys)
+
+    def __len__(self):
+        if self.connection is None:
+            return 0
+        return self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def printSummary(self):
+        if not self.isEnabled:
+            return
+        print(f"{Fore.GREEN}Response cache ({self.mode}): {self.hits} hits, {self.misses} misses, {self.evictions} evicted, {len(self)} entries, {self.totalSize / 1024:.1f} KiB{Fore.RESET}")
@@ -0,0 +1,61 @@
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    Small least-recently-used cache. Once maxSize entries are stored, adding a new one evicts the oldest.
+    """
+    def __init__(self, maxSize=4096):
+        self.maxSize = maxSize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+class TaskSetProfile:
+    """
+    Everything about a round's task set that does not depend on the final allocation.
+    """
+    def __init__(self, registry, prefTenths, reachableLevels, optimalUtility):
+        self.registry = registry # TaskRegistry of the task set; prefTenths and mask bits follow its ids
+        self.prefTenths = prefTenths # (pref1Tenths, pref2Tenths) in registry id order, or None if off the 0.1 grid
+        self.reachableLevels = reachableLevels # Bitset of achievable totals in tenths, or None if off the 0.1 grid
+        self.optimalUtility = optimalUtility
+
+class RoundAnalysis:
+    """
+    Scoring results for one round's allocation, computed once and shared by every reporting method.
+    """
+    def __init__(self, optimalUtility, allocationRank, percentageAway, withinTolerance):
+        self.optimalUtility = optimalUtility
+        self.allocationRank = allocationRank # 1 is best, None if the allocation does not split the round's tasks
+        self.percentageAway = percentageAway # Percentage away from the optimal total utility
+        self.withinTolerance = withinTolerance # True if percentageAway is within the allocation tolerance
+
+    @property
+    def isOptimal(self):
+        return self.allocationRank == 1
+
+    def __repr__(self):
+        return f"RoundAnalysis(optimalUtility={self.optimalUtility}, allocationRank={self.allocationRank}, percentageAway={self.percentageAway}, withinTolerance={self.withinTolerance})"
+
+def getTaskSetKey(tasks): # Canonical, order-independent key for a set of tasks
+    return tuple(sorted((task.name, round(task.pref1, 7), round(task.pref2, 7)) for task in tasks))
@@ -0,0 +1,134 @@
+from negotiation import Negotiation
+from negotiationCheckpoint import ResumePolicy
+from agent import getBackendName
+from colorama import Fore
+import asyncio
+
+class DiscardedAttempts:
+    """
+    Counters of discarded attempts of a round, kept instead of the attempts themselves.
+    """
+    def __init__(self):
+        self.retryCounts = {}
+        self.repairCounts = {}
+        self.numResumes = 0
+        self.numInterventions = 0
+        self.turnsRemaining = 0
+        self.phaseTimes = {}
+        self.turnRecords = []
+
+    def add(self, attempt):
+        for agentName in attempt.retryCounts:
+            self.retryCounts[agentName] = self.retryCounts.get(agentName, 0) + attempt.retryCounts[agentName]
+            self.repairCounts[agentName] = self.repairCounts.get(agentName, 0) + attempt.repairCounts[agentName]
+        self.numResumes += attempt.numResumes
+        self.numInterventions += attempt.numInterventions
+        self.turnsRemaining += attempt.turnsRemaining
+        for phase, seconds in attempt.phaseTimes.items():
+            self.phaseTimes[phase] = self.phaseTimes.get(phase, 0.0) + seconds
+        self.turnRecords += attempt.turnRecords
+
+    def addTo(self, n): # Fold the totals into the round's final attempt
+        for agentName in n.retryCounts:
+            n.retryCounts[agentName] += self.retryCounts.get(agentName, 0)
+            n.repairCounts[agentName] += self.repairCounts.get(agentName, 0)
+        n.numResumes += self.numResumes
+        n.numInterventions += self.numInterventions
+        n.turnsRemaining += self.turnsRemaining
+        for phase in n.phaseTimes:
+            n.phaseTimes[phase] += self.phaseTimes.get(phase, 0.0)
+        n.turnRecords = self.turnRecords + n.turnRecords
+
+class RoundScheduler:
+    """
+    Runs many negotiation rounds at once on a single event loop while keeping their results ordered by round index.
+    Each round holds one slot on every backend its agents use, so the number of rounds
+    talking to a backend at the same time never exceeds that backend's limit.
+    Speculative prefills are extra requests, so they only run while their backend has a slot free.
+    """
+    def __init__(self, maxConcurrentRounds=4, backendLimits=None, resumePolicy=None):
+        self.maxConcurrentRounds = maxConcurrentRounds
+        self.backendLimits = backendLimits if backendLimits is not None else {"ollama": 4, "openai": 8}
+        self.resumePolicy = resumePolicy if resumePolicy is not None else ResumePolicy()
+        self.backendSemaphores = {} # Backend name -> slots of the running runRoundsAsync
+
+    def getRoundBackends(self, negotiationKwargs):
+        backends = {getBackendName(negotiationKwargs["agent1Model"], negotiationKwargs["agent1usesOpenAI"]),
+                    getBackendName(negotiationKwargs["agent2Model"], negotiationKwargs["agent2usesOpenAI"])}
+        return sorted(backends) # Always acquire in the same order to avoid deadlocks between rounds
+
+    def createNegotiation(self, roundIndex, negotiationKwargs):
+        n = Negotiation(roundIndex, **negotiationKwargs)
+        n.backendSemaphores = self.backendSemaphores # Prefills count against the backend limits
+        return n
+
+    async def runRoundAsync(self, roundIndex, negotiationKwargs):
+        """
+        Runs a single round until it finishes without a DNF and returns the finished Negotiation.
+        A DNF resumes from the negotiation's last checkpoint when the resume policy allows it, otherwise the round
+        restarts with fresh sampling seeds. Once the policy's restarts are used up, the last attempt is returned
+        still marked DNF.
+        """
+        n = self.createNegotiation(roundIndex, negotiationKwargs)
+        roundRng = n.rng # Seeds for restarts; a new Negotiation would start its own rng over
+        await n.startNegotiationAsync()
+        discarded = DiscardedAttempts() # Retries, repairs and turns of attempts that did not finish still count towards the round
+        numRestarts = 0
+        while n.DNF:
+            if self.resumePolicy.shouldResume(n):
+                await n.resumeNegotiationAsync()
+                continue
+            if not self.resumePolicy.shouldRestart(numRestarts):
+                print(f"{Fore.RED}Giving up on round {roundIndex} after {numRestarts} restarts ({n.dnfReason}){Fore.RESET}")
+                break
+            print(f"{Fore.RED}Restarting round {roundIndex} ({n.dnfReason}){Fore.RESET}")
+            discarded.add(n)
+            numRestarts += 1
+            n = self.createNegotiation(roundIndex, negotiationKwargs)
+            for agent in (n.agent1, n.agent2):
+                agent.setSamplingSeed(roundRng.randrange(2**31))
+            await n.startNegotiationAsync()
+        discarded.addTo(n)
+        n.numRestarts = numRestarts
+        return n
+
+    async def runRoundsAsync(self, roundIndices, negotiationKwargs, onRoundComplete=None):
+        """
+        Runs all rounds in roundIndices concurrently.
+        onRoundComplete(negotiation) is called once per round, strictly in roundIndices order,
+        as soon as every earlier round has also finished (e.g. to append rows to the CSV log).
+        Returns the finished negotiations in roundIndices order.
+        """
+        roundIndices = list(roundIndices)
+        roundSemaphore = asyncio.Semaphore(self.maxConcurrentRounds)
+        backendSemaphores = {backend: asyncio.Semaphore(limit) for backend, limit in self.backendLimits.items()}
+        self.backendSemaphores = backendSemaphores
+        backends = [backend for backend in self.getRoundBackends(negotiationKwargs) if backend in backendSemaphores]
+        completed = {}
+        nextPosition = 0
+
+        def emitReadyRounds():
+            nonlocal nextPosition
+            while nextPosition < len(roundIndices) and roundIndices[nextPosition] in completed:
+                if onRoundComplete is not None:
+                    onRoundComplete(completed[roundIndices[nextPosition]])
+                nextPosition += 1
+
+        async def worker(roundIndex):
+            async with roundSemaphore:
+                for backend in backends:
+                    await backendSemaphores[backend].acquire()
+                try:
+                    n = await self.runRoundAsync(roundIndex, negotiationKwargs)
+                finally:
+                    for backend in reversed(backends):
+                        backendSemaphores[backend].release()
+            completed[roundIndex] = n
+            emitReadyRounds()
+
+        print(f"{Fore.GREEN}Scheduling {len(roundIndices)} rounds with up to {self.maxConcurrentRounds} running at once{Fore.RESET}")
+        await asyncio.gather(*(worker(roundIndex) for roundIndex in roundIndices))
+        return [completed[roundIndex] for roundIndex in roundIndices]
+
+    def runRounds(self, roundIndices, negotiationKwargs, onRoundComplete=None):
+        return asyncio.run(self.runRoundsAsync(roundIndices, negotiationKwargs, onRoundComplete))
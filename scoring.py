@@ -5,30 +5,43 @@ from itertools import combinations
 import matplotlib
 import matplotlib.pyplot as plt
 from proposal import Proposal
-from task import Task
+from task import Task, TaskRegistry
+from vectorizedAllocations import getVectorizedGroupedRankedAllocations, getAllocationUtilityHistogram
+from typedLog import loadTypedLog, buildRounds, getScoredRounds
+from logger import logColumns
+from roundAnalysis import LRUCache, TaskSetProfile, RoundAnalysis, getTaskSetKey
 
 #TODO: Need to implement:
 
 class scoringEngine:
-    def __init__(self, logFilename):        
+    def __init__(self, logFilename, analysisCacheSize=4096):        
         self.rounds = [] # List of rounds, set in parseLog
+        self.labels = {} # Label-value rows parseLog doesn't interpret, by label
+        self.extraColumns = [] # Per round, the log columns parseLog doesn't interpret (retries, output modes, ...) by name
         self.numTasks = None # Number of tasks, set in parseLog
         self.agent1Model = None # Agent 1 model, set in parseLog
         self.agent2Model = None # Agent 2 model, set in parseLog
         self.totalNegotiationTime = None # Total negotiation time, set in parseLog
         self.averageTimePerRound = None # Average time per round, set in parseLog
+        self.numDNF = 0 # Rounds logged as DNF (not in rounds), set in parseLog
         
         # Allocation Tolerance (in %): A percentage threshold for all allocation rounds. 
             # If the Allocation Score Loss is less than or equal to this threshold, the allocation passes this test. 
             # If the Allocation Score Loss is greater, it fails. 
         self.allocationTolerance = 0.15 # Allocation tolerance
         
+        # Per-round scoring results, memoized by canonical task set (and allocation) with LRU eviction
+        self.profileCache = LRUCache(maxSize=analysisCacheSize) # taskSetKey -> TaskSetProfile
+        self.analysisCache = LRUCache(maxSize=analysisCacheSize) # (taskSetKey, allocationKey) -> RoundAnalysis
+        
         logsFolder = "Logs"
         if not os.path.exists(logsFolder):
             os.makedirs(logsFolder)
         self.logFilepath = os.path.join(logsFolder, logFilename)
         
     def parseLog(self): 
+        if self.logFilepath.endswith(".jsonl"): # Typed log, see typedLog.py
+            return self.parseTypedLog()
         with open (self.logFilepath, mode='r', newline = '') as file:
             reader = csv.reader(file)
             header = next(reader) # Skip the header row
@@ -43,6 +56,10 @@ class scoringEngine:
                     self.totalNegotiationTime = self.parseDuration(row[1])
                 elif row[0] == "AverageTimePerRound":
                     self.averageTimePerRound = self.parseDuration(row[1])
+                elif not row[0].isdigit(): # Other label-value rows, e.g. the logger's summary block
+                    self.labels[row[0]] = row[1]
+                elif dict(zip(header, row)).get("DNF") == "True": # Rounds given up after their restarts have no allocation to score
+                    self.numDNF += 1
                 else:
                     roundNumber = int(row[0])
                     negotiationTime = self.parseDuration(row[1])
@@ -81,6 +98,23 @@ class scoringEngine:
                         'winningProposal': winningProposal
                     }
                     self.rounds.append(roundData)
+                    self.extraColumns.append(dict(zip(header[15:], row[15:])))
+
+    def parseTypedLog(self): # Load a typed JSONL log into the same round dictionaries as the CSV parser
+        metadata, columns = loadTypedLog(self.logFilepath)
+        self.numTasks = metadata.get("NumTasks")
+        self.agent1Model = metadata.get("Agent1Model")
+        self.agent2Model = metadata.get("Agent2Model")
+        if metadata.get("TotalNegotiationTime") is not None:
+            self.totalNegotiationTime = timedelta(seconds=metadata["TotalNegotiationTime"])
+        if metadata.get("AverageTimePerRound") is not None:
+            self.averageTimePerRound = timedelta(seconds=metadata["AverageTimePerRound"])
+        self.rounds += buildRounds(columns)
+        extraValues = {name: columns[name].tolist() for name in logColumns[15:] if name in columns}
+        scoredRounds = getScoredRounds(columns)
+        self.numDNF += len(columns["RoundNumber"]) - len(scoredRounds)
+        for i in scoredRounds:
+            self.extraColumns.append({name: values[i] for name, values in extraValues.items()})
         
     def parseTime(self, timeStr): # Parse time string into timedelta
         """
@@ -170,15 +204,93 @@ class scoringEngine:
         possibleAllocations = [] 
         taskCount = len(roundTasks)
         for size in range(0, taskCount + 1):
-            for combo in combinations(roundTasks, size):
-                groupA = list(combo)
-                groupB = [task for task in roundTasks if task not in groupA]
+            for combo in combinations(range(taskCount), size):
+                comboIndices = set(combo)
+                groupA = [roundTasks[i] for i in combo]
+                groupB = [roundTasks[i] for i in range(taskCount) if i not in comboIndices]
                 newProposal = Proposal(groupA, groupB)
                 possibleAllocations.append(newProposal)
         possibleAllocations.sort(key=lambda proposal: proposal.totalUtility, reverse=True)
         return possibleAllocations
     
-    def getGroupedRankedAllocations(self, roundTasks): # Get all possible allocations for a given round, where ties are grouped
+    def getPreferenceTenths(self, roundTasks): # Convert preferences to integer tenths
+        """
+        Return (pref1Tenths, pref2Tenths) as lists of ints, or None if any preference is not a multiple of 0.1
+        """
+        pref1Tenths = []
+        pref2Tenths = []
+        for task in roundTasks:
+            tenths1 = round(task.pref1 * 10)
+            tenths2 = round(task.pref2 * 10)
+            if abs(task.pref1 * 10 - tenths1) > 1e-6 or abs(task.pref2 * 10 - tenths2) > 1e-6:
+                return None
+            pref1Tenths.append(tenths1)
+            pref2Tenths.append(tenths2)
+        return pref1Tenths, pref2Tenths
+    
+    def getOptimalAllocation(self, roundTasks): # Closed-form optimal allocation, O(n)
+        """
+        Every task goes to the agent with the higher preference for it. Ties go to agent 2, which is
+        the first optimal allocation getAllPossibleAllocations would list.
+        """
+        agent1Tasks = [task for task in roundTasks if task.pref1 - task.pref2 > 1e-7]
+        agent2Tasks = [task for task in roundTasks if task.pref1 - task.pref2 <= 1e-7]
+        return Proposal(agent1Tasks, agent2Tasks)
+    
+    def getOptimalUtility(self, roundTasks): # Best possible total utility for a given round, O(n)
+        return self.getTaskSetProfile(roundTasks).optimalUtility
+    
+    def getTaskSetProfile(self, roundTasks): # Optimum and utility levels of a task set, memoized by task set
+        taskSetKey = getTaskSetKey(roundTasks)
+        profile = self.profileCache.get(taskSetKey)
+        if profile is None:
+            registry = TaskRegistry(roundTasks)
+            prefTenths = self.getPreferenceTenths(registry.tasks)
+            reachableLevels = self.getReachableUtilityLevels(prefTenths) if prefTenths is not None else None
+            profile = TaskSetProfile(registry, prefTenths, reachableLevels, self.getOptimalAllocation(roundTasks).totalUtility)
+            self.profileCache.put(taskSetKey, profile)
+        return profile
+    
+    def analyzeRound(self, roundData): # Score a parsed round once; every reporting method reads from this
+        """
+        Return the RoundAnalysis for a round's final allocation, computing it on the first request only
+        """
+        allocationKey = (getTaskSetKey(roundData['agent1Tasks']), getTaskSetKey(roundData['agent2Tasks']))
+        analysisKey = (getTaskSetKey(roundData['tasks']), allocationKey)
+        analysis = self.analysisCache.get(analysisKey)
+        if analysis is None:
+            proposal = Proposal(roundData['agent1Tasks'], roundData['agent2Tasks'])
+            percentageAway = self.getPercentageAwayFromOptimal(roundData['agent1Tasks'], roundData['agent2Tasks'])
+            analysis = RoundAnalysis(
+                optimalUtility=self.getOptimalUtility(roundData['tasks']),
+                allocationRank=self.getAllocationRank(proposal, roundData['tasks']),
+                percentageAway=percentageAway,
+                withinTolerance=percentageAway <= self.allocationTolerance * 100, # Convert tolerance to percentage
+            )
+            self.analysisCache.put(analysisKey, analysis)
+        return analysis
+    
+    def getReachableUtilityLevels(self, prefTenths): # Integer DP over every achievable total utility
+        """
+        Param: prefTenths: (pref1Tenths, pref2Tenths) from getPreferenceTenths
+        Return an int used as a bitset: bit u is set if some allocation has a total utility of u tenths
+        """
+        reachable = 1 # Only a total of 0 is reachable with no tasks
+        for tenths1, tenths2 in zip(*prefTenths):
+            reachable = (reachable << tenths1) | (reachable << tenths2)
+        return reachable
+    
+    def getUtilityLevelRank(self, reachableLevels, utilityTenths): # Grouped rank of a total utility (1st is best)
+        return bin(reachableLevels >> (utilityTenths + 1)).count("1") + 1
+    
+    def getGroupedRankedAllocations(self, roundTasks, backend="proposals"): # Get all possible allocations for a given round, where ties are grouped
+        """
+        backend="proposals" builds one Proposal per allocation; backend="numpy" enumerates bitmasks with array
+        operations and returns the same groups as AllocationGroups (Proposals are only built when iterated).
+        """
+        if backend == "numpy":
+            return getVectorizedGroupedRankedAllocations(roundTasks)
+        
         allAllocations = self.getAllPossibleAllocations(roundTasks)
         groupedRanking = {}
         
@@ -202,10 +314,41 @@ class scoringEngine:
             for proposal in groupedRankedAllocations[groupIndex]:
                 print(f"Total Utility: {proposal.totalUtility}")
     
+    def getAllocationUtilityHistogram(self, roundTasks): # Distinct total utilities (best first) and how many allocations reach each
+        return getAllocationUtilityHistogram(roundTasks)
+    
     def isOptimalAllocation(self, proposal, roundTasks): # Check if a given proposal is optimal
         return self.getAllocationRank(proposal, roundTasks) == 1
 
     def getAllocationRank(self, proposal, roundTasks): # Get the rank of a given allocation out of all possible allocations (1st is best)
+        """
+        Tied allocations share a rank, and an allocation also matches with its sides swapped (agent1 <-> agent2).
+        Ranks are counted over the distinct utility levels from getReachableUtilityLevels, so nothing is enumerated.
+        """
+        profile = self.getTaskSetProfile(roundTasks)
+        if profile.reachableLevels is None: # Off the 0.1 grid, fall back to ranking every allocation
+            return self.getAllocationRankByEnumeration(proposal, roundTasks)
+        
+        registry = profile.registry
+        currentMask1 = registry.getMask(proposal.agent1Tasks, allowRepeats=True)
+        currentMask2 = registry.getMask(proposal.agent2Tasks, allowRepeats=True)
+        if currentMask1 is None or currentMask2 is None or currentMask1 & currentMask2 or currentMask1 | currentMask2 != registry.fullMask:
+            return None # Not found
+        
+        utilityTenths = 0 # Total utility as proposed
+        swappedUtilityTenths = 0 # Total utility with the sides swapped
+        for taskId, (tenths1, tenths2) in enumerate(zip(*profile.prefTenths)):
+            if currentMask1 >> taskId & 1:
+                utilityTenths += tenths1
+                swappedUtilityTenths += tenths2
+            else:
+                utilityTenths += tenths2
+                swappedUtilityTenths += tenths1
+        
+        reachableLevels = profile.reachableLevels
+        return min(self.getUtilityLevelRank(reachableLevels, utilityTenths), self.getUtilityLevelRank(reachableLevels, swappedUtilityTenths))
+
+    def getAllocationRankByEnumeration(self, proposal, roundTasks): # Rank an allocation by listing every possible allocation
         groupedRanking = self.getGroupedRankedAllocations(roundTasks) # all Allocations is a dictionary of index:[proposal1, proposal2, ...]
         currentGroup1 = set(proposal.agent1Tasks)
         currentGroup2 = set(proposal.agent2Tasks)
@@ -232,7 +375,7 @@ class scoringEngine:
         """
         Calculate the percentage of optimal allocations.
         """
-        optimalCount = sum(1 for roundData in self.rounds if self.isOptimalAllocation(roundData['winningProposal'], roundData['tasks']))
+        optimalCount = sum(1 for roundData in self.rounds if self.analyzeRound(roundData).isOptimal)
         return self.calculateOptimalAllocationPercentage(optimalCount, len(self.rounds))
 
 
@@ -241,12 +384,9 @@ class scoringEngine:
         currentProposal = Proposal(agent1Items, agent2Items)
         currentUtility = currentProposal.totalUtility
         
-        # Get all possible allocations for these tasks
+        # Get the best possible utility for these tasks
         allTasks = agent1Items + agent2Items
-        allAllocations = self.getAllPossibleAllocations(allTasks)
-        
-        # Get the best possible utility (first allocation since list is sorted)
-        bestUtility = allAllocations[0].totalUtility if allAllocations else 0
+        bestUtility = self.getOptimalUtility(allTasks)
         
         # Calculate percentage difference
         percentAway = round(100 * abs(currentUtility - bestUtility) / bestUtility, 2)
@@ -261,8 +401,7 @@ class scoringEngine:
         totalRounds = len(self.rounds)
         
         for roundData in self.rounds:
-            percentageAway = self.getPercentageAwayFromOptimal(roundData['agent1Tasks'], roundData['agent2Tasks'])
-            if percentageAway <= self.allocationTolerance * 100:  # Convert tolerance to percentage
+            if self.analyzeRound(roundData).withinTolerance:
                 numWithinTolerance += 1
                 
         return (numWithinTolerance / totalRounds) * 100 if totalRounds > 0 else 0
@@ -294,8 +433,7 @@ class scoringEngine:
                 current_utility = round_data['agent1Utility'] + round_data['agent2Utility']
                 
                 # Get optimal utility for this round
-                all_allocations = self.getAllPossibleAllocations(round_data['tasks'])
-                optimal_utility = all_allocations[0].totalUtility if all_allocations else 0
+                optimal_utility = self.analyzeRound(round_data).optimalUtility
                 
                 writer.writerow([round_num, current_utility, optimal_utility])
 
@@ -315,12 +453,9 @@ class scoringEngine:
             current_utilities.append(round_data['agent1Utility'] + round_data['agent2Utility'])
             
             # Get optimal utility and rank for this round
-            all_allocations = self.getAllPossibleAllocations(round_data['tasks'])
-            optimal_utilities.append(all_allocations[0].totalUtility if all_allocations else 0)
-            
-            # Calculate rank for current allocation
-            current_proposal = Proposal(round_data['agent1Tasks'], round_data['agent2Tasks'])
-            allocation_ranks.append(self.getAllocationRank(current_proposal, round_data['tasks']))
+            analysis = self.analyzeRound(round_data)
+            optimal_utilities.append(analysis.optimalUtility)
+            allocation_ranks.append(analysis.allocationRank)
         
         plt.figure(figsize=(10, 6))
         
@@ -329,7 +464,7 @@ class scoringEngine:
             plt.axvline(x=x, color='gray', alpha=0.1, zorder=1)
         
         # Add horizontal lines for averages
-        avg_optimal = calculateAverageOptimalUtility(self.rounds)
+        avg_optimal = calculateAverageOptimalUtility(self.rounds, self)
         avg_current = calculateAverageUtility(self.rounds)
         plt.axhline(y=avg_optimal, color='black', linestyle='--', label=f'Avg Optimal Utility: {avg_optimal:.2f}', zorder=1)
         plt.axhline(y=avg_current, color='orange', linestyle='--', label=f'Avg Current Utility: {avg_current:.2f}', zorder=1)
@@ -395,14 +530,13 @@ def calculateAverageUtility(rounds):
         total_utilities.append(round_data['agent1Utility'] + round_data['agent2Utility'])
     return sum(total_utilities) / len(total_utilities) if total_utilities else 0
 
-def calculateAverageOptimalUtility(rounds):
+def calculateAverageOptimalUtility(rounds, engine):
     """
     Calculate the average optimal utility for each round.
     """
     total_utilities = []
     for round_data in rounds:
-        all_allocations = se.getAllPossibleAllocations(round_data['tasks'])
-        total_utilities.append(all_allocations[0].totalUtility if all_allocations else 0)
+        total_utilities.append(engine.analyzeRound(round_data).optimalUtility)
     return sum(total_utilities) / len(total_utilities) if total_utilities else 0
 
 if __name__ == "__main__":
@@ -420,22 +554,17 @@ if __name__ == "__main__":
         iterationsSum = 0  
         
         for roundData in se.rounds:
-            roundNum = roundData['roundNumber']
-            roundTasks = se.rounds[roundNum-1]['tasks']
-            roundAgent1Tasks = se.rounds[roundNum-1]['agent1Tasks']
-            roundAgent2Tasks = se.rounds[roundNum-1]['agent2Tasks']
-            roundProposal = Proposal(roundAgent1Tasks, roundAgent2Tasks)
-            allocationRank = se.getAllocationRank(roundProposal, roundTasks)
+            analysis = se.analyzeRound(roundData)
             
             iterationsSum += roundData['numIterations']  
             
-            if se.isOptimalAllocation(roundProposal, roundTasks):
+            if analysis.isOptimal:
                 numOptimal += 1
             
-            allocationRankSum += allocationRank
+            allocationRankSum += analysis.allocationRank
             
         averageUtility = calculateAverageUtility(se.rounds)
-        averageOptimalUtility = calculateAverageOptimalUtility(se.rounds)
+        averageOptimalUtility = calculateAverageOptimalUtility(se.rounds, se)
         allocationScoreLoss = 100 * (1 - (averageUtility / averageOptimalUtility))
         averageIterations = iterationsSum / numRounds  
         
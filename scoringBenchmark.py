@@ -0,0 +1,138 @@
+from logger import setupLogger, log, logTuple
+from scoring import scoringEngine
+from task import Task, getTaskName
+from proposal import Proposal
+from colorama import Fore
+import datetime
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+benchmarkFolder = "Benchmarks" # Inside Logs, like every other log file
+
+def writeSyntheticLog(numTasks, numRounds, seed=0, optimalFraction=0.3):
+    """
+    Write a synthetic negotiation log with the same CSV layout as logger.setupLogger, and return its filename (relative to Logs).
+    Each round gets its own seeded task set; optimalFraction of the rounds end on the optimal allocation,
+    the rest on a random split. Existing files are reused, since the same arguments always give the same log.
+    """
+    logFilename = os.path.join(benchmarkFolder, f"synthetic_{numTasks}Tasks_{numRounds}Rounds_seed{seed}.csv")
+    if os.path.exists(os.path.join("Logs", logFilename)):
+        return logFilename
+    os.makedirs(os.path.join("Logs", benchmarkFolder), exist_ok=True)
+    rng = random.Random(f"{seed} {numTasks} {numRounds}")
+    setupLogger(logFilename=logFilename)
+    log(logFilename, "NumTasks", numTasks)
+    log(logFilename, "Agent1Model", "synthetic")
+    log(logFilename, "Agent2Model", "synthetic")
+    for roundNumber in range(1, numRounds + 1):
+        tasks = [Task(getTaskName(i), round(rng.uniform(0.0, 1.0), 1), round(rng.uniform(0.0, 1.0), 1)) for i in range(numTasks)]
+        if rng.random() < optimalFraction:
+            agent1Tasks = [task for task in tasks if task.pref1 > task.pref2]
+        else:
+            agent1Tasks = [task for task in tasks if rng.random() < 0.5]
+        agent2Tasks = [task for task in tasks if task not in agent1Tasks]
+        proposal = Proposal(agent1Tasks, agent2Tasks)
+        logTuple(logFilename, (
+            roundNumber, datetime.timedelta(seconds=rng.randint(5, 120)), proposal.agent1Utility, proposal.agent2Utility,
+            rng.randint(2, 32), agent1Tasks, agent2Tasks, tasks, None, False, False, "synthetic", "synthetic", "default", "default",
+            "freeform", "freeform", 0, 0, 0, 0, 0, 0,
+        ))
+    log(logFilename, "TotalNegotiationTime", f"{numRounds // 60}:{numRounds % 60:02d}:00") # One minute per round, written as H:M:S since parseDuration can't read days
+    log(logFilename, "AverageTimePerRound", datetime.timedelta(seconds=60))
+    return logFilename
+
+def getBenchmarkMetrics(includeEnumeration=False):
+    """
+    Metric name -> function(engine) running it over every round of a parsed log.
+    includeEnumeration adds getAllocationRankByEnumeration (ranking by listing every allocation), which is only feasible for small task counts.
+    """
+    metrics = {
+        "getAllocationRank": lambda engine: [engine.getAllocationRank(roundData['winningProposal'], roundData['tasks']) for roundData in engine.rounds],
+        "getPercentageAwayFromOptimal": lambda engine: [engine.getPercentageAwayFromOptimal(roundData['agent1Tasks'], roundData['agent2Tasks']) for roundData in engine.rounds],
+        "getOptimalAllocationPercentage": lambda engine: engine.getOptimalAllocationPercentage(),
+        "getPercentageWithinAllocationTolerance": lambda engine: engine.getPercentageWithinAllocationTolerance(),
+    }
+    if includeEnumeration:
+        metrics["getAllocationRankByEnumeration"] = lambda engine: [engine.getAllocationRankByEnumeration(roundData['winningProposal'], roundData['tasks']) for roundData in engine.rounds]
+    return metrics
+
+def measure(function, setup=None): # (seconds, peak traced bytes); timed and traced in separate runs so tracing doesn't skew the time
+    seconds, peakBytes = None, None
+    for traced in (False, True):
+        args = setup() if setup is not None else () # Fresh arguments for every run, e.g. an engine with cold caches
+        if traced:
+            tracemalloc.start()
+        start = time.perf_counter()
+        function(*args)
+        if traced:
+            peakBytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            seconds = time.perf_counter() - start
+    return seconds, peakBytes
+
+def benchmarkLog(logFilename, numTasks, numRounds, maxEnumerationTasks=10, maxEnumerationRounds=200):
+    """
+    Time and peak memory of parsing one log and of each scoring metric over all of its rounds.
+    Every measurement uses a freshly parsed engine, so the scoring caches start cold.
+    """
+    def parsedEngine():
+        engine = scoringEngine(logFilename)
+        engine.parseLog()
+        return engine
+
+    results = []
+    seconds, peakBytes = measure(parsedEngine)
+    results.append({"metric": "parseLog", "numTasks": numTasks, "numRounds": numRounds, "seconds": seconds, "peakBytes": peakBytes})
+    metrics = getBenchmarkMetrics(includeEnumeration=numTasks <= maxEnumerationTasks and numRounds <= maxEnumerationRounds)
+    for metricName, metric in metrics.items():
+        seconds, peakBytes = measure(metric, lambda: (parsedEngine(),))
+        results.append({"metric": metricName, "numTasks": numTasks, "numRounds": numRounds, "seconds": seconds, "peakBytes": peakBytes})
+    return results
+
+def getResultKey(result):
+    return (result["metric"], result["numTasks"], result["numRounds"])
+
+def printResults(results, baselineResults=None):
+    baseline = {getResultKey(result): result for result in baselineResults} if baselineResults else {}
+    print(f"{'metric':<40}{'tasks':>6}{'rounds':>8}{'seconds':>12}{'us/round':>12}{'peak KiB':>12}{'vs baseline':>14}")
+    for result in results:
+        comparison = ""
+        if getResultKey(result) in baseline:
+            speedup = baseline[getResultKey(result)]["seconds"] / max(result["seconds"], 1e-9)
+            comparison = f"{speedup:.2f}x"
+        print(f"{result['metric']:<40}{result['numTasks']:>6}{result['numRounds']:>8}{result['seconds']:>12.4f}"
+              f"{1e6 * result['seconds'] / result['numRounds']:>12.1f}{result['peakBytes'] / 1024:>12.1f}{comparison:>14}")
+
+def main():
+    # Benchmark grid
+    taskCounts = [4, 8, 12, 16, 20, 30]
+    roundCounts = [50, 1000, 10000]
+    seed = 0
+    baselineFilename = sys.argv[1] if len(sys.argv) > 1 else None # Earlier results to compare against
+
+    results = []
+    for numTasks in taskCounts:
+        for numRounds in roundCounts:
+            print(f"{Fore.GREEN}Scoring {numRounds} rounds with {numTasks} tasks{Fore.RESET}")
+            logFilename = writeSyntheticLog(numTasks, numRounds, seed)
+            results += benchmarkLog(logFilename, numTasks, numRounds)
+
+    baselineResults = None
+    if baselineFilename is not None:
+        with open(baselineFilename) as file:
+            baselineResults = json.load(file)["results"]
+    printResults(results, baselineResults)
+
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H:%M:%S")
+    outputPath = os.path.join("Logs", benchmarkFolder, f"scoring_{timestamp}.json")
+    with open(outputPath, "w") as file:
+        json.dump({"timestamp": timestamp, "seed": seed, "results": results}, file, indent=4)
+    print(f"{Fore.GREEN}Results saved to {outputPath}{Fore.RESET}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+from localBackend import createScriptedModel, scriptedModelPrefix
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import datetime
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+class ScriptedOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, so clients can reuse their connections
+
+    def setup(self):
+        super().setup()
+        self.server.numConnections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def sendJson(self, status, body, contentType="application/json"):
+        data = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self.sendJson(200, {"models": [{"name": self.server.modelName, "model": self.server.modelName, "size": 0}]})
+        elif self.path == "/api/version":
+            self.sendJson(200, {"version": "scripted"})
+        else:
+            self.sendJson(404, {"error": "not found"})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path == "/api/generate": # Only used to load (warm up) or unload (keep_alive=0) models
+            if request.get("keep_alive") in (0, "0", "0s"):
+                self.server.unloadModel(request.get("model"))
+            else:
+                self.server.loadModel(request.get("model"))
+            self.sendJson(200, {"model": request.get("model"), "response": "", "done": True})
+            return
+        if self.path != "/api/chat":
+            self.sendJson(404, {"error": "not found"})
+            return
+        self.server.numRequests += 1
+        self.server.loadModel(request.get("model"))
+        if not self.server.available or self.server.rng.random() < self.server.failureRate:
+            self.server.numFailures += 1
+            self.sendJson(500, {"error": "scripted server failure"})
+            return
+        roles = {"system": SystemMessage, "user": HumanMessage, "assistant": AIMessage}
+        messages = [roles[message["role"]](content=message["content"]) for message in request.get("messages", [])]
+        model = createScriptedModel(self.server.modelName)
+        options = request.get("options") or {}
+        model.seed = options.get("seed")
+        start = time.perf_counter()
+        prompt = "".join(f"{message['role']}\n{message['content']}\n" for message in request.get("messages", []))
+        time.sleep(self.server.getPrefillDelay(prompt))
+        if self.server.stallRate and self.server.rng.random() < self.server.stallRate:
+            self.server.numStalls += 1
+            time.sleep(self.server.stallSeconds)
+        try:
+            result = model._generate(messages, **({"format": request["format"]} if request.get("format") else {}))
+        except TimeoutError as e:
+            self.server.numFailures += 1
+            self.sendJson(500, {"error": str(e)})
+            return
+        content = result.generations[0].message.content
+        if options.get("num_predict", -1) >= 0: # Roughly 4 characters per token
+            content = content[:options["num_predict"] * 4]
+        self.server.cachePrompt(f"{prompt}assistant\n{content}\n")
+        durationNs = int((time.perf_counter() - start) * 1e9)
+        createdAt = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        final = {"model": request.get("model"), "created_at": createdAt, "message": {"role": "assistant", "content": ""},
+                 "done": True, "done_reason": "stop", "total_duration": durationNs, "load_duration": 0,
+                 "prompt_eval_count": sum(len(message.content) for message in messages) // 4, "prompt_eval_duration": 0,
+                 "eval_count": max(1, len(content) // 4), "eval_duration": durationNs}
+        if request.get("stream", True): # Newline-delimited chunks, like Ollama
+            lines = [{"model": request.get("model"), "created_at": createdAt, "message": {"role": "assistant", "content": content[i:i + 8]}, "done": False}
+                     for i in range(0, len(content), 8)]
+            self.sendJson(200, "".join(json.dumps(line) + "\n" for line in lines + [final]), "application/x-ndjson")
+        else:
+            final["message"]["content"] = content
+            self.sendJson(200, final)
+
+class ScriptedOllamaServer(ThreadingHTTPServer):
+    """
+    Minimal Ollama-compatible HTTP server (/api/chat, /api/tags, /api/version) answering with ScriptedChatModel,
+    so BackendPool and the real ChatOllama client can be exercised without an inference box.
+    modelName takes the same options as the scripted backend, e.g. "scripted:latency=0.05".
+    failureRate answers that share of chat requests with HTTP 500; setting available to False fails all of them.
+    stallRate makes that share of chat requests hang for stallSeconds before answering, like a stuck Ollama request.
+    Counts requests, failures and accepted TCP connections (numConnections stays low when clients reuse connections).
+    Model loads are simulated: a request for a model that isn't loaded takes loadSeconds and counts in numLoads,
+    and at most maxLoadedModels models stay loaded (least recently used is unloaded first).
+    So is prompt caching: prompt characters beyond the longest prefix shared with one of the last cacheSlots
+    conversations take prefillSecondsPerKChar per thousand before the reply starts.
+    """
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, modelName=scriptedModelPrefix, failureRate=0.0, seed=0, loadSeconds=0.0, maxLoadedModels=None,
+                 prefillSecondsPerKChar=0.0, cacheSlots=4, stallRate=0.0, stallSeconds=30.0):
+        super().__init__((host, port), ScriptedOllamaHandler)
+        self.modelName = modelName
+        self.failureRate = failureRate
+        self.available = True
+        self.stallRate = stallRate
+        self.stallSeconds = stallSeconds
+        self.numStalls = 0
+        self.rng = random.Random(seed)
+        self.numRequests = 0
+        self.numFailures = 0
+        self.numConnections = 0
+        self.loadSeconds = loadSeconds
+        self.maxLoadedModels = maxLoadedModels
+        self.loadedModels = [] # Least recently used first
+        self.numLoads = 0
+        self.modelLock = threading.Lock()
+        self.prefillSecondsPerKChar = prefillSecondsPerKChar
+        self.cacheSlots = cacheSlots
+        self.cachedPrompts = [] # Least recently used first
+        self.numPrefilledChars = 0
+        self.numCachedChars = 0
+        self.thread = None
+
+    def getPrefillDelay(self, prompt):
+        with self.modelLock:
+            cachedChars = max((len(os.path.commonprefix([prompt, cached])) for cached in self.cachedPrompts), default=0)
+            self.numCachedChars += cachedChars
+            self.numPrefilledChars += len(prompt) - cachedChars
+        return (len(prompt) - cachedChars) / 1000 * self.prefillSecondsPerKChar
+
+    def cachePrompt(self, text):
+        with self.modelLock:
+            self.cachedPrompts = [cached for cached in self.cachedPrompts if not text.startswith(cached)] + [text]
+            del self.cachedPrompts[:-self.cacheSlots]
+
+    def loadModel(self, model):
+        with self.modelLock:
+            if model in self.loadedModels:
+                self.loadedModels.remove(model)
+                self.loadedModels.append(model)
+                return
+            time.sleep(self.loadSeconds)
+            self.numLoads += 1
+            self.loadedModels.append(model)
+            if self.maxLoadedModels is not None and len(self.loadedModels) > self.maxLoadedModels:
+                self.loadedModels.pop(0)
+
+    def unloadModel(self, model):
+        with self.modelLock:
+            if model in self.loadedModels:
+                self.loadedModels.remove(model)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle_error(self, request, client_address): # Clients hanging up mid-reply (cancelled or stopped streams) are expected
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    def start(self): # Serve from a background thread
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, excType, excValue, traceback):
+        self.stop()
+        return False
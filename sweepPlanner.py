@@ -0,0 +1,227 @@
+from agent import getBackendName
+from ollama import Client
+from colorama import Fore
+import time
+
+class SweepBatch:
+    """
+    Experiments that run back to back with the same models resident.
+    modelEndpoints maps each Ollama model of the batch to the hosts it is loaded on (BackendPool.setModelAffinity),
+    unloads and loads are the (host, model) pairs to evict and to warm up before the batch starts.
+    """
+    def __init__(self, modelEndpoints, unloads, loads):
+        self.modelEndpoints = modelEndpoints
+        self.unloads = unloads
+        self.loads = loads
+        self.experiments = []
+
+class SweepPlan:
+    def __init__(self, batches, plannedLoads, plannedLoadSeconds, naiveLoads, naiveLoadSeconds):
+        self.batches = batches
+        self.plannedLoads = plannedLoads
+        self.plannedLoadSeconds = plannedLoadSeconds # Estimated
+        self.naiveLoads = naiveLoads # Loads when running the experiments in list order, with calls spread over every host
+        self.naiveLoadSeconds = naiveLoadSeconds
+        self.warmUpSeconds = 0.0 # Measured by SweepPlanner.warmUp
+
+    @property
+    def swapsAvoided(self):
+        return self.naiveLoads - self.plannedLoads
+
+    @property
+    def estimatedSecondsSaved(self):
+        return self.naiveLoadSeconds - self.plannedLoadSeconds
+
+    def printSummary(self):
+        numExperiments = sum(len(batch.experiments) for batch in self.batches)
+        print(f"{Fore.GREEN}Sweep plan: {numExperiments} experiments in {len(self.batches)} batches, "
+              f"{self.plannedLoads} model loads instead of {self.naiveLoads} "
+              f"({self.swapsAvoided} swaps avoided, about {self.estimatedSecondsSaved:.0f}s of loading saved){Fore.RESET}")
+        if self.warmUpSeconds:
+            print(f"{Fore.GREEN}Warm-up took {self.warmUpSeconds:.1f}s for {self.plannedLoads} planned loads{Fore.RESET}")
+
+class SweepPlanner:
+    """
+    Orders a sweep of model pairs so Ollama hosts reload weights as rarely as possible.
+    Experiments are (agent1Model, agent2Model, numTasks) tuples as in main.experimentModels. Each step picks the
+    remaining experiment needing the fewest new loads given the models already resident, and places its models
+    on hosts within their memory budgets, putting the two models of a pair on different hosts when they don't fit
+    together. Models are then replicated onto hosts with spare memory so calls can still be spread over them.
+
+    A pair that has to share a host it doesn't fit on swaps models on every turn; this is estimated as
+    numRounds * expectedTurnsPerRound loads. Load times are estimated from model size (loadSecondsPerGB)
+    until warm-up has measured them.
+    """
+    def __init__(self, hostMemoryGB, modelSizesGB=None, defaultModelSizeGB=8.0, loadSecondsPerGB=0.5, expectedTurnsPerRound=8, keepAlive="30m"):
+        self.hostMemoryGB = dict(hostMemoryGB) # Host URL -> memory available for model weights
+        self.modelSizesGB = modelSizesGB if modelSizesGB is not None else {}
+        self.defaultModelSizeGB = defaultModelSizeGB
+        self.loadSecondsPerGB = loadSecondsPerGB
+        self.expectedTurnsPerRound = expectedTurnsPerRound
+        self.keepAlive = keepAlive # Pins warmed-up models; pass the same value to BackendPool
+        self.measuredLoadSeconds = {} # Model -> seconds, from warm-up
+        self.clients = {}
+
+    def getModelSize(self, model):
+        return self.modelSizesGB.get(model, self.defaultModelSizeGB)
+
+    def getLoadSeconds(self, model):
+        return self.measuredLoadSeconds.get(model, self.getModelSize(model) * self.loadSecondsPerGB)
+
+    def getFreeMemory(self, host, residentModels):
+        return self.hostMemoryGB[host] - sum(self.getModelSize(model) for model in residentModels)
+
+    def getOllamaModels(self, experiment, usesOpenAI):
+        agent1Model, agent2Model = experiment[0], experiment[1]
+        models = [model for model, openAI in zip((agent1Model, agent2Model), usesOpenAI) if getBackendName(model, openAI) == "ollama"]
+        return list(dict.fromkeys(models)) # Distinct, in agent order
+
+    def placeModels(self, models, resident, numRounds):
+        """
+        Place models on hosts, updating resident (host -> models, least recently used first) in place.
+        Returns (modelEndpoints, unloads, loads, thrashLoads).
+        """
+        placement = {}
+        unloads, loads = [], []
+        for model in sorted(models, key=lambda model: -self.getModelSize(model)):
+            hosts = [host for host in resident if model in resident[host]]
+            if hosts:
+                placement[model] = hosts
+                continue
+            needed = set(models)
+            def capacity(host): # Free memory once models this experiment doesn't need are evicted
+                return self.getFreeMemory(host, [other for other in resident[host] if other in needed])
+            host = max(resident, key=lambda host: (capacity(host) >= self.getModelSize(model), not any(other in needed for other in resident[host]), capacity(host)))
+            while self.getFreeMemory(host, resident[host]) < self.getModelSize(model):
+                evictable = [other for other in resident[host] if other not in needed]
+                if not evictable:
+                    break
+                resident[host].remove(evictable[0])
+                unloads.append((host, evictable[0]))
+            resident[host].append(model)
+            loads.append((host, model))
+            placement[model] = [host]
+
+        thrashLoads = 0
+        for host, hostModels in resident.items():
+            pairModels = [model for model in models if model in hostModels]
+            if len(pairModels) > 1 and self.getFreeMemory(host, hostModels) < 0:
+                thrashLoads += numRounds * self.expectedTurnsPerRound
+
+        for model in models: # Replicate onto hosts with spare memory
+            for host in resident:
+                if model not in resident[host] and self.getFreeMemory(host, resident[host]) >= self.getModelSize(model):
+                    resident[host].append(model)
+                    loads.append((host, model))
+                    placement[model].append(host)
+        for host in resident: # Mark this experiment's models as most recently used
+            resident[host].sort(key=lambda model: model in models)
+        return placement, unloads, loads, thrashLoads
+
+    def copyResident(self, resident):
+        return {host: list(models) for host, models in resident.items()}
+
+    def plan(self, experiments, numRounds, usesOpenAI=(False, False)):
+        """
+        Plan the sweep, falling back to list order (still with placement and warm-up) if the greedy order comes out worse.
+        """
+        naiveLoads, naiveLoadSeconds = self.simulateNaive(experiments, numRounds, usesOpenAI)
+        plans = [self.buildPlan(experiments, numRounds, usesOpenAI, reorder) for reorder in (True, False)]
+        for sweepPlan in plans:
+            sweepPlan.naiveLoads, sweepPlan.naiveLoadSeconds = naiveLoads, naiveLoadSeconds
+        return min(plans, key=lambda sweepPlan: (sweepPlan.plannedLoadSeconds, sweepPlan.plannedLoads))
+
+    def buildPlan(self, experiments, numRounds, usesOpenAI, reorder):
+        resident = {host: [] for host in self.hostMemoryGB}
+        remaining = list(experiments)
+        batches = []
+        plannedLoads, plannedLoadSeconds = 0, 0.0
+        while remaining:
+            def cost(experiment):
+                _, _, loads, thrashLoads = self.placeModels(self.getOllamaModels(experiment, usesOpenAI), self.copyResident(resident), numRounds)
+                return len(loads) + thrashLoads
+            experiment = min(remaining, key=cost) if reorder else remaining[0] # min keeps list order among ties
+            remaining.remove(experiment)
+            models = self.getOllamaModels(experiment, usesOpenAI)
+            placement, unloads, loads, thrashLoads = self.placeModels(models, resident, numRounds)
+            plannedLoads += len(loads) + thrashLoads
+            plannedLoadSeconds += sum(self.getLoadSeconds(model) for _, model in loads)
+            plannedLoadSeconds += thrashLoads * max((self.getLoadSeconds(model) for model in models), default=0.0)
+            if not batches or loads or unloads:
+                batches.append(SweepBatch(placement, unloads, loads))
+            else:
+                batches[-1].modelEndpoints.update(placement)
+            batches[-1].experiments.append(experiment)
+        return SweepPlan(batches, plannedLoads, plannedLoadSeconds, None, None)
+
+    def simulateNaive(self, experiments, numRounds, usesOpenAI=(False, False)):
+        """
+        Model loads (and their estimated seconds) when the experiments run in list order and every host serves
+        every model, each host evicting its least recently used model when it runs out of memory.
+        """
+        resident = {host: [] for host in self.hostMemoryGB}
+        loads, seconds = 0, 0.0
+        for experiment in experiments:
+            models = self.getOllamaModels(experiment, usesOpenAI)
+            pairSize = sum(self.getModelSize(model) for model in models)
+            if len(models) > 1 and all(pairSize > memory for memory in self.hostMemoryGB.values()):
+                numSwaps = numRounds * self.expectedTurnsPerRound # Every turn switches model
+                loads += numSwaps
+                seconds += numSwaps * max(self.getLoadSeconds(model) for model in models)
+                for hostModels in resident.values(): # First loads, as in placeModels
+                    missingModels = [model for model in models if model not in hostModels]
+                    loads += len(missingModels)
+                    seconds += sum(self.getLoadSeconds(model) for model in missingModels)
+                resident = {host: [models[-1]] for host in resident} # Whatever ran last is all that stays loaded
+                continue
+            for host, hostModels in resident.items():
+                for model in models:
+                    if model in hostModels:
+                        hostModels.remove(model)
+                    else:
+                        loads += 1
+                        seconds += self.getLoadSeconds(model)
+                    hostModels.append(model)
+                    while self.getFreeMemory(host, hostModels) < 0 and len(hostModels) > 1:
+                        hostModels.pop(0)
+        return loads, seconds
+
+    def getClient(self, host):
+        if host not in self.clients:
+            self.clients[host] = Client(host=host)
+        return self.clients[host]
+
+    def warmUp(self, batch, sweepPlan=None):
+        """
+        Unload the models the batch evicts, then load its models with keep_alive so they stay resident.
+        Load times are measured and replace the size-based estimates.
+        """
+        for host, model in batch.unloads:
+            try:
+                self.getClient(host).generate(model=model, keep_alive=0)
+            except Exception as e:
+                print(f"{Fore.RED}Could not unload {model} on {host}: {e}{Fore.RESET}")
+        for host, model in batch.loads:
+            start = time.perf_counter()
+            try:
+                self.getClient(host).generate(model=model, keep_alive=self.keepAlive) # An empty prompt only loads the model
+            except Exception as e:
+                print(f"{Fore.RED}Could not warm up {model} on {host}: {e}{Fore.RESET}")
+                continue
+            seconds = time.perf_counter() - start
+            self.measuredLoadSeconds[model] = seconds
+            if sweepPlan is not None:
+                sweepPlan.warmUpSeconds += seconds
+            print(f"{Fore.GREEN}Loaded {model} on {host} in {seconds:.1f}s{Fore.RESET}")
+
+    def iterateExperiments(self, sweepPlan, backendPool=None):
+        """
+        Yields the plan's experiments in order, warming up each batch and pinning the pool to its placement first.
+        Batches of scripted or OpenAI models have nothing to load, so no Ollama host is contacted for them.
+        """
+        for batch in sweepPlan.batches:
+            if batch.loads or batch.unloads:
+                self.warmUp(batch, sweepPlan)
+            if backendPool is not None:
+                backendPool.setModelAffinity(batch.modelEndpoints)
+            yield from batch.experiments
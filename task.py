@@ -1,25 +1,110 @@
 from psrMappings import psrMapping, taskMapping
 
+rawTaskNames = {mappedName.upper(): name for name, mappedName in taskMapping.items()} # "CHESS" -> "Task A"
+
+def getTaskName(taskIndex): # 0 -> "Task A", 25 -> "Task Z", 26 -> "Task AA", ...
+    letters = ""
+    taskIndex += 1
+    while taskIndex > 0:
+        taskIndex, remainder = divmod(taskIndex - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return f"Task {letters}"
+
+def getTaskIndex(taskName): # Inverse of getTaskName, also accepting mapped names such as "Chess"; None if not a generated name
+    taskName = rawTaskNames.get(taskName.strip().upper(), taskName.strip())
+    letters = taskName[len("Task "):] if taskName.startswith("Task ") else ""
+    if not letters or not all("A" <= letter <= "Z" for letter in letters):
+        return None
+    taskIndex = 0
+    for letter in letters:
+        taskIndex = taskIndex * 26 + ord(letter) - 64
+    return taskIndex - 1
+
 class Task:
+    __slots__ = ("name", "mappedName", "pref1", "pref2", "confidence1", "confidence2", "taskId")
+
     def __init__(self, name, pref1, pref2):
         self.name = name
         try:
             self.mappedName = taskMapping[name] # Map the task name to a more human-readable format
         except KeyError:
             self.mappedName = name
-            
+
         self.pref1 = pref1
         self.pref2 = pref2
         self.confidence1 = psrMapping[pref1] # Map the preference to a more human-readable format
         self.confidence2 = psrMapping[pref2] # Map the preference to a more human-readable format
-        
+        self.taskId = None # Bit index in proposal masks, set when the task is interned in a TaskRegistry
+
     def __eq__(self, other):
         if isinstance(other, Task):
             return self.name == other.name and abs(self.pref1 - other.pref1) < 1e-7 and abs(self.pref2 - other.pref2) < 1e-7
         return False
-    
+
     def __hash__(self):
         return hash((self.name, round(self.pref1, 7), round(self.pref2, 7)))
 
     def __repr__(self):
-        return f"{self.mappedName} ({self.pref1}, {self.pref2})"
\ No newline at end of file
+        return f"{self.mappedName} ({self.pref1}, {self.pref2})"
+
+class TaskRegistry:
+    """
+    Interned tasks of one negotiation (or one scored round). Each task gets an integer id, which is its bit
+    in a proposal mask, so proposals can be compared and validated with integer operations.
+    """
+    def __init__(self, tasks=()):
+        self.tasks = [] # Interned tasks, indexed by id
+        self.idsByKey = {}
+        self.idsByName = {} # Upper-case mapped and raw names -> id
+        self.idsByMappedName = {} # Upper-case mapped names -> id
+        for task in tasks:
+            self.intern(task)
+
+    def getTaskKey(self, task):
+        return (task.name, round(task.pref1, 7), round(task.pref2, 7))
+
+    def intern(self, task): # Return the registry's copy of task, registering it if needed
+        key = self.getTaskKey(task)
+        if key in self.idsByKey:
+            return self.tasks[self.idsByKey[key]]
+        taskId = len(self.tasks)
+        if task.taskId is None:
+            task.taskId = taskId
+        self.tasks.append(task)
+        self.idsByKey[key] = taskId
+        self.idsByMappedName.setdefault(task.mappedName.upper(), taskId)
+        self.idsByName.setdefault(task.mappedName.upper(), taskId)
+        self.idsByName.setdefault(task.name.upper(), taskId)
+        return task
+
+    def getTaskId(self, task): # Id of a task in this registry, or None if it was never interned
+        if task.taskId is not None and task.taskId < len(self.tasks) and self.tasks[task.taskId] is task:
+            return task.taskId
+        return self.idsByKey.get(self.getTaskKey(task))
+
+    def getTaskByName(self, taskName): # Case-insensitive lookup by mapped name ("Chess") or raw name ("Task A")
+        taskId = self.idsByName.get(taskName.strip().upper())
+        return self.tasks[taskId] if taskId is not None else None
+
+    def getTaskByMappedName(self, taskName): # Case-insensitive lookup by mapped name only, as the agents are shown
+        taskId = self.idsByMappedName.get(taskName.upper())
+        return self.tasks[taskId] if taskId is not None else None
+
+    def getMask(self, tasks, allowRepeats=False): # Bitmask of tasks, or None if any task is unknown (or listed twice, unless allowRepeats)
+        mask = 0
+        for task in tasks:
+            taskId = self.getTaskId(task)
+            if taskId is None or (mask >> taskId & 1 and not allowRepeats):
+                return None
+            mask |= 1 << taskId
+        return mask
+
+    def getTasks(self, mask): # Tasks in a bitmask, in id order
+        return [task for taskId, task in enumerate(self.tasks) if mask >> taskId & 1]
+
+    @property
+    def fullMask(self):
+        return (1 << len(self.tasks)) - 1
+
+    def __len__(self):
+        return len(self.tasks)
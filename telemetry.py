@@ -0,0 +1,134 @@
+import json
+import os
+
+def estimateTokens(text): # Rough count (about 4 characters per token) for backends that don't report usage
+    return max(1, len(text) // 4) if text else 0
+
+class CallRecord:
+    """
+    One model call made by an Agent: token counts, wall latency, time to first token (streamed calls only)
+    and generation speed. Token counts come from the backend's usage metadata, or are estimated from the
+    text when the backend doesn't report them (estimated=True), e.g. for streams stopped early.
+    """
+    def __init__(self, agentName):
+        self.agentName = agentName
+        self.promptTokens = 0
+        self.completionTokens = 0
+        self.latency = None # Seconds
+        self.timeToFirstToken = None # Seconds, None unless the response was streamed
+        self.generationSeconds = None # Backend-reported generation time, when available
+        self.estimated = False
+        self.cached = False # Served by the response cache
+        self.timedOut = False
+        self.failed = False
+        self.cancelled = False # A best-of-k sample dropped because another sample of the batch was valid first
+        self.hedged = False # A duplicate request was sent after the model's hedge delay (see LatencyTracker)
+        self.hedgeWon = False # The duplicate finished first
+        self.hedgeSecondsSaved = 0.0 # Estimated, when the duplicate won
+        self.reasoningTokens = 0 # Estimated tokens inside the <think> block of reasoning models
+        self.reasoningSeconds = 0.0 # Measured while streaming, otherwise the reasoning's share of the generation time
+        self.thinkingBudgetHit = False # The reasoning was cut off by the agent's thinking budget
+        self.endpoint = None # BackendPool endpoint URL, if the call went through a pool
+        self.contextTokensSaved = 0 # Estimated history tokens a context window kept out of the prompt
+
+    def setUsage(self, message, estimatedPromptTokens, responseText): # Token counts from a response message (or its last chunk)
+        usage = getattr(message, "usage_metadata", None)
+        metadata = getattr(message, "response_metadata", None) or {}
+        tokenUsage = metadata.get("token_usage") or metadata.get("usage") or {} # OpenAI
+        if usage:
+            self.promptTokens, self.completionTokens = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+        elif tokenUsage:
+            self.promptTokens, self.completionTokens = tokenUsage.get("prompt_tokens", 0), tokenUsage.get("completion_tokens", 0)
+        else:
+            self.promptTokens, self.completionTokens = estimatedPromptTokens, estimateTokens(responseText)
+            self.estimated = True
+        if metadata.get("eval_duration"): # Ollama reports generation time in nanoseconds
+            self.generationSeconds = metadata["eval_duration"] / 1e9
+
+    @property
+    def tokensPerSecond(self):
+        seconds = self.generationSeconds
+        if seconds is None and self.latency is not None:
+            seconds = self.latency - (self.timeToFirstToken or 0.0)
+        if not seconds or self.cached or self.failed or self.timedOut or self.cancelled:
+            return None
+        return self.completionTokens / seconds
+
+    def toDict(self):
+        return {
+            "agentName": self.agentName, "promptTokens": self.promptTokens, "completionTokens": self.completionTokens,
+            "latency": self.latency, "timeToFirstToken": self.timeToFirstToken, "tokensPerSecond": self.tokensPerSecond,
+            "estimated": self.estimated, "cached": self.cached, "timedOut": self.timedOut, "failed": self.failed, "endpoint": self.endpoint,
+            "contextTokensSaved": self.contextTokensSaved, "cancelled": self.cancelled,
+            "hedged": self.hedged, "hedgeWon": self.hedgeWon, "hedgeSecondsSaved": self.hedgeSecondsSaved,
+            "reasoningTokens": self.reasoningTokens, "reasoningSeconds": self.reasoningSeconds, "thinkingBudgetHit": self.thinkingBudgetHit,
+        }
+
+class TurnRecord:
+    """
+    One turn of NegotiationManager.process_proposal: every attempt's model call, the flag each failed attempt
+    ended with, and the time spent parsing, repairing and validating.
+    """
+    def __init__(self, roundIndex, iteration, agentName):
+        self.roundIndex = roundIndex
+        self.iteration = iteration
+        self.agentName = agentName
+        self.retries = 0
+        self.failureFlags = [] # One NegotiationFlag name per failed attempt
+        self.parseSeconds = 0.0
+        self.repairSeconds = 0.0
+        self.validateSeconds = 0.0
+        self.calls = [] # CallRecords of this turn's attempts
+        self.succeeded = False
+
+    def toDict(self):
+        return {
+            "roundIndex": self.roundIndex, "iteration": self.iteration, "agentName": self.agentName,
+            "retries": self.retries, "failureFlags": self.failureFlags, "succeeded": self.succeeded,
+            "parseSeconds": self.parseSeconds, "repairSeconds": self.repairSeconds, "validateSeconds": self.validateSeconds,
+            "calls": [call.toDict() for call in self.calls],
+        }
+
+class TurnTelemetryWriter:
+    """
+    Optional per-turn JSONL stream in Logs: one TurnRecord per line, written as each turn finishes.
+    """
+    def __init__(self, logFilename):
+        os.makedirs("Logs", exist_ok=True)
+        self.logFilepath = os.path.join("Logs", logFilename)
+        self.file = open(self.logFilepath, mode='a')
+
+    def write(self, turnRecord):
+        self.file.write(json.dumps(turnRecord.toDict()) + "\n")
+
+    def close(self):
+        self.file.close()
+
+def mean(values):
+    values = [value for value in values if value is not None]
+    return sum(values) / len(values) if values else None
+
+def getRoundTelemetry(negotiation):
+    """
+    Per-round telemetry columns, aggregated over the negotiation's turn records (including discarded attempts).
+    """
+    calls = [call for turn in negotiation.turnRecords for call in turn.calls]
+    liveCalls = [call for call in calls if not call.cached]
+    tokens = {agent.agentName: [0, 0] for agent in (negotiation.agent1, negotiation.agent2)}
+    for call in calls:
+        tokens[call.agentName][0] += call.promptTokens
+        tokens[call.agentName][1] += call.completionTokens
+    generationSeconds = sum(call.latency - (call.timeToFirstToken or 0.0) for call in liveCalls if call.latency is not None and not call.failed)
+    completionTokens = sum(call.completionTokens for call in liveCalls if not call.failed)
+    return {
+        "Agent1PromptTokens": tokens[negotiation.agent1.agentName][0],
+        "Agent1CompletionTokens": tokens[negotiation.agent1.agentName][1],
+        "Agent2PromptTokens": tokens[negotiation.agent2.agentName][0],
+        "Agent2CompletionTokens": tokens[negotiation.agent2.agentName][1],
+        "ModelCalls": len(calls),
+        "MeanLatency": mean([call.latency for call in liveCalls]),
+        "MeanTimeToFirstToken": mean([call.timeToFirstToken for call in liveCalls]),
+        "TokensPerSecond": completionTokens / generationSeconds if generationSeconds > 0 else None,
+        "NegotiationSeconds": negotiation.phaseTimes["setup"] + negotiation.phaseTimes["turnLoop"],
+        "ContextTokensSaved": sum(call.contextTokensSaved for call in calls),
+    }
@@ -0,0 +1,6 @@
+import os
+import sys
+
+rootDirectory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, rootDirectory) # The modules live at the top level of the repository
+os.chdir(rootDirectory) # Agents load SystemInstructions/ relative to the working directory
@@ -0,0 +1,91 @@
+from scoring import scoringEngine
+from psrMappings import psrMapping
+from proposal import Proposal
+from task import Task
+from itertools import combinations
+import pytest
+import random
+
+preferences = sorted(psrMapping)
+
+def createTasks(numTasks, seed): # Random tasks on the 0.1 preference grid, so ties are common
+    rng = random.Random(seed)
+    return [Task(f"Task {chr(ord('A') + i)}", rng.choice(preferences), rng.choice(preferences)) for i in range(numTasks)]
+
+def getAllSplits(tasks): # Every (agent1Tasks, agent2Tasks) split of tasks
+    for size in range(len(tasks) + 1):
+        for combo in combinations(range(len(tasks)), size):
+            yield [tasks[i] for i in combo], [task for i, task in enumerate(tasks) if i not in combo]
+
+@pytest.fixture
+def engine():
+    return scoringEngine("unused.csv")
+
+@pytest.mark.parametrize("numTasks,seed", [(1, 0), (3, 1), (5, 2), (6, 3), (7, 4)])
+def test_dp_rank_matches_enumeration(engine, numTasks, seed):
+    tasks = createTasks(numTasks, seed)
+    for agent1Tasks, agent2Tasks in getAllSplits(tasks):
+        proposal = Proposal(agent1Tasks, agent2Tasks)
+        assert engine.getAllocationRank(proposal, tasks) == engine.getAllocationRankByEnumeration(proposal, tasks)
+
+def test_dp_rank_of_invalid_allocation_matches_enumeration(engine):
+    tasks = createTasks(4, 5)
+    for proposal in (Proposal(tasks[:2], tasks[1:]), Proposal(tasks[:1], tasks[2:]), Proposal(tasks, [Task("Task Z", 0.5, 0.5)])):
+        assert engine.getAllocationRank(proposal, tasks) is None
+        assert engine.getAllocationRankByEnumeration(proposal, tasks) is None
+
+@pytest.mark.parametrize("numTasks,seed", [(1, 6), (4, 7), (6, 8), (8, 9)])
+def test_closed_form_optimum_matches_enumeration(engine, numTasks, seed):
+    tasks = createTasks(numTasks, seed)
+    bestUtility = max(Proposal(agent1Tasks, agent2Tasks).totalUtility for agent1Tasks, agent2Tasks in getAllSplits(tasks))
+    optimal = engine.getOptimalAllocation(tasks)
+    assert engine.getOptimalUtility(tasks) == pytest.approx(bestUtility)
+    assert optimal.totalUtility == pytest.approx(bestUtility)
+    assert engine.getAllocationRankByEnumeration(optimal, tasks) == 1
+
+def test_closed_form_ties_go_to_agent_2(engine):
+    tasks = [Task("Task A", 0.5, 0.5), Task("Task B", 0.9, 0.2), Task("Task C", 0.1, 0.3)]
+    optimal = engine.getOptimalAllocation(tasks)
+    assert [task.name for task in optimal.agent1Tasks] == ["Task B"]
+    assert [task.name for task in optimal.agent2Tasks] == ["Task A", "Task C"]
+
+def test_cached_analysis_matches_uncached_scoring(engine):
+    tasks = createTasks(6, 10)
+    for agent1Tasks, agent2Tasks in list(getAllSplits(tasks))[::5]:
+        roundData = {"tasks": tasks, "agent1Tasks": agent1Tasks, "agent2Tasks": agent2Tasks}
+        analysis = engine.analyzeRound(roundData)
+        uncached = scoringEngine("unused.csv", analysisCacheSize=0)
+        assert analysis.allocationRank == uncached.getAllocationRankByEnumeration(Proposal(agent1Tasks, agent2Tasks), tasks)
+        assert analysis.optimalUtility == pytest.approx(max(Proposal(*split).totalUtility for split in getAllSplits(tasks)))
+        assert analysis.percentageAway == uncached.getPercentageAwayFromOptimal(agent1Tasks, agent2Tasks)
+        assert analysis.isOptimal == (analysis.allocationRank == 1)
+
+def test_analysis_cache_ignores_task_order(engine):
+    tasks = createTasks(5, 11)
+    roundData = {"tasks": tasks, "agent1Tasks": tasks[:2], "agent2Tasks": tasks[2:]}
+    shuffled = {"tasks": tasks[::-1], "agent1Tasks": tasks[1::-1], "agent2Tasks": tasks[:1:-1]}
+    analysis = engine.analyzeRound(roundData)
+    assert engine.analyzeRound(shuffled) is analysis
+    assert (engine.analysisCache.hits, engine.analysisCache.misses) == (1, 1)
+    assert len(engine.profileCache) == 1
+
+def getSplitKeys(proposals): # Each allocation as (agent1 task names, agent2 task names)
+    return {(frozenset(task.name for task in proposal.agent1Tasks), frozenset(task.name for task in proposal.agent2Tasks)) for proposal in proposals}
+
+@pytest.mark.parametrize("numTasks,seed", [(0, 12), (1, 13), (4, 14), (7, 15), (9, 16)])
+def test_numpy_groups_match_enumeration(engine, numTasks, seed):
+    tasks = createTasks(numTasks, seed)
+    expected = engine.getGroupedRankedAllocations(tasks)
+    vectorized = engine.getGroupedRankedAllocations(tasks, backend="numpy")
+    assert sorted(vectorized) == sorted(expected)
+    for groupIndex, group in expected.items():
+        assert getSplitKeys(vectorized[groupIndex]) == getSplitKeys(group) # Order within a tie group may differ
+        assert len(vectorized[groupIndex]) == len(group)
+        assert vectorized[groupIndex].totalUtility == pytest.approx(group[0].totalUtility)
+
+def test_numpy_histogram_matches_enumeration(engine):
+    tasks = createTasks(8, 17)
+    levels, counts = engine.getAllocationUtilityHistogram(tasks)
+    expected = engine.getGroupedRankedAllocations(tasks)
+    assert list(levels) == pytest.approx([expected[groupIndex][0].totalUtility for groupIndex in sorted(expected)])
+    assert list(counts) == [len(expected[groupIndex]) for groupIndex in sorted(expected)]
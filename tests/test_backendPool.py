@@ -0,0 +1,109 @@
+from backendPool import BackendPool
+from scriptedOllamaServer import ScriptedOllamaServer
+from agent import Agent
+from telemetry import CallRecord
+from langchain_core.messages import HumanMessage
+import asyncio
+import pytest
+import time
+
+modelName = "gemma2" # Any name the pool treats as an Ollama model; the scripted servers answer for all of them
+
+@pytest.fixture
+def servers():
+    with ScriptedOllamaServer(seed=1) as server1, ScriptedOllamaServer(seed=2) as server2:
+        yield server1, server2
+
+async def callOnce(pool): # One chat call through the pool, returns (endpoint url, succeeded)
+    endpoint = pool.acquire()
+    succeeded = False
+    try:
+        await pool.getClient(endpoint, modelName).ainvoke([HumanMessage(content="Hello, let's split the tasks.")])
+        succeeded = True
+    except Exception:
+        pass
+    finally:
+        pool.release(endpoint, succeeded, 0.0)
+    return endpoint.url, succeeded
+
+def runCalls(pool, numCalls): # Sequential calls on one event loop, like a round
+    async def run():
+        return [await callOnce(pool) for _ in range(numCalls)]
+    return asyncio.run(run())
+
+def test_round_robin_alternates_endpoints(servers):
+    pool = BackendPool([server.url for server in servers], strategy="round_robin")
+    results = runCalls(pool, 6)
+    assert all(succeeded for _, succeeded in results)
+    urls = [url for url, _ in results]
+    assert urls[0] != urls[1] and urls[::2] == [urls[0]] * 3 and urls[1::2] == [urls[1]] * 3
+    assert [server.numRequests for server in servers] == [3, 3]
+
+def test_least_loaded_picks_idle_endpoint(servers):
+    pool = BackendPool([server.url for server in servers], strategy="least_loaded")
+    busy = pool.acquire()
+    for _ in range(3): # The other endpoint is idle every time
+        endpoint = pool.acquire()
+        assert endpoint is not busy
+        pool.release(endpoint, True, 0.0)
+    second = pool.acquire()
+    assert second is not busy
+    assert [endpoint.inFlight for endpoint in pool.endpoints] == [1, 1]
+
+def test_clients_reuse_connections(servers):
+    pool = BackendPool([server.url for server in servers], strategy="round_robin")
+    runCalls(pool, 10)
+    assert [server.numRequests for server in servers] == [5, 5]
+    assert [server.numConnections for server in servers] == [1, 1]
+    assert len(pool.clients) == 2
+
+def test_failing_endpoint_is_marked_unhealthy_and_recovers(servers):
+    server1, server2 = servers
+    pool = BackendPool([server1.url, server2.url], strategy="round_robin", unhealthyAfter=2, retryUnhealthyAfter=0.5)
+    server1.available = False
+    results = runCalls(pool, 6)
+    failing = pool.endpoints[0]
+    assert not failing.healthy and failing.numFailures == 2
+    assert all(succeeded for url, succeeded in results if url == server2.url)
+    assert [url for url, _ in results[4:]] == [server2.url, server2.url] # Skipped while unhealthy
+
+    server1.available = True
+    time.sleep(0.6)
+    urls = [url for url, _ in runCalls(pool, 4)]
+    assert server1.url in urls # Probed after the retry delay, and healthy again once it answers
+    assert failing.healthy and failing.consecutiveFailures == 0
+
+def test_failure_rate_marks_endpoint_unhealthy(servers):
+    server1, server2 = servers
+    server1.failureRate = 1.0
+    pool = BackendPool([server1.url, server2.url], strategy="round_robin", unhealthyAfter=3, retryUnhealthyAfter=60.0)
+    runCalls(pool, 10)
+    assert not pool.endpoints[0].healthy and pool.endpoints[0].numRequests == 3
+    assert pool.endpoints[1].healthy and pool.endpoints[1].numFailures == 0
+
+def test_cancelled_calls_are_not_failures(servers):
+    for server in servers:
+        server.stallRate, server.stallSeconds = 1.0, 1.0
+    pool = BackendPool([server.url for server in servers], unhealthyAfter=1)
+    agent = Agent("Finn", modelName, False, "default", backendPool=pool)
+
+    async def cancelCalls():
+        requests = [asyncio.create_task(agent.requestAsync([HumanMessage(content="Hello")], CallRecord("Finn"), time.perf_counter())) for _ in range(2)]
+        await asyncio.sleep(0.2)
+        for request in requests:
+            request.cancel()
+        results = await asyncio.gather(*requests, return_exceptions=True)
+        assert all(isinstance(result, asyncio.CancelledError) for result in results)
+    asyncio.run(cancelCalls())
+
+    assert all(endpoint.healthy for endpoint in pool.endpoints)
+    assert sum(endpoint.numFailures for endpoint in pool.endpoints) == 0
+    assert sum(endpoint.numCancelled for endpoint in pool.endpoints) == 2
+    assert all(endpoint.inFlight == 0 for endpoint in pool.endpoints)
+
+def test_timed_out_call_counts_as_failure(servers):
+    pool = BackendPool([server.url for server in servers], unhealthyAfter=1)
+    endpoint = pool.acquire()
+    pool.release(endpoint, None) # Cancelled by the response timeout
+    pool.recordTimeout(endpoint.url)
+    assert endpoint.numCancelled == 0 and endpoint.numFailures == 1 and not endpoint.healthy
@@ -0,0 +1,75 @@
+from benchmarkHarness import buildNegotiationKwargs
+from roundScheduler import RoundScheduler
+from negotiation import Negotiation
+from negotiationManager import NegotiationManager
+from negotiationFlag import NegotiationFlag
+from proposal import formatProposalBlock
+from telemetry import TurnRecord
+from langchain_core.messages import AIMessage
+import asyncio
+import pytest
+
+@pytest.fixture
+def negotiation():
+    n = Negotiation(1, 4, 8, "scripted", False, "default", "scripted", False, "default", "Finn", "Jake", False, agentOptions={"bestOfK": 3})
+    n.manager = NegotiationManager(n)
+    n.manager.setup_initial_conditions()
+    n.agent1.samplingSeed = None # Samples 2 and 3 get seeds 1 and 2
+    return n
+
+def getValidResponse(n):
+    names = [task.mappedName for task in n.tasks]
+    return f"Here is a split.\n\n{formatProposalBlock(names[:2], names[2:], False)}"
+
+def scriptSamples(agent, plan): # plan maps each sample's seed to (delay, response); returns the seeds that were cancelled
+    cancelled = []
+    async def sampleResponseAsync(messages, promptTokens, sampleSeed=None, callRecord=None):
+        delay, response = plan[sampleSeed]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(sampleSeed)
+            raise
+        return response if response == NegotiationFlag.TIMEOUTERROR else (response, None)
+    agent.sampleResponseAsync = sampleResponseAsync
+    return cancelled
+
+def sample(n):
+    return asyncio.run(n.manager.sample_proposals_async(n.agent1, n.agent2, "Hello, let's split the tasks.", 0, TurnRecord(1, 0, "Finn")))
+
+def getResponses(agent):
+    return [message.content for message in agent.memory.getMessages() if isinstance(message, AIMessage)]
+
+def test_first_valid_sample_wins(negotiation):
+    valid = getValidResponse(negotiation)
+    cancelled = scriptSamples(negotiation.agent1, {None: (0.0, "No proposal here."), 1: (0.05, valid), 2: (5.0, valid)})
+    response, proposal, result = sample(negotiation)
+    assert result == NegotiationFlag.ERROR_FREE and response == valid.strip()
+    assert proposal.agent1Tasks == negotiation.tasks[:2]
+    assert cancelled == [2]
+    assert getResponses(negotiation.agent1) == [valid] # The invalid sample and its feedback were undone
+    assert negotiation.missingProposalWarning not in [message.content for message in negotiation.agent1.memory.getMessages()]
+
+def test_all_invalid_samples_leave_the_last_failure(negotiation):
+    cancelled = scriptSamples(negotiation.agent1, {None: (0.0, "First."), 1: (0.02, "Second."), 2: (0.04, NegotiationFlag.TIMEOUTERROR)})
+    response, _, result = sample(negotiation)
+    assert result == NegotiationFlag.PROPOSAL_NOT_FOUND and response == "Second."
+    assert cancelled == []
+    assert getResponses(negotiation.agent1) == ["Second."] # Exactly what one failed serial attempt leaves
+    assert negotiation.agent1.memory.getMessages()[-1].content == negotiation.missingProposalWarning
+
+def test_samples_past_the_timeout_are_cancelled(negotiation):
+    negotiation.agent1.responseTimeout = 0.05
+    cancelled = scriptSamples(negotiation.agent1, {seed: (5.0, getValidResponse(negotiation)) for seed in (None, 1, 2)})
+    assert sample(negotiation) == (NegotiationFlag.TIMEOUTERROR, None, None)
+    assert sorted(cancelled, key=str) == sorted([None, 1, 2], key=str)
+    assert getResponses(negotiation.agent1) == []
+
+def test_best_of_k_rounds_finish_with_fewer_retries():
+    def runRounds(agentOptions):
+        negotiationKwargs = buildNegotiationKwargs(4, 16, "scripted:malformed=0.4,latency=0.01,jitter=0.008", agentOptions)
+        return RoundScheduler(backendLimits={}).runRounds(range(1, 5), negotiationKwargs)
+    serial, sampled = runRounds(None), runRounds({"bestOfK": 3, "bestOfKOnFirstAttempt": True})
+    assert not any(n.DNF for n in sampled)
+    assert sum(sum(n.retryCounts.values()) for n in sampled) < sum(sum(n.retryCounts.values()) for n in serial)
+    assert any(record.cancelled for n in sampled for agent in (n.agent1, n.agent2) for record in agent.callRecords)
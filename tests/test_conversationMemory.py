@@ -0,0 +1,81 @@
+from conversationMemory import ConversationMemory, ContextWindow
+from telemetry import estimateTokens
+from langchain.schema import AIMessage, HumanMessage, SystemMessage
+
+def buildMemory(numExchanges): # Instructions, then partner message and reply numExchanges times
+    memory = ConversationMemory([SystemMessage(content="You negotiate tasks with your partner.")])
+    for i in range(numExchanges):
+        memory.append(HumanMessage(content=f"Partner proposal {i}"))
+        memory.append(AIMessage(content=f"My counter proposal {i}"))
+    return memory
+
+def countTokens(messages):
+    return sum(estimateTokens(str(message.content)) for message in messages)
+
+def test_token_count_follows_changes():
+    memory = buildMemory(2)
+    assert memory.numTokens == countTokens(memory)
+    memory.replace(-1, AIMessage(content="A much longer counter proposal than the one before it"))
+    memory.retract()
+    memory.append(SystemMessage(content="Your proposal was malformed."), transient=True)
+    assert memory.numTokens == countTokens(memory) and len(memory) == 5
+
+def test_clear_transient_keeps_the_rest():
+    memory = buildMemory(1)
+    memory.append(HumanMessage(content="Partner proposal 1"))
+    memory.append(AIMessage(content="Broken reply"))
+    memory.append(SystemMessage(content="Format error, try again."), transient=True)
+    memory.append(AIMessage(content="Fixed reply"))
+    memory.append(SystemMessage(content="Mismatch warning."), transient=True)
+    memory.clearTransient()
+    assert [message.content for message in memory][-3:] == ["Partner proposal 1", "Broken reply", "Fixed reply"]
+    assert memory.transientIndices == [] and memory.numTokens == countTokens(memory)
+
+def test_retract_last_response_keeps_feedback():
+    memory = buildMemory(1)
+    memory.append(HumanMessage(content="Partner proposal 1"))
+    memory.append(AIMessage(content="Rejected reply"))
+    memory.append(SystemMessage(content="Your proposal was invalid."), transient=True)
+    assert memory.retractLastResponse().content == "Rejected reply"
+    assert [message.content for message in memory][-2:] == ["Partner proposal 1", "Your proposal was invalid."]
+    assert memory.retractLastResponse() is None # Nothing left to retract in this turn
+    assert memory.transientIndices == [len(memory) - 1]
+
+def test_copy_is_independent():
+    memory = buildMemory(1)
+    copy = memory.copy()
+    copy.append(HumanMessage(content="Only in the copy"))
+    assert len(memory) == 3 and len(copy) == 4 and memory.numTokens < copy.numTokens
+
+def test_context_window_keeps_recent_exchanges_and_summary():
+    memory = buildMemory(6)
+    memory.append(HumanMessage(content="Partner proposal 6")) # Opens the current turn
+    messages, tokens = ContextWindow(maxExchanges=2).selectMessages(memory, "State: Chess is still contested.")
+    contents = [message.content for message in messages]
+    assert contents[0] == memory[0].content
+    assert contents[1:5] == ["Partner proposal 4", "My counter proposal 4", "Partner proposal 5", "My counter proposal 5"]
+    assert contents[5:] == ["State: Chess is still contested.", "Partner proposal 6"]
+    assert tokens == countTokens(messages) and tokens < memory.numTokens
+
+def test_context_window_sends_short_history_as_is():
+    memory = buildMemory(2)
+    memory.append(HumanMessage(content="Partner proposal 2"))
+    messages, tokens = ContextWindow(maxExchanges=4).selectMessages(memory, "State summary")
+    assert messages is memory.getMessages() and tokens == memory.numTokens
+
+def test_context_window_slides_in_steps():
+    window = ContextWindow(maxExchanges=3, slideBy=2)
+    firstKept = []
+    for numExchanges in range(4, 8):
+        memory = buildMemory(numExchanges)
+        memory.append(HumanMessage(content=f"Partner proposal {numExchanges}"))
+        firstKept.append(window.selectMessages(memory, "State")[0][1].content)
+    assert firstKept == ["Partner proposal 2"] * 2 + ["Partner proposal 4"] * 2 # Prefix stays put until the next slide
+
+def test_context_window_token_budget_drops_oldest_first():
+    memory = buildMemory(6)
+    memory.append(HumanMessage(content="Partner proposal 6"))
+    budget = countTokens([memory[0], memory[-1]]) + estimateTokens("State") + countTokens(memory[-3:-1])
+    messages, tokens = ContextWindow(maxExchanges=10, maxPromptTokens=budget).selectMessages(memory, "State")
+    assert [message.content for message in messages][1:3] == ["Partner proposal 5", "My counter proposal 5"]
+    assert tokens <= budget
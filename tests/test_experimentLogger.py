@@ -0,0 +1,98 @@
+from logger import ExperimentLogger, logColumns, logTuple, log, openLoggers
+import csv
+import os
+import subprocess
+import sys
+import threading
+import time
+import pytest
+
+fcntl = pytest.importorskip("fcntl") # The logger only locks on POSIX
+
+@pytest.fixture
+def logsDirectory(tmp_path, monkeypatch): # Logs/ is relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / "Logs"
+
+def readRows(path):
+    with open(path, newline='') as file:
+        return list(csv.reader(file))
+
+def test_rows_from_many_threads_are_written_whole(logsDirectory):
+    experimentLogger = ExperimentLogger("threads.csv", flushInterval=0.01, flushEveryRows=7)
+    def produce(threadIndex):
+        for rowIndex in range(50):
+            experimentLogger.logTuple((threadIndex, rowIndex, "a,b", 'quote "x"'))
+    threads = [threading.Thread(target=produce, args=(threadIndex,)) for threadIndex in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    experimentLogger.flush()
+    rows = readRows(logsDirectory / "threads.csv")
+    assert rows[0] == logColumns
+    assert sorted((int(row[0]), int(row[1])) for row in rows[1:]) == [(t, r) for t in range(4) for r in range(50)]
+    assert all(row[2:] == ["a,b", 'quote "x"'] for row in rows[1:])
+    for threadIndex in range(4): # Each producer's rows keep their order
+        assert [int(row[1]) for row in rows[1:] if row[0] == str(threadIndex)] == list(range(50))
+    experimentLogger.close()
+
+def test_rows_are_batched(logsDirectory):
+    experimentLogger = ExperimentLogger("batches.csv", flushInterval=60.0, flushEveryRows=10)
+    for rowIndex in range(25):
+        experimentLogger.logTuple((rowIndex,))
+    deadline = time.monotonic() + 5
+    while experimentLogger.numRows < 20 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert (experimentLogger.numRows, experimentLogger.numFlushes) == (20, 2) # The last 5 wait for the interval or a flush
+    experimentLogger.flush()
+    assert (experimentLogger.numRows, experimentLogger.numFlushes) == (25, 3)
+    experimentLogger.close()
+
+def test_close_writes_summary_block(logsDirectory):
+    with ExperimentLogger("summary.csv") as experimentLogger:
+        experimentLogger.log("NumTasks", 4)
+        experimentLogger.logTuple((1, "0:00:05"))
+        experimentLogger.close({"RoundsCompleted": 1})
+    rows = readRows(logsDirectory / "summary.csv")
+    assert rows[1:3] == [["NumTasks", "4"], ["1", "0:00:05"]]
+    assert rows[3][0] == "Summary"
+    assert [row[0] for row in rows[4:]] == ["RoundsCompleted", "RowsLogged", "LoggerWallTime"]
+    assert rows[5][1] == "2"
+    assert "summary.csv" not in openLoggers
+
+def test_module_functions_route_through_open_logger(logsDirectory):
+    experimentLogger = ExperimentLogger("routed.csv", flushInterval=60.0)
+    logTuple("routed.csv", (1, 2))
+    log("routed.csv", "Label", "value")
+    assert experimentLogger.numRows == 0 # Buffered until the interval or close
+    experimentLogger.close()
+    logTuple("routed.csv", (3, 4)) # Closed: written directly
+    assert readRows(logsDirectory / "routed.csv")[1:3] == [["1", "2"], ["Label", "value"]]
+    assert readRows(logsDirectory / "routed.csv")[-1] == ["3", "4"]
+
+def test_writes_wait_for_the_file_lock(logsDirectory):
+    experimentLogger = ExperimentLogger("locked.csv", flushInterval=60.0)
+    path = logsDirectory / "locked.csv"
+    with open(path) as other: # Another process's writer holding the lock
+        fcntl.flock(other, fcntl.LOCK_EX)
+        experimentLogger.logTuple((1,))
+        flusher = threading.Thread(target=experimentLogger.flush)
+        flusher.start()
+        time.sleep(0.2)
+        assert flusher.is_alive() and len(readRows(path)) == 1
+        fcntl.flock(other, fcntl.LOCK_UN)
+    flusher.join(5)
+    assert not flusher.is_alive() and readRows(path)[1] == ["1"]
+    experimentLogger.close()
+
+def test_unclosed_logger_is_flushed_at_exit(logsDirectory):
+    rootDirectory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = (f"import sys; sys.path.insert(0, {rootDirectory!r})\n"
+              "from logger import ExperimentLogger\n"
+              "experimentLogger = ExperimentLogger('exit.csv', flushInterval=60.0)\n"
+              "for rowIndex in range(3): experimentLogger.logTuple((rowIndex,))\n")
+    subprocess.run([sys.executable, "-c", script], check=True, timeout=30)
+    rows = readRows(logsDirectory / "exit.csv")
+    assert rows[1:4] == [["0"], ["1"], ["2"]]
+    assert rows[4][0] == "Summary" and ["RowsLogged", "3"] in rows
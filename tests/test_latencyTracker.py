@@ -0,0 +1,118 @@
+from latencyTracker import LatencyTracker
+from agent import Agent
+from telemetry import CallRecord
+import asyncio
+import pytest
+import time
+
+modelName = "scripted"
+
+def createTracker(latencies, **options):
+    tracker = LatencyTracker(minSamples=10, **options)
+    for latency in latencies:
+        tracker.record(modelName, latency)
+    return tracker
+
+def test_percentiles_need_min_samples():
+    tracker = createTracker([1.0] * 9)
+    assert tracker.getPercentile(modelName, 0.5) is None
+    tracker.record(modelName, 1.0)
+    assert tracker.getPercentile(modelName, 0.5) == 1.0
+
+def test_nearest_rank_percentile():
+    tracker = createTracker([float(seconds) for seconds in range(1, 101)])
+    assert tracker.getPercentile(modelName, 0.5) == 51.0
+    assert tracker.getPercentile(modelName, 0.99) == 100.0
+
+def test_window_drops_oldest_latencies():
+    tracker = LatencyTracker(windowSize=10, minSamples=10)
+    for latency in [100.0] * 10 + [1.0] * 10:
+        tracker.record(modelName, latency)
+    assert tracker.getPercentile(modelName, 0.99) == 1.0
+    assert tracker.getModel(modelName).numCalls == 20
+
+def test_timeout_is_fixed_by_default():
+    tracker = createTracker([20.0] * 50)
+    assert tracker.getTimeout(modelName, 120) == 120
+
+def test_adaptive_timeout_is_clamped():
+    assert createTracker([1.0] * 9, adaptiveTimeouts=True).getTimeout(modelName, 120) == 120 # Not enough calls yet
+    assert createTracker([1.0] * 50, adaptiveTimeouts=True).getTimeout(modelName, 120) == 30.0
+    assert createTracker([20.0] * 50, adaptiveTimeouts=True).getTimeout(modelName, 120) == 60.0
+    assert createTracker([200.0] * 50, adaptiveTimeouts=True).getTimeout(modelName, 120) == 320.0
+
+def test_timeouts_raise_adaptive_timeout():
+    tracker = createTracker([20.0] * 10, adaptiveTimeouts=True)
+    for _ in range(10):
+        tracker.recordTimeout(modelName, tracker.getTimeout(modelName, 120))
+    assert tracker.getModel(modelName).numTimeouts == 10
+    assert tracker.getTimeout(modelName, 120) == 320.0
+
+def test_hedge_delay_is_opt_in_and_capped():
+    assert createTracker([1.0] * 20).getHedgeDelay(modelName) is None
+    tracker = createTracker([1.0] * 18 + [5.0] * 2, hedgePercentile=0.9, maxHedgeFraction=0.1)
+    assert tracker.getHedgeDelay(modelName) == 5.0
+    tracker.recordHedge(modelName, won=True, secondsSaved=2.0)
+    tracker.recordHedge(modelName, won=False)
+    assert tracker.getHedgeDelay(modelName) is None # 2 hedges of 20 calls
+    assert (tracker.getModel(modelName).hedgeWins, tracker.getModel(modelName).secondsSaved) == (1, 2.0)
+
+def test_seconds_saved_estimate():
+    tracker = createTracker([1.0] * 8 + [4.0, 6.0])
+    assert tracker.estimateSecondsSaved(modelName, 2.0, 120) == 3.0 # Mean of the slower calls minus the hedge's latency
+    assert tracker.estimateSecondsSaved(modelName, 10.0, 120) == 110.0 # Nothing slower recorded: the primary looked stuck
+
+def createHedgingAgent(requestSeconds, failing=()):
+    """
+    Agent whose backend requests take requestSeconds[i] seconds (the i-th request sent) and fail if i is in failing.
+    The tracker hedges after 0.05s.
+    """
+    tracker = createTracker([0.01] * 18 + [0.05] * 2, hedgePercentile=0.9, maxHedgeFraction=1.0)
+    agent = Agent("Finn", modelName, False, "default", latencyTracker=tracker)
+    requests = []
+
+    async def requestAsync(messages, callRecord, callStart, sampleSeed=None, avoidUrl=None):
+        index = len(requests)
+        requests.append(callRecord)
+        callRecord.endpoint = f"endpoint{index}"
+        try:
+            await asyncio.sleep(requestSeconds[index])
+        except asyncio.CancelledError:
+            callRecord.cancelled = True
+            raise
+        if index in failing:
+            raise ConnectionError(f"request {index} failed")
+        return f"reply {index}", None
+    agent.requestAsync = requestAsync
+    return agent, tracker, requests
+
+def callModel(agent): # Returns ((text, message), callRecord)
+    callRecord = CallRecord(agent.agentName)
+    return asyncio.run(agent.callModelAsync([], callRecord, time.perf_counter())), callRecord
+
+def test_fast_call_is_not_hedged():
+    agent, tracker, requests = createHedgingAgent([0.0])
+    (text, _), callRecord = callModel(agent)
+    assert text == "reply 0" and len(requests) == 1
+    assert not callRecord.hedged and tracker.getModel(modelName).numHedges == 0
+
+def test_hedge_wins_and_primary_is_cancelled():
+    agent, tracker, requests = createHedgingAgent([1.0, 0.0])
+    (text, _), callRecord = callModel(agent)
+    assert text == "reply 1"
+    assert callRecord.hedged and callRecord.hedgeWon and callRecord.endpoint == "endpoint1"
+    assert requests[0].cancelled and callRecord.hedgeSecondsSaved > 0
+    assert (tracker.getModel(modelName).numHedges, tracker.getModel(modelName).hedgeWins) == (1, 1)
+
+def test_primary_wins_after_hedge_fails():
+    agent, tracker, requests = createHedgingAgent([0.2, 0.0], failing={1})
+    (text, _), callRecord = callModel(agent)
+    assert text == "reply 0"
+    assert callRecord.hedged and not callRecord.hedgeWon and callRecord.endpoint == "endpoint0"
+    assert (tracker.getModel(modelName).numHedges, tracker.getModel(modelName).hedgeWins) == (1, 0)
+
+def test_both_requests_failing_raises():
+    agent, tracker, requests = createHedgingAgent([0.1, 0.0], failing={0, 1})
+    with pytest.raises(ConnectionError):
+        callModel(agent)
+    assert (tracker.getModel(modelName).numHedges, tracker.getModel(modelName).hedgeWins) == (1, 0)
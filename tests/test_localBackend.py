@@ -0,0 +1,36 @@
+from localBackend import ScriptedChatModel, createScriptedModel, isScriptedModel
+from langchain_core.messages import HumanMessage
+import pytest
+
+def test_options_map_to_fields():
+    model = createScriptedModel("scripted:latency=0.2,jitter=0.05,malformed=0.1,timeout=0.01,mismatch=0.3,accept=0.5,think=300")
+    assert (model.latency, model.latencyJitter, model.malformedRate, model.timeoutRate) == (0.2, 0.05, 0.1, 0.01)
+    assert (model.mismatchRate, model.acceptStep, model.thinkTokens) == (0.3, 0.5, 300)
+    assert model.model == "scripted:latency=0.2,jitter=0.05,malformed=0.1,timeout=0.01,mismatch=0.3,accept=0.5,think=300"
+
+def test_missing_options_keep_defaults():
+    defaults = ScriptedChatModel()
+    for modelName in ("scripted", "scripted:", "scripted:latency=0.5,"):
+        model = createScriptedModel(modelName)
+        assert (model.malformedRate, model.timeoutRate, model.acceptStep) == (defaults.malformedRate, defaults.timeoutRate, defaults.acceptStep)
+    assert createScriptedModel("scripted: latency = 0.5").latency == 0.5
+
+@pytest.mark.parametrize("modelName", ["scripted:latncy=0.5", "scripted:latency=0.5,seed=3", "scripted:malformedRate=0.1"])
+def test_unknown_options_are_rejected(modelName):
+    with pytest.raises(ValueError, match="Unknown scripted model options"):
+        createScriptedModel(modelName)
+
+@pytest.mark.parametrize("modelName", ["scripted:latency", "scripted:latency=fast"])
+def test_options_need_numeric_values(modelName):
+    with pytest.raises(ValueError):
+        createScriptedModel(modelName)
+
+def test_scripted_names():
+    assert isScriptedModel("scripted") and isScriptedModel("Scripted:latency=0.1")
+    assert not isScriptedModel("gemma2") and not isScriptedModel("gpt-4o")
+
+def test_timeout_rate_raises():
+    model = createScriptedModel("scripted:timeout=1")
+    with pytest.raises(TimeoutError):
+        model.invoke([HumanMessage(content="Hello")])
+    assert createScriptedModel("scripted:timeout=0").invoke([HumanMessage(content="Hello")]).content
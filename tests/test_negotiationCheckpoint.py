@@ -0,0 +1,102 @@
+from benchmarkHarness import buildNegotiationKwargs
+from negotiation import Negotiation
+from negotiationCheckpoint import NegotiationCheckpoint, ResumePolicy
+from negotiationManager import NegotiationManager
+from roundScheduler import DiscardedAttempts, RoundScheduler
+from types import SimpleNamespace
+import asyncio
+
+def createNegotiation(roundIndex=1, maxIterations=16, modelName="scripted"):
+    return Negotiation(roundIndex, **buildNegotiationKwargs(4, maxIterations, modelName))
+
+def failOnceAt(monkeypatch, failAtIteration, reason): # Make the turn after failAtIteration turns give up once
+    original = NegotiationManager.process_proposal_async
+    calls = []
+
+    async def processProposalAsync(self, current_agent, other_agent, current_input):
+        if self.negotiation.numIterations == failAtIteration and not calls:
+            calls.append(current_agent.agentName)
+            self.failure_reason = reason
+            return None, None
+        return await original(self, current_agent, current_input=current_input, other_agent=other_agent)
+    monkeypatch.setattr(NegotiationManager, "process_proposal_async", processProposalAsync)
+    return calls
+
+def test_checkpoint_restore_rewinds_agents_and_manager():
+    n = createNegotiation()
+    n.startNegotiation()
+    checkpoint = NegotiationCheckpoint(n, n.agent2, "Your turn")
+    memories = {agent.agentName: list(agent.memory) for agent in (n.agent1, n.agent2)}
+    proposals = {agent.agentName: agent.currentProposal for agent in (n.agent1, n.agent2)}
+    numIterations, dealCounter, currentProposal = n.numIterations, n.manager.deal_counter, n.manager.current_proposal
+
+    n.numIterations += 5
+    n.agent1.addToChatHistory('system', "Changed after the checkpoint")
+    n.agent2.currentProposal = None
+    n.manager.deal_counter = 0
+    n.manager.current_proposal = None
+
+    currentAgent, otherAgent, currentInput = checkpoint.restore(n)
+    assert (currentAgent, otherAgent, currentInput) == (n.agent2, n.agent1, "Your turn")
+    assert n.numIterations == numIterations
+    assert {agent.agentName: list(agent.memory) for agent in (n.agent1, n.agent2)} == memories
+    assert {agent.agentName: agent.currentProposal for agent in (n.agent1, n.agent2)} == proposals
+    assert (n.manager.deal_counter, n.manager.current_proposal) == (dealCounter, currentProposal)
+
+def test_checkpoint_memories_are_independent_copies():
+    n = createNegotiation()
+    n.startNegotiation()
+    checkpoint = NegotiationCheckpoint(n, n.agent1, "Your turn")
+    checkpoint.restore(n)
+    n.agent1.addToChatHistory('system', "Only in the restored memory")
+    assert len(checkpoint.agentMemories[n.agent1.agentName]) == len(n.agent1.memory) - 1
+
+def test_resume_continues_from_last_valid_turn(monkeypatch):
+    calls = failOnceAt(monkeypatch, 2, "timeout")
+    n = createNegotiation()
+    n.startNegotiation()
+    assert n.DNF and n.dnfReason == "timeout" and calls == [n.agent1.agentName]
+    assert n.lastCheckpoint.numIterations == 2 and n.lastCheckpoint.currentAgentName == n.agent1.agentName
+
+    assert ResumePolicy().shouldResume(n)
+    n.resumeNegotiation()
+    assert not n.DNF and n.dnfReason is None
+    assert n.numResumes == 1 and n.manager.agreement_reached
+    assert n.numIterations > 2 and n.winningProposal is not None
+
+def test_resume_policy_limits():
+    policy = ResumePolicy(maxResumes=1, resumableReasons=("timeout",), maxRestarts=2)
+    n = SimpleNamespace(lastCheckpoint=object(), numResumes=0, dnfReason="timeout")
+    assert policy.shouldResume(n)
+    assert not policy.shouldResume(SimpleNamespace(lastCheckpoint=None, numResumes=0, dnfReason="timeout"))
+    assert not policy.shouldResume(SimpleNamespace(lastCheckpoint=object(), numResumes=1, dnfReason="timeout"))
+    assert not policy.shouldResume(SimpleNamespace(lastCheckpoint=object(), numResumes=0, dnfReason="max_iterations"))
+    assert [policy.shouldRestart(numRestarts) for numRestarts in range(3)] == [True, True, False]
+    assert all(ResumePolicy().shouldRestart(numRestarts) for numRestarts in (0, 5, 1000)) # Retry until success by default
+
+def test_scheduler_restarts_until_round_finishes():
+    scheduler = RoundScheduler(maxConcurrentRounds=1, backendLimits={})
+    kwargs = buildNegotiationKwargs(4, 8, "scripted:accept=0.05") # Round 3 runs out of turns on its first attempts
+    n = asyncio.run(scheduler.runRoundAsync(3, kwargs))
+    assert not n.DNF and n.numRestarts > 0
+
+def test_scheduler_gives_up_after_max_restarts():
+    scheduler = RoundScheduler(maxConcurrentRounds=1, backendLimits={}, resumePolicy=ResumePolicy(maxRestarts=1))
+    kwargs = buildNegotiationKwargs(4, 2, "scripted:accept=0")
+    n = asyncio.run(scheduler.runRoundAsync(1, kwargs))
+    assert n.DNF and n.dnfReason == "max_iterations" and n.numRestarts == 1
+
+def test_discarded_attempts_are_folded_into_final_attempt():
+    def attempt(retries, repairs, turns):
+        return SimpleNamespace(retryCounts={"Finn": retries, "Jake": 0}, repairCounts={"Finn": 0, "Jake": repairs}, numResumes=1,
+                               numInterventions=2, turnsRemaining=3, phaseTimes={"generate": 1.0, "parse": 0.5}, turnRecords=turns)
+    discarded = DiscardedAttempts()
+    discarded.add(attempt(2, 1, ["a1", "a2"]))
+    discarded.add(attempt(1, 3, ["b1"]))
+    final = attempt(4, 0, ["c1"])
+    discarded.addTo(final)
+    assert final.retryCounts == {"Finn": 7, "Jake": 0}
+    assert final.repairCounts == {"Finn": 0, "Jake": 4}
+    assert (final.numResumes, final.numInterventions, final.turnsRemaining) == (3, 6, 9)
+    assert final.phaseTimes == {"generate": 3.0, "parse": 1.5}
+    assert final.turnRecords == ["a1", "a2", "b1", "c1"] # Discarded turns first, in the order they ran
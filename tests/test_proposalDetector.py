@@ -0,0 +1,40 @@
+from proposalDetector import IncrementalProposalDetector
+
+proposalBlock = 'json\n{\n    "my_tasks": ["Task A"],\n    "partner_tasks": ["Task B"],\n    "has_deal": "False"\n}'
+
+def feedChunks(text, chunkSize): # Returns (detector, index of the chunk that completed the block or None)
+    detector = IncrementalProposalDetector()
+    for index in range(0, len(text), chunkSize):
+        if detector.feed(text[index:index + chunkSize]):
+            return detector, index // chunkSize
+    return detector, None
+
+def test_detects_block_split_across_chunks():
+    text = "Here is my offer.\n\n" + proposalBlock
+    for chunkSize in (1, 3, 7, len(text)):
+        detector, completedAt = feedChunks(text + "\n\nAnything after the block.", chunkSize)
+        assert detector.isComplete and completedAt == (len(text) - 1) // chunkSize
+        assert detector.getTrimmedText() == text
+
+def test_braces_inside_strings_are_ignored():
+    text = 'json {"message": "a } and a { in text", "my_tasks": ["Task {A}"], "partner_tasks": [\'it\\\'s }\'], "has_deal": "True"}'
+    detector, _ = feedChunks(text + " trailing", 4)
+    assert detector.isComplete and detector.getTrimmedText() == text
+
+def test_premature_close_keeps_scanning():
+    text = 'Example: json {"note": 1} then json {"my_tasks": [], "partner_tasks" ' # First block has no has_deal
+    detector, completedAt = feedChunks(text, 5)
+    assert completedAt is None and not detector.isComplete
+    assert detector.feed(': [], "has_deal" }') is False # Mentions has_deal but doesn't parse
+    assert detector.feed(' json {"my_tasks": [], "partner_tasks": [], "has_deal": "False"} end') is True
+    assert detector.getTrimmedText().endswith('"has_deal": "False"}')
+
+def test_incomplete_block_returns_whole_text():
+    text = "Thinking about it. " + proposalBlock[:-1]
+    detector, completedAt = feedChunks(text, 6)
+    assert completedAt is None and detector.getTrimmedText() == text
+
+def test_feed_after_completion_is_ignored():
+    detector, _ = feedChunks(proposalBlock, 10)
+    assert detector.feed(" more text") is True
+    assert detector.getTrimmedText() == proposalBlock
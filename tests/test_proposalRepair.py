@@ -0,0 +1,70 @@
+from negotiation import Negotiation
+from negotiationManager import NegotiationManager
+from negotiationFlag import NegotiationFlag
+from proposalRepair import ProposalRepairer
+import json
+import pytest
+
+@pytest.fixture
+def negotiation():
+    return Negotiation(1, 4, 8, "gemma2", False, "default", "gemma2", False, "default", "Finn", "Jake", False)
+
+def getNames(n, indices):
+    return [n.tasks[i].mappedName for i in indices]
+
+def repair(n, block):
+    return ProposalRepairer(n).repair("Here is my offer.\njson\n" + block, n.agent1)
+
+def test_fixes_formatting_slips(negotiation):
+    myNames, partnerNames = getNames(negotiation, (0, 1)), getNames(negotiation, (2, 3))
+    block = "{'my_tasks': %r, 'partner_tasks': %r, 'has_deal': False,}" % (myNames, partnerNames)
+    proposal, canonicalResponse = repair(negotiation, block)
+    assert proposal.agent1Tasks == negotiation.tasks[:2] and proposal.agent2Tasks == negotiation.tasks[2:]
+    assert not proposal.hasDeal
+    assert negotiation.extractProposalFromReponse(canonicalResponse, negotiation.agent1).equals(proposal)
+
+def test_resolves_misspelled_and_raw_names(negotiation):
+    myNames = [negotiation.tasks[0].mappedName.lower() + "s", negotiation.tasks[1].name]
+    block = json.dumps({"my_tasks": myNames, "partner_tasks": getNames(negotiation, (2, 3)), "has_deal": "True"})
+    proposal, _ = repair(negotiation, block)
+    assert proposal.agent1Tasks == negotiation.tasks[:2] and proposal.hasDeal
+
+def test_infers_missing_or_empty_side(negotiation):
+    for block in (json.dumps({"my_tasks": getNames(negotiation, (0,))}), json.dumps({"my_tasks": getNames(negotiation, (0,)), "partner_tasks": []})):
+        proposal, _ = repair(negotiation, block)
+        assert proposal.agent1Tasks == negotiation.tasks[:1] and proposal.agent2Tasks == negotiation.tasks[1:]
+
+def test_agent_two_sides_are_swapped(negotiation):
+    block = json.dumps({"my_tasks": getNames(negotiation, (0,)), "partner_tasks": getNames(negotiation, (1, 2, 3))})
+    proposal, _ = ProposalRepairer(negotiation).repair("json\n" + block, negotiation.agent2)
+    assert proposal.agent2Tasks == negotiation.tasks[:1] and proposal.agent1Tasks == negotiation.tasks[1:]
+
+def test_unresolvable_name_is_left_to_a_retry(negotiation):
+    blocks = [
+        json.dumps({"my_tasks": getNames(negotiation, (0,)) + ["Juggling"], "partner_tasks": []}),
+        json.dumps({"my_tasks": getNames(negotiation, (0, 1)), "partner_tasks": ["Juggling"]}),
+        json.dumps({"my_tasks": getNames(negotiation, (0,)), "partner_tasks": 3}),
+    ]
+    for block in blocks:
+        assert repair(negotiation, block) is None
+
+def test_rejects_invalid_or_empty_proposals(negotiation):
+    blocks = [
+        json.dumps({"my_tasks": getNames(negotiation, (0, 1)), "partner_tasks": getNames(negotiation, (1, 2))}), # Task given to both
+        json.dumps({"my_tasks": [], "partner_tasks": []}),
+        "no proposal at all",
+    ]
+    for block in blocks:
+        assert repair(negotiation, block) is None
+
+@pytest.mark.parametrize("repairProposals", [False, True])
+def test_repair_is_opt_in(repairProposals):
+    n = Negotiation(1, 4, 8, "gemma2", False, "default", "gemma2", False, "default", "Finn", "Jake", False, repairProposals=repairProposals)
+    manager = NegotiationManager(n)
+    n.numIterations = 1
+    n.agent1.addToChatHistory('assistant', "placeholder")
+    myNames = [n.tasks[0].mappedName.lower() + "s", n.tasks[1].mappedName] # Misspelled, only the repairer resolves it
+    response = "Here is my offer.\njson\n" + json.dumps({"my_tasks": myNames, "partner_tasks": getNames(n, (2, 3)), "has_deal": "False"})
+    _, proposal, result = manager.evaluate_response(response, n.agent1, n.agent2, None)
+    assert (result == NegotiationFlag.ERROR_FREE) == repairProposals
+    assert n.repairCounts == {"Finn": int(repairProposals), "Jake": 0}
@@ -0,0 +1,91 @@
+from reasoningFilter import ReasoningStreamFilter
+from agent import Agent
+from telemetry import CallRecord
+from langchain_core.messages import AIMessage, HumanMessage
+import asyncio
+import time
+
+def streamThrough(chunks, thinkingBudget=None): # (answer, filter) after feeding chunks one by one
+    reasoningFilter = ReasoningStreamFilter(thinkingBudget)
+    answer = "".join(reasoningFilter.feed(chunk) for chunk in chunks) + reasoningFilter.finish()
+    return answer, reasoningFilter
+
+def test_leading_block_is_reasoning():
+    reasoningFilter = ReasoningStreamFilter()
+    assert reasoningFilter.split("<think>\nWeighing it up.\n</think>\n\nDeal.") == "\n\nDeal."
+    assert reasoningFilter.reasoning == "\nWeighing it up.\n"
+
+def test_blocks_anywhere_are_stripped():
+    reasoningFilter = ReasoningStreamFilter()
+    assert reasoningFilter.split("Hi. <think>one</think>Offer: <think>two</think>json {}") == "Hi. Offer: json {}"
+    assert reasoningFilter.reasoning == "onetwo"
+
+def test_tags_split_across_chunks():
+    answer, reasoningFilter = streamThrough(["Hi <th", "ink>r1</th", "ink> mid <", "think>r2</", "think>", " end <", "b>"])
+    assert answer == "Hi  mid  end <b>"
+    assert reasoningFilter.reasoning == "r1r2"
+
+def test_unterminated_block_falls_back_to_raw_text():
+    text = "Let me see. <think>the proposal is json {\"my_tasks\": []}"
+    reasoningFilter = ReasoningStreamFilter()
+    assert reasoningFilter.split(text) == text
+    assert reasoningFilter.reasoning == "" and reasoningFilter.reasoningChars == 0 and reasoningFilter.reasoningSeconds == 0.0
+    answer, _ = streamThrough(["<think>a</think>ok <thi", "nk>cut"])
+    assert answer == "ok <think>cut" # Closed blocks are still reasoning
+
+def test_text_without_tags_is_unchanged():
+    assert ReasoningStreamFilter().split("No reasoning, just <b>text</b> and <thin") == "No reasoning, just <b>text</b> and <thin"
+
+def test_budget_counts_open_block():
+    reasoningFilter = ReasoningStreamFilter(thinkingBudget=2)
+    reasoningFilter.feed("<think>" + "x" * 8)
+    assert not reasoningFilter.overBudget
+    reasoningFilter.feed("x")
+    assert reasoningFilter.overBudget and reasoningFilter.reasoning == "x" * 9
+
+class ScriptedStream: # Streams the next scripted reply per call and keeps the messages it was sent
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    async def astream(self, messages):
+        self.calls.append(list(messages))
+        reply = self.replies.pop(0)
+        for i in range(0, len(reply), 5):
+            yield reply[i:i + 5]
+
+def streamResponse(agent, model):
+    callRecord = CallRecord(agent.agentName)
+    text, _ = asyncio.run(agent.streamResponseAsync(model, [HumanMessage(content="Your turn")], callRecord, time.perf_counter()))
+    return text, callRecord
+
+def createReasoningAgent(**options):
+    return Agent("Finn", "scripted:think=50", False, "default", **options)
+
+def test_stream_strips_reasoning_anywhere():
+    agent = createReasoningAgent()
+    text, callRecord = streamResponse(agent, ScriptedStream(["Sure. <think>hmm</think>Deal. <think>done</think>"]))
+    assert text == "Sure. Deal. "
+    assert callRecord.reasoningTokens > 0 and not callRecord.thinkingBudgetHit
+
+def test_stream_keeps_unterminated_reasoning():
+    agent = createReasoningAgent()
+    text, callRecord = streamResponse(agent, ScriptedStream(["<think>ran out json {}"]))
+    assert text == "<think>ran out json {}"
+    assert callRecord.reasoningTokens == 0
+
+def test_answer_after_reasoning_continues_from_prefill():
+    agent = createReasoningAgent(thinkingBudget=5, thinkingBudgetAction="truncate")
+    model = ScriptedStream(["<think>" + "step " * 40 + "</think>never reached", "Deal. <think>aside</think>json {}"])
+    text, callRecord = streamResponse(agent, model)
+    assert text == "Deal. json {}"
+    assert callRecord.thinkingBudgetHit and agent.numBudgetStops == 1
+    prefill = model.calls[1][-1]
+    assert isinstance(prefill, AIMessage) and prefill.content.startswith("<think>\nstep step") and prefill.content.endswith("</think>\n\n")
+
+def test_answer_after_reasoning_skip_drops_reasoning():
+    agent = createReasoningAgent(thinkingBudget=5, thinkingBudgetAction="skip")
+    model = ScriptedStream(["<think>" + "step " * 40, "<think>late</think>Deal."])
+    text, _ = streamResponse(agent, model)
+    assert text == "Deal."
+    assert model.calls[1][-1].content == "<think>\n\n</think>\n\n"
@@ -0,0 +1,87 @@
+from responseCache import ResponseCache, ResponseCacheMiss
+from agent import Agent
+import responseCache
+import itertools
+import pytest
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "cache" / "responses.sqlite")
+
+@pytest.fixture
+def clock(monkeypatch): # Strictly increasing time.time(), so lastUsed order is exact
+    ticks = itertools.count(1000.0)
+    monkeypatch.setattr(responseCache.time, "time", lambda: next(ticks))
+
+def createKey(cache, text):
+    return cache.makeKey("ollama", "gemma2", {"temperature": 0.1}, [("user", text)])
+
+def test_keys_depend_on_every_input(path):
+    cache = ResponseCache(path)
+    key = createKey(cache, "Hello")
+    assert key == createKey(cache, "Hello")
+    assert key != createKey(cache, "Hello!")
+    assert key != cache.makeKey("ollama", "gemma2", {"temperature": 0.2}, [("user", "Hello")])
+    assert key != cache.makeKey("openai", "gemma2", {"temperature": 0.1}, [("user", "Hello")])
+
+def test_record_then_replay(path):
+    recorder = ResponseCache(path, mode="record")
+    key = createKey(recorder, "Hello")
+    assert recorder.get(key) is None # Record mode always calls the model
+    recorder.put(key, "first")
+    recorder.put(key, "second") # Replaces the earlier response
+    assert len(recorder) == 1 and recorder.totalSize == len("second")
+    recorder.close()
+
+    replayer = ResponseCache(path, mode="replay")
+    assert replayer.get(key) == "second"
+    assert replayer.get(createKey(replayer, "Unknown")) is None
+    assert (replayer.hits, replayer.misses) == (1, 1)
+
+def test_passthrough_stores_nothing(path):
+    cache = ResponseCache(path, mode="passthrough")
+    key = createKey(cache, "Hello")
+    cache.put(key, "ignored")
+    assert not cache.isEnabled and cache.get(key) is None and len(cache) == 0
+    assert ResponseCache(path, mode="replay").get(key) is None
+
+def test_strict_replay_raises_on_miss(path):
+    cache = ResponseCache(path, mode="replay", strictReplay=True)
+    cache.put(createKey(cache, "Hello"), "cached")
+    assert cache.get(createKey(cache, "Hello")) == "cached"
+    with pytest.raises(ResponseCacheMiss):
+        cache.get(createKey(cache, "Unknown"))
+    assert cache.misses == 1
+
+def test_unknown_mode_is_rejected(path):
+    with pytest.raises(ValueError):
+        ResponseCache(path, mode="write")
+
+def test_least_recently_used_entries_are_evicted(path, clock):
+    cache = ResponseCache(path, mode="replay", maxSizeBytes=30)
+    keys = [createKey(cache, str(i)) for i in range(4)]
+    for key in keys[:3]:
+        cache.put(key, "x" * 10)
+    assert cache.get(keys[0]) == "x" * 10 # Now the most recently used
+    cache.put(keys[3], "y" * 10)
+    assert cache.evictions == 1 and cache.totalSize == 30
+    assert cache.get(keys[1]) is None # Oldest lastUsed
+    assert [cache.get(key) is not None for key in (keys[0], keys[2], keys[3])] == [True, True, True]
+
+def test_size_survives_reopening(path):
+    cache = ResponseCache(path, mode="record")
+    cache.put(createKey(cache, "a"), "héllo") # Sizes are in bytes
+    cache.close()
+    assert ResponseCache(path, mode="replay").totalSize == len("héllo".encode("utf-8"))
+
+def test_agent_replays_without_calling_the_model(path):
+    def generate(cache):
+        agent = Agent("Finn", "scripted", False, "default", responseCache=cache)
+        agent.addToChatHistory('system', agent.systemInstructions)
+        response = agent.generateResponse('user', "Hello, let's split the tasks.")
+        return response, agent.model.numCalls, agent.callRecords[-1].cached
+
+    recorded, recordCalls, _ = generate(ResponseCache(path, mode="record"))
+    replayed, replayCalls, cached = generate(ResponseCache(path, mode="replay"))
+    assert recordCalls == 1 and replayCalls == 0 and cached
+    assert replayed == recorded
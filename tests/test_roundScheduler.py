@@ -0,0 +1,79 @@
+from benchmarkHarness import buildNegotiationKwargs
+from roundScheduler import RoundScheduler
+import asyncio
+
+class TrackingScheduler(RoundScheduler):
+    """
+    Runs rounds on the scripted model, holding each one open for delays[roundIndex] seconds first,
+    and records the finish order and the most rounds that ran at once.
+    """
+    def __init__(self, delays, **options):
+        super().__init__(**options)
+        self.delays = delays
+        self.finished = []
+        self.running = 0
+        self.maxRunning = 0
+
+    async def runRoundAsync(self, roundIndex, negotiationKwargs):
+        self.running += 1
+        self.maxRunning = max(self.maxRunning, self.running)
+        try:
+            await asyncio.sleep(self.delays.get(roundIndex, 0.0))
+            n = await super().runRoundAsync(roundIndex, negotiationKwargs)
+        finally:
+            self.running -= 1
+        self.finished.append(roundIndex)
+        return n
+
+negotiationKwargs = buildNegotiationKwargs(4, 16, "scripted")
+
+def test_rounds_are_emitted_in_order():
+    roundIndices = [1, 2, 3, 4, 5]
+    scheduler = TrackingScheduler({1: 0.4, 2: 0.1, 3: 0.3, 4: 0.0, 5: 0.2}, maxConcurrentRounds=5, backendLimits={})
+    emitted = []
+    negotiations = scheduler.runRounds(roundIndices, negotiationKwargs, onRoundComplete=lambda n: emitted.append((n.roundIndex, list(scheduler.finished))))
+    assert scheduler.finished == [4, 2, 5, 3, 1] # Finished out of order
+    assert [roundIndex for roundIndex, _ in emitted] == roundIndices
+    assert all(set(roundIndices[:position + 1]) <= set(finished) for position, (_, finished) in enumerate(emitted))
+    assert emitted[0][1] == [4, 2, 5, 3, 1] # Round 1 finished last, so everything was emitted then
+    assert [n.roundIndex for n in negotiations] == roundIndices
+
+def test_ordered_emission_follows_given_order():
+    scheduler = TrackingScheduler({3: 0.05}, maxConcurrentRounds=3, backendLimits={})
+    emitted = []
+    scheduler.runRounds([3, 1, 2], negotiationKwargs, onRoundComplete=lambda n: emitted.append(n.roundIndex))
+    assert emitted == [3, 1, 2]
+
+def test_backend_limit_caps_concurrent_rounds():
+    delays = {roundIndex: 0.02 for roundIndex in range(1, 9)}
+    scheduler = TrackingScheduler(delays, maxConcurrentRounds=8, backendLimits={"scripted": 2})
+    scheduler.runRounds(range(1, 9), negotiationKwargs)
+    assert scheduler.maxRunning == 2
+
+def test_round_limit_caps_concurrent_rounds():
+    delays = {roundIndex: 0.02 for roundIndex in range(1, 9)}
+    scheduler = TrackingScheduler(delays, maxConcurrentRounds=3, backendLimits={"scripted": 8})
+    scheduler.runRounds(range(1, 9), negotiationKwargs)
+    assert scheduler.maxRunning == 3
+
+def test_unlimited_backends_are_not_gated():
+    delays = {roundIndex: 0.02 for roundIndex in range(1, 9)}
+    scheduler = TrackingScheduler(delays, maxConcurrentRounds=8, backendLimits={"ollama": 1})
+    scheduler.runRounds(range(1, 9), negotiationKwargs)
+    assert scheduler.maxRunning == 8
+
+def test_prefill_needs_a_free_backend_slot():
+    scheduler = RoundScheduler(backendLimits={"scripted": 1})
+
+    async def run():
+        slot = asyncio.Semaphore(1)
+        scheduler.backendSemaphores = {"scripted": slot}
+        n = scheduler.createNegotiation(1, negotiationKwargs)
+        assert n.backendSemaphores["scripted"] is slot
+        await slot.acquire() # The round itself holds the only slot
+        n.startPrefill(n.agent2, n.agent1)
+        assert n.agent2.agentName not in n.prefillTasks
+        slot.release()
+        n.startPrefill(n.agent2, n.agent1)
+        await n.prefillTasks[n.agent2.agentName]
+    asyncio.run(run())
@@ -0,0 +1,89 @@
+from backendPool import BackendPool
+from scriptedOllamaServer import ScriptedOllamaServer
+from benchmarkHarness import buildNegotiationKwargs
+from negotiation import Negotiation
+from roundScheduler import RoundScheduler
+from agent import Agent
+from types import SimpleNamespace
+import asyncio
+import pytest
+
+@pytest.fixture
+def servers():
+    with ScriptedOllamaServer(seed=1) as server1, ScriptedOllamaServer(seed=2) as server2:
+        yield server1, server2
+
+@pytest.fixture
+def openAIKey(monkeypatch): # OpenAI agents need a key to be built, not to skip prefills
+    monkeypatch.setenv("OPENAI_API_KEY", "unused")
+
+def createAgent(modelName, backendPool=None, usesOpenAI=False): # An agent that has heard its partner's opening message
+    agent = Agent("Finn", modelName, usesOpenAI, "default", backendPool=backendPool, speculativePrefill=True)
+    agent.addToChatHistory('system', agent.systemInstructions)
+    agent.addToChatHistory('user', "Hello, let's split the tasks.")
+    return agent
+
+def test_prefill_caches_the_prompt_for_the_next_turn(servers):
+    server = servers[0]
+    agent = createAgent("gemma2", BackendPool([server.url]))
+    asyncio.run(agent.prefillAsync())
+    assert (agent.numPrefills, server.numRequests, agent.callRecords) == (1, 1, []) # Not a call record
+    prefilledChars = server.numPrefilledChars
+    agent.addToChatHistory('assistant', "Here is a split that plays to our strengths.")
+    agent.generateResponse('user', "That doesn't work for me.")
+    assert server.numCachedChars >= prefilledChars # The whole prefilled history was a cache hit
+    assert agent.backendPool.endpoints[0].inFlight == 0
+
+def test_prefill_sticks_to_the_next_turn_endpoint(servers):
+    pool = BackendPool([server.url for server in servers], strategy="round_robin")
+    agent = createAgent("gemma2", pool)
+    asyncio.run(agent.prefillAsync())
+    prefillUrl = agent.lastEndpointUrl
+    agent.generateResponse('user', "Any thoughts?")
+    assert agent.lastEndpointUrl == prefillUrl
+    assert [server.numRequests for server in servers if server.url == prefillUrl] == [2]
+
+def test_failed_prefill_is_ignored(servers):
+    server = servers[0]
+    server.available = False
+    pool = BackendPool([server.url])
+    agent = createAgent("gemma2", pool)
+    asyncio.run(agent.prefillAsync())
+    assert agent.numPrefills == 0 and server.numFailures == 1
+    assert pool.endpoints[0].inFlight == 0
+
+@pytest.mark.parametrize("modelName,usesOpenAI", [("scripted", False), ("gpt-4o", True)])
+def test_only_ollama_agents_prefill(modelName, usesOpenAI, openAIKey):
+    if usesOpenAI:
+        pytest.importorskip("openai")
+    agent = createAgent(modelName, usesOpenAI=usesOpenAI)
+    asyncio.run(agent.prefillAsync())
+    assert agent.numPrefills == 0 and agent.prefillSeconds == 0.0
+
+def getNegotiationKwargs(agent1Model, agent2Model, backendPool=None):
+    return dict(buildNegotiationKwargs(4, 16, agent1Model, {"backendPool": backendPool, "speculativePrefill": True}), agent2Model=agent2Model)
+
+def test_shares_host_with_partner():
+    assert not Negotiation.sharesHostWithPartner(None, createAgent("gemma2"), createAgent("gemma2")) # Same model stays loaded
+    assert Negotiation.sharesHostWithPartner(None, createAgent("gemma2"), createAgent("llama3")) # One local server
+    assert not Negotiation.sharesHostWithPartner(None, createAgent("gemma2"), SimpleNamespace(modelName="gpt-4o", usesOpenAI=True))
+    pool = BackendPool(["http://a:11434", "http://b:11434"])
+    pool.setModelAffinity({"gemma2": ["http://a:11434"], "llama3": ["http://b:11434"]})
+    assert not Negotiation.sharesHostWithPartner(None, createAgent("gemma2", pool), createAgent("llama3", pool))
+    pool.setModelAffinity({"gemma2": ["http://a:11434"], "llama3": ["http://a:11434", "http://b:11434"]})
+    assert Negotiation.sharesHostWithPartner(None, createAgent("gemma2", pool), createAgent("llama3", pool))
+
+def test_prefill_is_not_started_next_to_the_partner_model():
+    scheduler = RoundScheduler(backendLimits={})
+    async def run():
+        n = scheduler.createNegotiation(1, getNegotiationKwargs("gemma2", "llama3"))
+        n.startPrefill(n.agent1, n.agent2)
+        return n
+    assert asyncio.run(run()).prefillTasks == {}
+
+def test_rounds_prefill_between_turns(servers):
+    pool = BackendPool([server.url for server in servers], strategy="least_loaded")
+    n, = RoundScheduler(backendLimits={}).runRounds([1], getNegotiationKwargs("gemma2", "gemma2", pool))
+    assert not n.DNF
+    assert n.agent1.numPrefills + n.agent2.numPrefills >= n.numIterations - 2
+    assert all(endpoint.inFlight == 0 for endpoint in pool.endpoints)
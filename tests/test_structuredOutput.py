@@ -0,0 +1,52 @@
+from benchmarkHarness import buildNegotiationKwargs
+from roundScheduler import RoundScheduler
+from negotiation import Negotiation
+from negotiationFlag import NegotiationFlag
+from agent import Agent
+import json
+import pytest
+
+@pytest.fixture
+def negotiation():
+    n = Negotiation(1, 4, 8, "scripted", False, "default", "scripted", False, "default", "Finn", "Jake", False, agentOptions={"structuredOutput": True})
+    n.setUpStructuredOutput()
+    return n
+
+def test_schema_only_allows_the_round_tasks(negotiation):
+    schema = negotiation.buildProposalSchema()
+    assert schema["properties"]["my_tasks"]["items"]["enum"] == [task.mappedName for task in negotiation.tasks]
+    assert set(schema["required"]) == {"message", "my_tasks", "partner_tasks", "has_deal"}
+    assert negotiation.agent1.responseSchema == schema and negotiation.agent1.outputMode == "structured"
+    assert "captured as a JSON object" in negotiation.agent2.systemInstructions
+
+def test_scripted_model_answers_with_schema_json(negotiation):
+    agent = negotiation.agent1
+    agent.addToChatHistory('system', agent.systemInstructions)
+    response = agent.generateResponse('user', "Hello, let's split the tasks.")
+    payload = agent.lastStructuredResponse
+    assert payload is not None and set(payload) == {"message", "my_tasks", "partner_tasks", "has_deal"}
+    assert response.startswith(payload["message"]) and "\njson\n" in response # Rendered for the partner as usual
+    assert negotiation.extractProposalFromReponse(response, agent).equals(negotiation.extractProposalFromDict(payload, agent))
+
+def test_render_leaves_non_json_to_the_free_text_parser():
+    agent = Agent("Finn", "scripted", False, "default")
+    assert agent.renderStructuredResponse("Not JSON at all") == ("Not JSON at all", None)
+    text, payload = agent.renderStructuredResponse(json.dumps({"message": "Deal.", "my_tasks": ["A"], "partner_tasks": ["B"], "has_deal": "True"}))
+    assert payload["has_deal"] == "True"
+    assert text.startswith("Deal.\n\njson\n") and json.loads(text.split("json\n", 1)[1])["my_tasks"] == ["A"]
+
+def test_payload_sides_follow_the_speaker(negotiation):
+    names = [task.mappedName for task in negotiation.tasks]
+    payload = {"message": "", "my_tasks": names[:1], "partner_tasks": names[1:], "has_deal": True}
+    fromAgent1 = negotiation.extractProposalFromDict(payload, negotiation.agent1)
+    fromAgent2 = negotiation.extractProposalFromDict(payload, negotiation.agent2)
+    assert fromAgent1.agent1Tasks == negotiation.tasks[:1] and fromAgent1.hasDeal
+    assert fromAgent2.agent2Tasks == negotiation.tasks[:1] and fromAgent2.agent1Tasks == negotiation.tasks[1:]
+    assert negotiation.extractProposalFromDict({"my_tasks": names}, negotiation.agent1) == NegotiationFlag.INVALID_AGENT_NAME
+
+def test_structured_rounds_finish_and_count_retries():
+    negotiationKwargs = buildNegotiationKwargs(4, 16, "scripted:malformed=0.2", agentOptions={"structuredOutput": True})
+    negotiations = RoundScheduler(backendLimits={}).runRounds(range(1, 4), negotiationKwargs)
+    assert not any(n.DNF for n in negotiations)
+    assert all(n.agent1.outputMode == n.agent2.outputMode == "structured" for n in negotiations)
+    assert sum(sum(n.retryCounts.values()) for n in negotiations) > 0 # Unknown task names still fail validation
@@ -0,0 +1,57 @@
+from sweepPlanner import SweepPlanner
+import pytest
+
+hosts = {"http://a:11434": 16.0, "http://b:11434": 16.0}
+sizes = {"small": 4.0, "medium": 6.0, "large": 12.0}
+
+@pytest.fixture
+def planner():
+    return SweepPlanner(hosts, modelSizesGB=sizes)
+
+class FakeClient: # Records warm-up calls instead of reaching an Ollama host
+    def __init__(self, host, calls):
+        self.host = host
+        self.calls = calls
+
+    def generate(self, model, keep_alive):
+        self.calls.append((self.host, model, keep_alive))
+
+def getExperiments(sweepPlan):
+    return [experiment for batch in sweepPlan.batches for experiment in batch.experiments]
+
+def test_plan_groups_experiments_sharing_models(planner):
+    experiments = [("small", "small", 4), ("large", "large", 4), ("small", "medium", 4), ("large", "small", 4)]
+    sweepPlan = planner.plan(experiments, numRounds=10)
+    assert sorted(getExperiments(sweepPlan)) == sorted(experiments)
+    assert sweepPlan.plannedLoads <= sweepPlan.naiveLoads
+    assert sweepPlan.swapsAvoided == sweepPlan.naiveLoads - sweepPlan.plannedLoads
+    for batch in sweepPlan.batches:
+        for host, model in batch.loads:
+            assert host in batch.modelEndpoints[model]
+
+def test_pair_that_does_not_fit_is_split_across_hosts(planner):
+    sweepPlan = planner.plan([("large", "medium", 4)], numRounds=10)
+    endpoints = sweepPlan.batches[0].modelEndpoints
+    assert set(endpoints["large"]).isdisjoint(endpoints["medium"])
+    assert sweepPlan.plannedLoads == 2 # No per-turn swapping once split
+
+def test_naive_order_counts_thrashing():
+    planner = SweepPlanner({"http://a:11434": 16.0}, modelSizesGB=sizes, expectedTurnsPerRound=8)
+    loads, _ = planner.simulateNaive([("large", "medium", 4)], numRounds=10)
+    assert loads == 10 * 8 + 2
+
+def test_scripted_and_openai_experiments_skip_warm_up(planner, monkeypatch):
+    monkeypatch.setattr(planner, "getClient", lambda host: pytest.fail(f"contacted {host}"))
+    scriptedPlan = planner.plan([("scripted", "scripted:accept=0.5", 4)], numRounds=10)
+    openAIPlan = planner.plan([("gpt-4o", "gpt-4o-mini", 4)], numRounds=10, usesOpenAI=(True, True))
+    assert list(planner.iterateExperiments(scriptedPlan)) == [("scripted", "scripted:accept=0.5", 4)]
+    assert list(planner.iterateExperiments(openAIPlan)) == [("gpt-4o", "gpt-4o-mini", 4)]
+    assert scriptedPlan.plannedLoads == openAIPlan.plannedLoads == 0
+
+def test_ollama_batches_are_warmed_up(planner, monkeypatch):
+    calls = []
+    monkeypatch.setattr(planner, "getClient", lambda host: FakeClient(host, calls))
+    sweepPlan = planner.plan([("small", "scripted", 4)], numRounds=10)
+    assert list(planner.iterateExperiments(sweepPlan)) == [("small", "scripted", 4)]
+    assert sorted(calls) == sorted((host, "small", planner.keepAlive) for host in hosts) # Replicated onto both hosts
+    assert set(planner.measuredLoadSeconds) == {"small"}
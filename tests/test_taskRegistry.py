@@ -0,0 +1,60 @@
+from task import Task, TaskRegistry
+from proposal import Proposal
+from negotiation import Negotiation
+from negotiationFlag import NegotiationFlag
+import pytest
+
+@pytest.fixture
+def tasks():
+    return [Task("Task A", 0.5, 0.7), Task("Task B", 0.6, 0.2), Task("Task C", 0.1, 0.9), Task("Task D", 0.8, 0.4)]
+
+def test_masks_follow_interned_ids(tasks):
+    registry = TaskRegistry(tasks)
+    assert [task.taskId for task in tasks] == [0, 1, 2, 3]
+    assert registry.getMask([tasks[0], tasks[2]]) == 0b0101
+    assert registry.getTasks(0b1010) == [tasks[1], tasks[3]]
+    assert registry.fullMask == 0b1111 and len(registry) == 4
+
+def test_equal_tasks_share_an_id(tasks):
+    registry = TaskRegistry(tasks)
+    copy = Task("Task C", 0.1, 0.9) # Equal, but not the interned object
+    assert registry.intern(copy) is tasks[2]
+    assert registry.getMask([copy]) == 0b0100
+
+def test_unknown_or_repeated_tasks_have_no_mask(tasks):
+    registry = TaskRegistry(tasks)
+    assert registry.getMask([Task("Task E", 0.5, 0.5)]) is None
+    assert registry.getMask([tasks[0], tasks[0]]) is None
+    assert registry.getMask([tasks[0], tasks[0]], allowRepeats=True) == 0b0001
+
+def test_lookup_by_mapped_or_raw_name(tasks):
+    registry = TaskRegistry(tasks)
+    assert registry.getTaskByName("task a") is tasks[0]
+    assert registry.getTaskByName(tasks[1].mappedName.lower()) is tasks[1]
+    assert registry.getTaskByName("Task Z") is None
+
+def test_mask_validation_matches_set_validation(tasks):
+    registry = TaskRegistry(tasks)
+    proposals = [
+        ([tasks[0], tasks[1]], [tasks[2], tasks[3]], NegotiationFlag.ERROR_FREE),
+        ([tasks[0], tasks[1]], [tasks[1], tasks[3]], NegotiationFlag.INVALID_TASKS_PRESENT),
+        ([tasks[0]], [tasks[2], tasks[3]], NegotiationFlag.NOT_ENOUGH_TASKS),
+        ([tasks[0], tasks[1], tasks[2]], [tasks[2], tasks[3]], NegotiationFlag.TOO_MANY_TASKS),
+    ]
+    for agent1Tasks, agent2Tasks, flag in proposals:
+        assert Proposal(agent1Tasks, agent2Tasks, registry=registry).validateProposal(registry.tasks) == flag
+        assert Proposal(agent1Tasks, agent2Tasks).validateProposal(tasks) == flag
+
+def test_negotiation_tasks_are_the_registry_tasks():
+    n = Negotiation(1, 4, 8, "scripted", False, "default", "scripted", False, "default", "Finn", "Jake", False)
+    assert n.tasks is n.taskRegistry.tasks # So validateProposal takes the mask path
+    proposal = Proposal(n.tasks[:2], n.tasks[2:], registry=n.taskRegistry)
+    assert proposal.hasMasks() and proposal.validateProposal(n.tasks) == NegotiationFlag.ERROR_FREE
+
+def test_proposals_resolve_mapped_names_only():
+    n = Negotiation(1, 4, 8, "scripted", False, "default", "scripted", False, "default", "Finn", "Jake", False)
+    task = n.tasks[0]
+    assert n.convertTaskNameToTask(task.mappedName.lower()) is task
+    unknown = n.convertTaskNameToTask(task.name) # Raw names are not what the agents are shown
+    assert unknown is not task and (unknown.pref1, unknown.pref2) == (0.0, 0.0)
+    assert n.taskRegistry.getTaskByName(task.name) is task # Proposal repair still resolves them
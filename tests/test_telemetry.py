@@ -0,0 +1,58 @@
+from benchmarkHarness import buildNegotiationKwargs
+from roundScheduler import RoundScheduler
+from telemetry import CallRecord, TurnTelemetryWriter, getRoundTelemetry, mean
+from main import buildSummary
+import json
+import pytest
+
+@pytest.fixture
+def telemetryRun(tmp_path, monkeypatch): # (negotiations, turn dicts read back from the JSONL stream)
+    writer = TurnTelemetryWriter(str(tmp_path / "turns.jsonl"))
+    negotiationKwargs = dict(buildNegotiationKwargs(4, 16, "scripted:latency=0.002,malformed=0.2"), turnTelemetry=writer)
+    negotiations = RoundScheduler(backendLimits={}).runRounds(range(1, 5), negotiationKwargs)
+    writer.close()
+    with open(tmp_path / "turns.jsonl") as file:
+        turns = [json.loads(line) for line in file]
+    return negotiations, turns
+
+def test_turn_stream_round_trip(telemetryRun):
+    negotiations, turns = telemetryRun
+    records = [turn.toDict() for n in negotiations for turn in n.turnRecords]
+    assert sorted(turns, key=lambda turn: (turn["roundIndex"], turn["iteration"])) == json.loads(json.dumps(records))
+    assert any(turn["retries"] for turn in turns) and all(len(turn["calls"]) == turn["retries"] + 1 for turn in turns if turn["succeeded"])
+
+def test_round_telemetry_matches_stream(telemetryRun):
+    negotiations, turns = telemetryRun
+    for n in negotiations:
+        roundCalls = [call for turn in turns if turn["roundIndex"] == n.roundIndex for call in turn["calls"]]
+        telemetry = getRoundTelemetry(n)
+        assert telemetry["ModelCalls"] == len(roundCalls)
+        for agentNumber, agent in ((1, n.agent1), (2, n.agent2)):
+            agentCalls = [call for call in roundCalls if call["agentName"] == agent.agentName]
+            assert telemetry[f"Agent{agentNumber}PromptTokens"] == sum(call["promptTokens"] for call in agentCalls)
+            assert telemetry[f"Agent{agentNumber}CompletionTokens"] == sum(call["completionTokens"] for call in agentCalls)
+        assert telemetry["MeanLatency"] == pytest.approx(mean([call["latency"] for call in roundCalls if not call["cached"]]))
+        assert telemetry["NegotiationSeconds"] == pytest.approx(n.phaseTimes["setup"] + n.phaseTimes["turnLoop"])
+
+def test_summary_totals_match_stream(telemetryRun):
+    negotiations, turns = telemetryRun
+    summary = buildSummary(negotiations)
+    assert summary["TotalPromptTokens"] == sum(call["promptTokens"] for turn in turns for call in turn["calls"])
+    assert summary["TotalCompletionTokens"] == sum(call["completionTokens"] for turn in turns for call in turn["calls"])
+    assert summary["TotalRetries"] == sum(turn["retries"] for turn in turns)
+
+def test_usage_metadata_and_estimates():
+    class Message:
+        usage_metadata = {"input_tokens": 120, "output_tokens": 30}
+        response_metadata = {"eval_duration": 2e9}
+    callRecord = CallRecord("Finn")
+    callRecord.setUsage(Message(), 999, "ignored")
+    assert (callRecord.promptTokens, callRecord.completionTokens, callRecord.estimated) == (120, 30, False)
+    assert callRecord.tokensPerSecond == 15.0
+    estimated = CallRecord("Finn")
+    estimated.latency = 2.0
+    estimated.setUsage(None, 50, "x" * 40)
+    assert (estimated.promptTokens, estimated.completionTokens, estimated.estimated) == (50, 10, True)
+    assert estimated.tokensPerSecond == 5.0
+    estimated.cached = True
+    assert estimated.tokensPerSecond is None
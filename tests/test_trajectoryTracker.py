@@ -0,0 +1,50 @@
+from task import Task, TaskRegistry
+from proposal import Proposal
+from trajectoryTracker import StallPolicy, TrajectoryTracker
+import pytest
+
+tasks = [Task("Task A", 0.5, 0.7), Task("Task B", 0.6, 0.2), Task("Task C", 0.1, 0.9), Task("Task D", 0.8, 0.4)]
+registry = TaskRegistry(tasks)
+
+def split(agent1Indices): # Proposal giving agent 1 the tasks at agent1Indices and agent 2 the rest
+    return Proposal([tasks[i] for i in agent1Indices], [task for i, task in enumerate(tasks) if i not in agent1Indices], registry=registry)
+
+X, Y, Z, W = split((0, 1)), split((2, 3)), split((0, 2)), split((1, 3))
+
+def detections(proposals, **policyOptions): # (turn, detection, action) for every flagged turn
+    tracker = TrajectoryTracker(StallPolicy(**policyOptions))
+    flagged = []
+    for turn, proposal in enumerate(proposals, 1):
+        stall = tracker.record(proposal, turn)
+        if stall is not None:
+            flagged.append((turn, *stall))
+    return flagged
+
+def test_holding_own_offers_is_not_a_cycle():
+    assert detections([X, Y] * 6, stallWindow=100) == []
+
+def test_repeated_allocation():
+    assert detections([X, Y, Z, Z, Z], stallWindow=100)[0] == (5, "repeat", "nudge")
+
+def test_three_offer_cycle():
+    assert detections([X, Y, Z] * 2, stallWindow=100) == [(6, "cycle", "nudge")]
+
+def test_flip_flopping_offers_are_a_period_four_cycle():
+    assert detections([X, Y, Z, W] * 2, stallWindow=100) == [(8, "cycle", "nudge")]
+
+def test_stall_when_utilities_stop_moving():
+    reordered = Proposal([tasks[1], tasks[0]], [tasks[3], tasks[2]], registry=registry) # Same split as X
+    assert detections([Y, X, reordered, X, reordered], repeatLimit=10, stallWindow=4) == [(5, "stall", "nudge")]
+
+def test_escalation_order_and_cooldown():
+    flagged = detections([Z] * 12, repeatLimit=3, cooldown=2, stallWindow=100)
+    assert [(turn, action) for turn, _, action in flagged] == [(3, "nudge"), (6, "final_offer"), (9, "dnf"), (12, "dnf")]
+
+def test_pending_deal_is_not_flagged():
+    tracker = TrajectoryTracker(StallPolicy(repeatLimit=2))
+    assert tracker.record(X, 1) is None
+    assert tracker.record(X, 2, dealPending=True) is None
+
+def test_unknown_action_is_rejected():
+    with pytest.raises(ValueError):
+        StallPolicy(actions=("nudge", "shout"))
@@ -0,0 +1,73 @@
+from benchmarkHarness import buildNegotiationKwargs
+from roundScheduler import RoundScheduler
+from negotiationCheckpoint import ResumePolicy
+from typedLog import TypedLogWriter, loadTypedLog, buildRounds, convertCsvLog, typedColumns
+from logger import ExperimentLogger, logColumns
+from scoring import scoringEngine
+from main import buildDataTuple
+import datetime
+import pytest
+
+@pytest.fixture(scope="module")
+def negotiations(): # Three finished scripted rounds and one given up as a DNF
+    finished = RoundScheduler(backendLimits={}).runRounds(range(1, 4), buildNegotiationKwargs(5, 16, "scripted"))
+    givenUp = RoundScheduler(backendLimits={}, resumePolicy=ResumePolicy(maxRestarts=0)).runRounds([4], buildNegotiationKwargs(5, 2, "scripted:accept=0"))
+    assert not any(n.DNF for n in finished) and givenUp[0].DNF
+    return finished + givenUp
+
+@pytest.fixture
+def logsDirectory(tmp_path, monkeypatch): # Logs/ is relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / "Logs"
+
+def getTaskKeys(tasks): # Allocations come back in round task order, so compare them sorted
+    return sorted((task.mappedName, task.pref1, task.pref2) for task in tasks)
+
+def writeTypedLog(negotiations, filename="rounds.jsonl"):
+    writer = TypedLogWriter(filename, {"NumTasks": 5, "Agent1Model": "scripted"})
+    for n in negotiations:
+        writer.logTuple(buildDataTuple(n))
+    writer.log("TotalNegotiationTime", datetime.timedelta(seconds=42))
+    return writer.logFilepath
+
+def test_typed_log_round_trip(negotiations, logsDirectory):
+    metadata, columns = loadTypedLog(writeTypedLog(negotiations))
+    assert metadata == {"NumTasks": 5, "Agent1Model": "scripted", "TotalNegotiationTime": 42.0}
+    assert list(columns) == typedColumns
+    assert columns["ItemIds"].shape == (4, 5) and columns["Agent1Mask"].dtype.kind == "i"
+
+    rounds = buildRounds(columns)
+    assert [roundData['roundNumber'] for roundData in rounds] == [1, 2, 3] # The DNF row has no allocation to score
+    for roundData, n in zip(rounds, negotiations):
+        assert getTaskKeys(roundData['tasks']) == getTaskKeys(n.tasks)
+        assert getTaskKeys(roundData['agent1Tasks']) == getTaskKeys(n.winningProposal.agent1Tasks)
+        assert getTaskKeys(roundData['agent2Tasks']) == getTaskKeys(n.winningProposal.agent2Tasks)
+        assert roundData['agent1Utility'] == n.winningProposal.agent1Utility
+        assert roundData['numIterations'] == n.numIterations
+        assert roundData['negotiationTime'] == n.negotiationTime
+        assert roundData['initialProposal'] is None
+
+def test_typed_log_keeps_every_extra_column(negotiations, logsDirectory):
+    _, columns = loadTypedLog(writeTypedLog(negotiations))
+    for i, n in enumerate(negotiations):
+        row = dict(zip(logColumns, buildDataTuple(n)))
+        assert [columns[name][i] for name in logColumns[9:]] == [row[name] for name in logColumns[9:]]
+    assert list(columns["DNF"]) == [False, False, False, True]
+    assert columns["DNFReason"][3] == "max_iterations"
+
+def test_csv_conversion_matches_csv_scoring(negotiations, logsDirectory):
+    with ExperimentLogger("rounds.csv") as experimentLogger:
+        experimentLogger.log("NumTasks", 5)
+        for n in negotiations:
+            experimentLogger.logTuple(buildDataTuple(n))
+    typedFilename = convertCsvLog("rounds.csv")
+    csvEngine, typedEngine = scoringEngine("rounds.csv"), scoringEngine(typedFilename)
+    csvEngine.parseLog()
+    typedEngine.parseLog()
+    assert len(typedEngine.rounds) == len(csvEngine.rounds) == 3 and csvEngine.numDNF == 1
+    for typedRound, csvRound in zip(typedEngine.rounds, csvEngine.rounds):
+        for key in ('roundNumber', 'negotiationTime', 'agent1Utility', 'agent2Utility', 'numIterations', 'agent1ModelName', 'agent2Type'):
+            assert typedRound[key] == csvRound[key]
+        for key in ('tasks', 'agent1Tasks', 'agent2Tasks'):
+            assert getTaskKeys(typedRound[key]) == getTaskKeys(csvRound[key])
+    assert [extras["Agent1Retries"] for extras in typedEngine.extraColumns] == [int(extras["Agent1Retries"]) for extras in csvEngine.extraColumns]
@@ -0,0 +1,83 @@
+class StallPolicy:
+    """
+    When a negotiation counts as stuck and what to do about it.
+    Detected after a valid turn, while no deal is on the table:
+        repeat - the same allocation was proposed repeatLimit times in a row (by either agent)
+        cycle  - the last cycleRepeats * period proposals repeat with a period of 3 to maxPeriod (e.g. A, B, C, A, B, C, or
+                 each agent flip-flopping between two offers with period 4). Period 2 is each agent holding its own
+                 offer, which is ordinary bargaining, so it is never flagged as a cycle
+        stall  - over the last stallWindow proposals, neither agent's utility moved by more than minUtilityChange
+    Each detection takes the next action in actions, repeating the last one once they run out:
+        nudge       - a mediator message asks the next agent to concede or accept
+        final_offer - the next agent must accept the partner's proposal or make a final offer
+        dnf         - end the negotiation now as a DNF with reason "stalled"
+    After an action, detection pauses for cooldown turns so the agents can react.
+    """
+    ACTIONS = ("nudge", "final_offer", "dnf")
+
+    def __init__(self, actions=("nudge", "final_offer", "dnf"), repeatLimit=3, cycleRepeats=2, maxPeriod=4, stallWindow=8, minUtilityChange=0.05, cooldown=2):
+        unknownActions = set(actions) - set(self.ACTIONS)
+        if not actions or unknownActions:
+            raise ValueError(f"Unknown stall actions: {', '.join(sorted(unknownActions)) or 'none given'}")
+        self.actions = tuple(actions)
+        self.repeatLimit = repeatLimit
+        self.cycleRepeats = cycleRepeats
+        self.maxPeriod = maxPeriod
+        self.stallWindow = stallWindow
+        self.minUtilityChange = minUtilityChange
+        self.cooldown = cooldown
+
+class TrajectoryTracker:
+    """
+    Follows the allocations proposed over a negotiation and reports when it is going nowhere (see StallPolicy).
+    """
+    def __init__(self, policy):
+        self.policy = policy
+        self.allocations = [] # Hashable allocation per valid turn
+        self.utilities = [] # (agent1Utility, agent2Utility) per valid turn
+        self.interventions = [] # (iteration, detection, action)
+        self.turnsUntilDetection = 0
+
+    def getAllocation(self, proposal): # Allocation key, ignoring hasDeal
+        if proposal.hasMasks():
+            return (proposal.agent1Mask, proposal.agent2Mask)
+        return (frozenset(task.name for task in proposal.agent1Tasks), frozenset(task.name for task in proposal.agent2Tasks))
+
+    def hasPeriod(self, allocations, period):
+        return all(allocations[i] == allocations[i % period] for i in range(len(allocations)))
+
+    def detect(self):
+        policy = self.policy
+        allocations = self.allocations
+        if len(allocations) >= policy.repeatLimit and len(set(allocations[-policy.repeatLimit:])) == 1:
+            return "repeat"
+        for period in range(3, policy.maxPeriod + 1):
+            span = period * policy.cycleRepeats
+            recent = allocations[-span:]
+            if len(recent) == span and self.hasPeriod(recent, period) and not self.hasPeriod(recent, 2): # Holding offers also repeats every 4
+                return "cycle"
+        if len(self.utilities) >= policy.stallWindow:
+            window = self.utilities[-policy.stallWindow:]
+            if all(max(values) - min(values) <= policy.minUtilityChange for values in zip(*window)):
+                return "stall"
+        return None
+
+    def record(self, proposal, iteration, dealPending=False):
+        """
+        Record a valid turn's proposal. Returns (detection, action) if the negotiation just got stuck, otherwise None.
+        dealPending turns (a has_deal proposal waiting to be matched) are recorded but never flagged.
+        """
+        self.allocations.append(self.getAllocation(proposal))
+        self.utilities.append((proposal.agent1Utility, proposal.agent2Utility))
+        if self.turnsUntilDetection > 0:
+            self.turnsUntilDetection -= 1
+            return None
+        if dealPending:
+            return None
+        detection = self.detect()
+        if detection is None:
+            return None
+        action = self.policy.actions[min(len(self.interventions), len(self.policy.actions) - 1)]
+        self.interventions.append((iteration, detection, action))
+        self.turnsUntilDetection = self.policy.cooldown
+        return detection, action
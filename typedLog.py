@@ -0,0 +1,193 @@
+"""
+Typed JSONL experiment log, an alternative to the CSV written by logger.py.
+The first line is a metadata header that names the columns. Every round is then one JSON array with
+numbers instead of Task strings: task ids (0 = "Task A"), preferences, and bitmasks over the round's task list.
+Label/value pairs such as TotalNegotiationTime are {"label": ..., "value": ...} lines and are merged into
+the metadata on load.
+"""
+from logger import logColumns
+from task import Task, getTaskName, getTaskIndex
+from proposal import Proposal
+from colorama import Fore
+import numpy as np
+import datetime
+import json
+import os
+import sys
+
+typedLogFormat = "negotiation-typed-log"
+typedLogVersion = 1
+# Round columns: the CSV columns with task lists replaced by numeric columns
+typedColumns = ["RoundNumber", "NegotiationTime", "Agent1Utility", "Agent2Utility", "NumIterations",
+                "ItemIds", "ItemPref1", "ItemPref2", "Agent1Mask", "Agent2Mask", "InitialAgent1Mask", "InitialAgent2Mask"] + logColumns[9:]
+
+def getMask(tasks, roundTasks): # Bitmask of tasks over their positions in roundTasks
+    positions = {task: position for position, task in enumerate(roundTasks)}
+    mask = 0
+    for task in tasks:
+        mask |= 1 << positions[task]
+    return mask
+
+def getMaskTasks(mask, roundTasks):
+    return [task for position, task in enumerate(roundTasks) if mask >> position & 1]
+
+def encodeDataTuple(dataTuple):
+    """
+    Convert a row in the logger's dataTuple layout (see main.buildDataTuple) into a typed row in typedColumns order.
+    """
+    row = dict(zip(logColumns, dataTuple))
+    roundTasks = list(row["Items"])
+    taskIds = [getTaskIndex(task.name) for task in roundTasks]
+    if None in taskIds:
+        raise ValueError(f"Task names must be generated names such as 'Task A' or their mapped names: {roundTasks}")
+    negotiationTime = row["NegotiationTime"]
+    initialProposal = row["InitialProposal"]
+    typedRow = [
+        row["RoundNumber"],
+        negotiationTime.total_seconds() if isinstance(negotiationTime, datetime.timedelta) else float(negotiationTime),
+        row["Agent1Utility"],
+        row["Agent2Utility"],
+        row["NumIterations"],
+        taskIds,
+        [task.pref1 for task in roundTasks],
+        [task.pref2 for task in roundTasks],
+        getMask(row["Agent1Items"], roundTasks),
+        getMask(row["Agent2Items"], roundTasks),
+        getMask(initialProposal[0], roundTasks) if initialProposal is not None else -1,
+        getMask(initialProposal[1], roundTasks) if initialProposal is not None else -1,
+    ]
+    typedRow += [row.get(column) for column in logColumns[9:]]
+    return typedRow
+
+class TypedLogWriter:
+    """
+    Appends rounds to a typed JSONL log in Logs, writing the metadata header when the file is new.
+    """
+    def __init__(self, logFilename, metadata=None):
+        logsFolder = "Logs"
+        os.makedirs(logsFolder, exist_ok=True)
+        self.logFilepath = os.path.join(logsFolder, logFilename)
+        if not os.path.exists(self.logFilepath):
+            header = {"format": typedLogFormat, "version": typedLogVersion, "columns": typedColumns, "metadata": metadata or {}}
+            self.writeLine(header)
+
+    def writeLine(self, record):
+        with open(self.logFilepath, mode='a') as file:
+            file.write(json.dumps(record, default=str) + "\n")
+
+    def logTuple(self, dataTuple):
+        self.writeLine(encodeDataTuple(dataTuple))
+
+    def log(self, label, value):
+        self.writeLine({"label": label, "value": value.total_seconds() if isinstance(value, datetime.timedelta) else value})
+
+def loadTypedLog(logFilepath):
+    """
+    Load a typed log and return (metadata, columns), where columns maps each name in typedColumns to an array.
+    Task columns (ItemIds, ItemPref1, ItemPref2) are 2D (rounds x tasks) when every round has the same number of tasks,
+    otherwise object arrays of per-round lists. Masks are int64 unless a round has more than 62 tasks.
+    """
+    with open(logFilepath) as file:
+        header = json.loads(file.readline())
+        if header.get("format") != typedLogFormat:
+            raise ValueError(f"Not a typed negotiation log: {logFilepath}")
+        columnNames = header["columns"]
+        metadata = dict(header.get("metadata", {}))
+        rows = []
+        for line in file:
+            record = json.loads(line)
+            if isinstance(record, dict):
+                metadata[record["label"]] = record["value"]
+            else:
+                rows.append(record)
+
+    values = list(zip(*rows)) if rows else [[] for _ in columnNames]
+    columns = {}
+    for columnName, columnValues in zip(columnNames, values):
+        try:
+            array = np.array(columnValues)
+        except ValueError: # Ragged task lists
+            array = None
+        if array is None or array.dtype == object or (array.dtype.kind in "iu" and array.dtype.itemsize > 8):
+            array = np.empty(len(columnValues), dtype=object)
+            array[:] = list(columnValues)
+        columns[columnName] = array
+    return metadata, columns
+
+def getScoredRounds(columns): # Row indices of rounds with an allocation, skipping DNF rows (logs without the column have none)
+    dnf = columns.get("DNF")
+    return [i for i in range(len(columns["RoundNumber"])) if dnf is None or not dnf[i]]
+
+def buildRounds(columns):
+    """
+    Rebuild the per-round dictionaries of scoringEngine.parseLog from loaded columns.
+    """
+    rounds = []
+    for i in getScoredRounds(columns):
+        roundTasks = [Task(getTaskName(int(taskId)), float(pref1), float(pref2)) for taskId, pref1, pref2 in zip(columns["ItemIds"][i], columns["ItemPref1"][i], columns["ItemPref2"][i])]
+        agent1Tasks = getMaskTasks(int(columns["Agent1Mask"][i]), roundTasks)
+        agent2Tasks = getMaskTasks(int(columns["Agent2Mask"][i]), roundTasks)
+        initialProposal = None
+        if int(columns["InitialAgent1Mask"][i]) >= 0:
+            initialProposal = Proposal(getMaskTasks(int(columns["InitialAgent1Mask"][i]), roundTasks), getMaskTasks(int(columns["InitialAgent2Mask"][i]), roundTasks))
+        rounds.append({
+            'roundNumber': int(columns["RoundNumber"][i]),
+            'negotiationTime': datetime.timedelta(seconds=float(columns["NegotiationTime"][i])),
+            'agent1Utility': float(columns["Agent1Utility"][i]),
+            'agent2Utility': float(columns["Agent2Utility"][i]),
+            'numIterations': int(columns["NumIterations"][i]),
+            'agent1Tasks': agent1Tasks,
+            'agent2Tasks': agent2Tasks,
+            'tasks': roundTasks,
+            'initialProposal': initialProposal,
+            'agent1UsesOpenAI': bool(columns["Agent1UsesOpenAI"][i]),
+            'agent2UsesOpenAI': bool(columns["Agent2UsesOpenAI"][i]),
+            'agent1ModelName': str(columns["Agent1Model"][i]),
+            'agent2ModelName': str(columns["Agent2Model"][i]),
+            'agent1Type': str(columns["Agent1Type"][i]),
+            'agent2Type': str(columns["Agent2Type"][i]),
+            'winningProposal': Proposal(agent1Tasks, agent2Tasks, True),
+        })
+    return rounds
+
+def parseCsvValue(value): # CSV cells are strings; restore ints and booleans so the typed columns keep their types
+    if value is None or value == "":
+        return None
+    if value in ("True", "False"):
+        return value == "True"
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+def convertCsvLog(csvFilename, typedFilename=None):
+    """
+    Convert a CSV log in Logs to a typed log next to it and return the typed log's filename.
+    Columns the CSV doesn't have (older logs) are left empty.
+    """
+    from scoring import scoringEngine # scoring imports this module to read typed logs
+    typedFilename = typedFilename if typedFilename is not None else os.path.splitext(csvFilename)[0] + ".jsonl"
+    engine = scoringEngine(csvFilename)
+    engine.parseLog()
+    extraColumns = engine.extraColumns
+    writer = TypedLogWriter(typedFilename, {"NumTasks": engine.numTasks, "Agent1Model": engine.agent1Model, "Agent2Model": engine.agent2Model, "SourceLog": csvFilename})
+    for roundData, extras in zip(engine.rounds, extraColumns):
+        initialProposal = roundData['initialProposal']
+        dataTuple = [
+            roundData['roundNumber'], roundData['negotiationTime'], roundData['agent1Utility'], roundData['agent2Utility'],
+            roundData['numIterations'], roundData['agent1Tasks'], roundData['agent2Tasks'], roundData['tasks'],
+            (initialProposal.agent1Tasks, initialProposal.agent2Tasks) if initialProposal is not None else None,
+            roundData['agent1UsesOpenAI'], roundData['agent2UsesOpenAI'], roundData['agent1ModelName'], roundData['agent2ModelName'],
+            roundData['agent1Type'], roundData['agent2Type'],
+        ]
+        dataTuple += [parseCsvValue(extras.get(column)) for column in logColumns[15:]]
+        writer.logTuple(dataTuple)
+    if engine.totalNegotiationTime is not None:
+        writer.log("TotalNegotiationTime", engine.totalNegotiationTime)
+    if engine.averageTimePerRound is not None:
+        writer.log("AverageTimePerRound", engine.averageTimePerRound)
+    print(f"{Fore.GREEN}Converted {len(engine.rounds)} rounds from {csvFilename} to {typedFilename}{Fore.RESET}")
+    return typedFilename
+
+if __name__ == "__main__": # python typedLog.py <csv log in Logs> [typed log filename]
+    convertCsvLog(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
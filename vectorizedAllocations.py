@@ -0,0 +1,109 @@
+import numpy as np
+from proposal import Proposal
+
+class AllocationGroup:
+    """
+    One tie group of a grouped ranking, stored as bitmasks (bit i set means roundTasks[i] goes to agent 1).
+    Iterating yields Proposals built on demand, so a group behaves like the lists in getGroupedRankedAllocations.
+    """
+    def __init__(self, roundTasks, masks, totalUtility):
+        self.roundTasks = roundTasks
+        self.masks = masks
+        self.totalUtility = totalUtility
+
+    def toProposal(self, mask):
+        mask = int(mask)
+        agent1Tasks = [task for i, task in enumerate(self.roundTasks) if mask >> i & 1]
+        agent2Tasks = [task for i, task in enumerate(self.roundTasks) if not mask >> i & 1]
+        return Proposal(agent1Tasks, agent2Tasks)
+
+    def __len__(self):
+        return len(self.masks)
+
+    def __getitem__(self, index):
+        return self.toProposal(self.masks[index])
+
+    def __iter__(self):
+        for mask in self.masks:
+            yield self.toProposal(mask)
+
+def getPreferenceArrays(roundTasks): # Preferences as arrays, in integer tenths when every preference is a multiple of 0.1
+    pref1 = np.array([task.pref1 for task in roundTasks], dtype=np.float64)
+    pref2 = np.array([task.pref2 for task in roundTasks], dtype=np.float64)
+    pref1Tenths = np.rint(pref1 * 10)
+    pref2Tenths = np.rint(pref2 * 10)
+    if np.all(np.abs(pref1 * 10 - pref1Tenths) <= 1e-6) and np.all(np.abs(pref2 * 10 - pref2Tenths) <= 1e-6):
+        return pref1Tenths.astype(np.int32), pref2Tenths.astype(np.int32), True
+    return pref1, pref2, False
+
+def enumerateAllocationUtilities(roundTasks):
+    """
+    Compute agent1/agent2/total utilities of all 2^n allocations without building any Proposal.
+    Entry m describes the allocation whose bitmask is m (bit i set means roundTasks[i] goes to agent 1).
+    The columns are built one task at a time: adding task i doubles the arrays, and the new upper half is the
+    old one with task i given to agent 1.
+    Returns (agent1Utilities, agent2Utilities, totalUtilities, inTenths); utilities are integer tenths when inTenths is True.
+    """
+    pref1, pref2, inTenths = getPreferenceArrays(roundTasks)
+    dtype = np.int16 if inTenths and len(roundTasks) <= 3000 else np.float64
+    agent1Utilities = np.zeros(1, dtype=dtype)
+    agent2Utilities = np.zeros(1, dtype=dtype)
+    for i in range(len(roundTasks)):
+        agent1Utilities = np.concatenate((agent1Utilities, agent1Utilities + pref1[i].item()))
+        agent2Utilities = np.concatenate((agent2Utilities + pref2[i].item(), agent2Utilities))
+    return agent1Utilities, agent2Utilities, agent1Utilities + agent2Utilities, inTenths
+
+def getSortedAllocationMasks(roundTasks, totalUtilities):
+    """
+    Order allocation bitmasks like getAllPossibleAllocations: highest total first, ties in enumeration order
+    (fewer agent 1 tasks first, then the lexicographic order of itertools.combinations).
+    """
+    taskCount = len(roundTasks)
+    sizes = np.zeros(1, dtype=np.int8)
+    combinationOrder = np.zeros(1, dtype=np.int32 if taskCount <= 31 else np.int64) # Bit-reversed mask: higher value means earlier in combinations order
+    for i in range(taskCount):
+        sizes = np.concatenate((sizes, sizes + 1))
+        combinationOrder = np.concatenate((combinationOrder, combinationOrder + (1 << (taskCount - 1 - i))))
+    return np.lexsort((-combinationOrder, sizes, -totalUtilities)).astype(np.int64)
+
+def getGroupBoundaries(sortedTotals, inTenths): # Start index of every tie group in the sorted totals
+    if len(sortedTotals) == 0:
+        return np.zeros(0, dtype=np.int64)
+    if inTenths:
+        return np.concatenate(([0], np.flatnonzero(np.diff(sortedTotals)) + 1))
+    boundaries = [0]
+    while True: # Same rule as getGroupedRankedAllocations: a group holds totals within 1e-7 of its first one
+        groupStart = boundaries[-1]
+        nextStart = groupStart + np.searchsorted(-sortedTotals[groupStart:], -(sortedTotals[groupStart] - 1e-7), side='left')
+        if nextStart >= len(sortedTotals):
+            return np.array(boundaries, dtype=np.int64)
+        boundaries.append(nextStart)
+
+def getVectorizedGroupedRankedAllocations(roundTasks):
+    """
+    Vectorized counterpart of scoringEngine.getGroupedRankedAllocations.
+    Returns a dict of groupIndex (1 is best) to AllocationGroup, holding the same allocations per group.
+    Within a group, allocations are listed in enumeration order (the Proposal backend can shuffle exact ties by float rounding noise).
+    """
+    _, _, totalUtilities, inTenths = enumerateAllocationUtilities(roundTasks)
+    sortedMasks = getSortedAllocationMasks(roundTasks, totalUtilities)
+    sortedTotals = totalUtilities[sortedMasks]
+    boundaries = getGroupBoundaries(sortedTotals, inTenths)
+    ends = np.append(boundaries[1:], len(sortedMasks))
+    groupedRanking = {}
+    for groupIndex, (start, end) in enumerate(zip(boundaries, ends), start=1):
+        totalUtility = sortedTotals[start] / 10 if inTenths else sortedTotals[start]
+        groupedRanking[groupIndex] = AllocationGroup(roundTasks, sortedMasks[start:end], float(totalUtility))
+    return groupedRanking
+
+def getAllocationUtilityHistogram(roundTasks):
+    """
+    Return (totalUtilities, counts): every distinct total utility, best first, and how many allocations reach it
+    """
+    _, _, totalUtilities, inTenths = enumerateAllocationUtilities(roundTasks)
+    levels, counts = np.unique(totalUtilities, return_counts=True)
+    levels = levels[::-1]
+    counts = counts[::-1]
+    if inTenths:
+        levels = levels / 10
+    return levels.astype(np.float64), counts